@@ -1,101 +1,227 @@
+import os
 import numpy as np
-import matplotlib.pyplot as plt
-import RPi.GPIO as GPIO
 import time
-from rplidar import RPLidar, RPLidarException
-import sys
+import queue
+import argparse
+import threading
+from LidarSession import SessionWriter
+from MapRender import load_points, render_points, max_extent, write_image
+from OccupancyGrid import OccupancyGrid, STATIONARY_POSE
+from ScanMatcher import ScanOdometry
+from Backends import RPLidarException, RECORD_LABEL, add_backend_arguments, load_gpio, open_lidar, close_gpio
+
+try:
+    import matplotlib.pyplot as plt
+except ImportError:  # Maps are written to an image file instead
+    plt = None
 
 PORT_NAME = '/dev/ttyUSB0'
 motorPin = 11
+DEFAULT_IMAGE = "lidar_map.png"  # Where the map goes without matplotlib
+
+GPIO = None  # RPi.GPIO or a fake, chosen in __main__ (see Backends.py)
+args = None
+grid = None  # OccupancyGrid updated as scans arrive, with --grid
+pose = STATIONARY_POSE  # Pose of the scans being captured, in the grid's frame
+odometry = None  # ScanOdometry tracking that pose, unless --stationary
+
+# Streaming capture: a reader thread keeps draining the Lidar into a bounded
+# queue while the main thread appends each scan to a binary session (see
+# LidarSession.py), flushed every FLUSH_EVERY scans. Nothing accumulates in
+# memory, and a crash loses at most the unflushed scans. If writing ever
+# falls behind, new scans are dropped and counted instead of stalling the
+# serial port.
+CAPTURE_QUEUE = 64   # Scans waiting to be written
+FLUSH_EVERY = 32     # Scans per chunk written to disk
+SUMMARY_EVERY = 2.0  # Seconds between console summaries
+
+
+class CaptureStats:
+    """Counts scans, points and drops; prints a one-line summary every `every` seconds."""
+
+    def __init__(self, every=SUMMARY_EVERY):
+        self.every = every
+        self.scans = self.points = self.dropped = 0
+        self.started = self._last = time.monotonic()
+        self._last_scans = self._last_points = 0
+
+    def add(self, points):
+        self.scans += 1
+        self.points += points
+        now = time.monotonic()
+        if now - self._last >= self.every:
+            self._print(now - self._last, self.scans - self._last_scans, self.points - self._last_points)
+            self._last, self._last_scans, self._last_points = now, self.scans, self.points
+
+    def _print(self, elapsed, scans, points):
+        print(f"{scans / elapsed:.1f} scans/s, {points / elapsed:.0f} points/s, "
+              f"{self.dropped} dropped, {self.scans} scans total")
+
+    def final(self):
+        elapsed = time.monotonic() - self.started
+        if elapsed > 0:
+            print("Capture:", end=" ")
+            self._print(elapsed, self.scans, self.points)
+
+
+def read_scans(lidar, scans, stats, stop_event):
+    """Reader thread: queues (arrival time, scan) pairs, dropping scans when the queue is full."""
+    try:
+        for scan in lidar.iter_scans():
+            if stop_event.is_set():
+                break
+            try:
+                scans.put_nowait((time.time(), scan))
+            except queue.Full:
+                stats.dropped += 1
+    except RPLidarException as e:
+        print(f"RPLidarException: {e}")
+    finally:
+        scans.put(None)  # End of capture
+
+
+def grid_pose(odometry_pose):
+    """
+    ScanOdometry's (x mm, y mm, heading rad), fed raw Lidar angles, in the
+    grid's frame, whose x axis MapRender mirrors: (-x, y, -heading degrees).
+    """
+    x, y, heading = odometry_pose
+    return -x, y, -np.degrees(heading)
+
+
+def write_scan(writer, stats, stamp, scan):
+    global pose
+    triples = np.asarray(scan, dtype=np.float32).reshape(-1, 3)
+    triples = triples[triples[:, 0] != 0]  # Keep returns with a quality
+    writer.append(triples, RECORD_LABEL, timestamp=stamp)
+    if grid is not None:
+        if odometry is not None:  # Scans that cannot be matched keep the last pose
+            returns = triples[triples[:, 2] > 0]
+            odometry.update(returns[:, 2], returns[:, 1], stamp)
+            pose = grid_pose(odometry.pose)
+        grid.update(triples[:, 1], triples[:, 2], pose)
+    stats.add(len(triples))
 
-GPIO.setmode(GPIO.BOARD)
-GPIO.setwarnings(False)
-GPIO.setup(motorPin, GPIO.OUT, initial=GPIO.LOW)
-lidar_data = []
 
 def run():
     '''Main function'''
-    lidar = RPLidar(PORT_NAME)
+    lidar = open_lidar(args, PORT_NAME)
+    writer = SessionWriter(output_file, flush_every=FLUSH_EVERY)
+    stats = CaptureStats()
+    scans = queue.Queue(maxsize=CAPTURE_QUEUE)
+    stop_event = threading.Event()
+    reader = threading.Thread(target=read_scans, args=(lidar, scans, stats, stop_event), daemon=True)
     try:
         print('Recording measurements... Press Ctrl+C to stop.')
         GPIO.output(motorPin, GPIO.HIGH)
         time.sleep(0.5) # Wait for the motor to reach higher speed
-        for scan in lidar.iter_scans():
-            try:
-                for measurement in scan:
-                    quality, angle, distance = measurement
-                    print(f"Quality: {quality}, Angle: {angle:.2f}, Distance: {distance:.2f}")
-                    if quality != 0:
-                        lidar_data.append((angle, distance))
-            except RPLidarException as e:
-                print(f"RPLidarException: {e}")
+        reader.start()
+        while True:
+            item = scans.get()
+            if item is None:
+                break
+            write_scan(writer, stats, *item)
     except KeyboardInterrupt:
         print('Stopping.')
     except Exception as e:
         print("Error")
         print(e)
     finally:
+        stop_event.set()
         GPIO.output(motorPin, GPIO.LOW)
         lidar.stop()
+        if reader.ident is not None:
+            reader.join(timeout=1.0)
+        while True:  # Keep the scans that were already read
+            try:
+                item = scans.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                write_scan(writer, stats, *item)
         lidar.disconnect()
-        with open(output_file, 'w') as f:
-            for angle, distance in lidar_data:
-                f.write(f"{angle},{distance}\n")
-
-def plot_lidar_data(lidar_data):
-    x_points = []
-    y_points = []
-    angles = []
-    for angle, distance in lidar_data:
-        angle_rad = np.radians(angle)
-        x = distance * np.cos(angle_rad)
-        y = distance * np.sin(angle_rad)
-        x_points.append(x*-1)
-        y_points.append(y)
-        angles.append(angle_rad)
+        writer.close()
+        if grid is not None:
+            grid.save(args.grid)
+        stats.final()
+        if odometry is not None:
+            print(f"Scan matching: {odometry.summary()}")
+        close_gpio(GPIO, args)
+
+def show_map(image, extent, image_file=None):
+    """
+    Shows a map image covering [-extent, extent] mm, or writes it to
+    image_file (PNG/PGM) when given or when matplotlib is not installed.
+    """
+    if image_file is not None or plt is None:
+        image_file = image_file or DEFAULT_IMAGE
+        write_image(image_file, image)
+        print(f"Map written to {image_file}")
+        return
 
     plt.figure(figsize=(10, 10))
-    plt.scatter(x_points, y_points, s=10, c='red')
-    plt.scatter(0, 0, s=30, c='blue')
-    plt.axhline(0, color='black', linewidth=0.5)
-    plt.axvline(0, color='black', linewidth=0.5)
+    plt.imshow(image, cmap='gray', extent=(-extent, extent, -extent, extent))
     plt.xlabel("X (mm)")
     plt.ylabel("Y (mm)")
     plt.title("Lidar Data Visualization")
-    plt.axis('equal')
-    plt.grid(True)
     plt.show()
 
+def plot_lidar_data(lidar_data, image_file=None):
+    """Rasterizes (angle, distance) points and shows them with show_map."""
+    points = np.asarray(lidar_data, dtype=np.float64).reshape(-1, 2)
+    extent = max_extent(points[:, 1])
+    show_map(render_points(points, extent=extent), extent, image_file)
+
+def plot_grid(grid, image_file=None):
+    show_map(grid.image(), -grid.origin, image_file)
+
 def read_lidar_data_from_file(file_path):
-    lidar_data = []
-    with open(file_path, 'r') as f:
-        for line in f:
-            angle, distance = map(float, line.strip().split(','))
-            lidar_data.append((angle, distance))
-    return lidar_data
+    """
+    Returns an (n, 2) array of (angle, distance) rows from a capture session,
+    or from the comma-separated text files older versions wrote.
+    """
+    return load_points(file_path)
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python 2DMapping.py <output_file>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Record Lidar points to a file and plot them.")
+    parser.add_argument('output_file', help="capture session directory (text files from older versions can still be plotted)")
+    parser.add_argument('--image', metavar='FILE', help="write the map to a PNG/PGM file instead of opening a window")
+    parser.add_argument('--grid', metavar='FILE', help="update this occupancy grid (.npz) while capturing, and plot it instead of raw points; "
+                                                       "the robot's pose comes from matching each scan to the previous one, starting at the grid's origin")
+    parser.add_argument('--stationary', action='store_true', help="with --grid, take every scan at the grid's origin instead of matching scans")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
 
-    output_file = sys.argv[1]
+    output_file = args.output_file
+    if args.grid:
+        grid = OccupancyGrid.load(args.grid) if os.path.exists(args.grid) else OccupancyGrid()
+        if not args.stationary:
+            odometry = ScanOdometry()
+    GPIO = load_gpio(args)
+    GPIO.setmode(GPIO.BOARD)
+    GPIO.setwarnings(False)
+    GPIO.setup(motorPin, GPIO.OUT, initial=GPIO.LOW)
 
-    try:
-        print('Ctrl + C to start Lidar')
-        while True:
-            time.sleep(0.1)
-    except KeyboardInterrupt:
-        print('Starting Lidar...')
+    if not args.replay:  # A replay starts and maps straight away
+        try:
+            print('Ctrl + C to start Lidar')
+            while True:
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            print('Starting Lidar...')
     #Comment out run if you want to map from data saved in the file.
     run()
 
-    try:
-        print('Ctrl + C to start Mapping')
-        while True:
-            time.sleep(0.1)
-    except KeyboardInterrupt:
-        print('Mapping')
+    if not args.replay:
+        try:
+            print('Ctrl + C to start Mapping')
+            while True:
+                time.sleep(0.1)
+        except KeyboardInterrupt:
+            print('Mapping')
 
-    lidar_data = read_lidar_data_from_file(output_file)
-    plot_lidar_data(lidar_data)
\ No newline at end of file
+    if grid is not None:
+        plot_grid(grid, args.image)
+    else:
+        lidar_data = read_lidar_data_from_file(output_file)
+        plot_lidar_data(lidar_data, args.image)
\ No newline at end of file
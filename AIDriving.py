@@ -1,140 +1,139 @@
+import os
 import numpy as np
-import torch
-import torch.nn as nn
 import time
 import threading
-import RPi.GPIO as GPIO
-from rplidar import RPLidar, RPLidarException
+import argparse
+from Backends import RPLidarException, add_backend_arguments, load_gpio, open_lidar, close_gpio
+from ScanBinning import ScanBinner, normalize_per_scan
+from NumpyInference import NumpyRobotNN, export_weights, softmax
+from ControlLoop import LatestScan, LoopStats
+from MotorControl import MotorController
+from Instrumentation import StageProfiler, add_profile_arguments, make_profiler
+
+GPIO = None  # RPi.GPIO or a fake, chosen in __main__ (see Backends.py)
 
 # GPIO motor pins
 R1, R2, L1, L2 = 22, 16, 18, 13
 
-# =========================
-# Define the Neural Network
-# =========================
-class RobotNN(nn.Module):
-    def __init__(self, input_size, hidden_size=1024, output_size=3):  # Match NN.py
-        super(RobotNN, self).__init__()
-        self.fc1 = nn.Linear(input_size, hidden_size)
-        self.relu = nn.ReLU()
-        self.dropout1 = nn.Dropout(p=0.4)
-        self.fc2 = nn.Linear(hidden_size, hidden_size)
-        self.dropout2 = nn.Dropout(p=0.4)
-        self.fc3 = nn.Linear(hidden_size, hidden_size)
-        self.dropout3 = nn.Dropout(p=0.4)
-        self.fc4 = nn.Linear(hidden_size, output_size)
-
-    def forward(self, x):
-        x = self.fc1(x)
-        x = self.relu(x)
-        x = self.dropout1(x)
-        x = self.fc2(x)
-        x = self.relu(x)
-        x = self.dropout2(x)
-        x = self.fc3(x)
-        x = self.relu(x)
-        x = self.dropout3(x)
-        x = self.fc4(x)
-        return x
-
 ENB = 32
 
 right_pwm = 80
-def init():
-    global pwm
-    GPIO.setmode(GPIO.BOARD)
-    GPIO.setup(R1, GPIO.OUT)
-    GPIO.setup(R2, GPIO.OUT)
-    GPIO.setup(L1, GPIO.OUT)
-    GPIO.setup(L2, GPIO.OUT)
-    GPIO.setup(ENB, GPIO.OUT)
-    pwm = GPIO.PWM(ENB, 1000)
-    pwm.start(0)
-
-def stop():
-    GPIO.output(R1, False)
-    GPIO.output(R2, False)
-    GPIO.output(L1, False)
-    GPIO.output(L2, False)
-    pwm.ChangeDutyCycle(0)
-
-def forward(sec):
-    GPIO.output(R1, False)
-    GPIO.output(L2, False)
-    GPIO.output(R2, True)
-    GPIO.output(L1, True)
-    pwm.ChangeDutyCycle(right_pwm) 
-    time.sleep(sec)
-    stop() 
-
-def right_turn(sec):
-    GPIO.output(R1, True)
-    GPIO.output(R2, False)
-    GPIO.output(L1, True)
-    GPIO.output(L2, False)
-    pwm.ChangeDutyCycle(right_pwm) 
-    time.sleep(sec)
-    stop() 
-
-def left_turn(sec):
-    GPIO.output(R1, False)
-    GPIO.output(R2, True)
-    GPIO.output(L1, False)
-    GPIO.output(L2, True)
-    pwm.ChangeDutyCycle(right_pwm) 
-    time.sleep(sec)
-    stop() 
+# Timed moves return at once and stop on their own, so the controller keeps
+# seeing new scans, and the next decision replaces the current move
+motors = None  # MotorController, created in __main__ once GPIO is chosen
 
 # Load the trained model
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# "numpy" runs best_model.npz without importing torch (export it with
+# `python NumpyInference.py best_model.pth best_model.npz`; a missing or
+# older .npz is exported from the .pth at startup), "torch" runs best_model.pth,
+# "int8" runs a quantized TorchScript model from Distill.py as best_model_int8.pt.
+INFERENCE_BACKEND = "numpy"
 
 input_size = 360 # One neuron per angle
-model = RobotNN(input_size=input_size).to(device)  # Initialize with correct input size
-model.load_state_dict(torch.load("best_model.pth", map_location=device))  # Load weights
-model.eval()
+model = None
+
+MODEL_FILES = {"numpy": "best_model.npz", "torch": "best_model.pth", "int8": "best_model_int8.pt"}
+
+def load_model(backend=INFERENCE_BACKEND, path=None):
+    """Loads the trained model for the chosen inference backend (from MODEL_FILES unless a path is given)."""
+    global model, INFERENCE_BACKEND, torch, device
+    INFERENCE_BACKEND = backend
+    path = path or MODEL_FILES[backend]
+    if backend == "torch":
+        import torch
+        from RobotModel import RobotNN
+
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model = RobotNN(input_size=input_size).to(device)  # Initialize with correct input size
+        model.load_state_dict(torch.load(path, map_location=device))  # Load weights
+        model.eval()
+    elif backend == "int8":
+        import torch
+
+        device = torch.device("cpu")  # Quantized kernels are CPU-only
+        model = torch.jit.load(path, map_location=device)
+    else:
+        pth_file = os.path.splitext(path)[0] + ".pth"
+        if os.path.exists(pth_file) and (not os.path.exists(path) or os.path.getmtime(pth_file) > os.path.getmtime(path)):
+            # Trained but never exported, or retrained since
+            count = export_weights(pth_file, path)  # Needs torch this once
+            print(f"Exported {count} layers from {pth_file} to {path}")
+        model = NumpyRobotNN(path)
+
+def predict(input_data):
+    """
+    Runs the model on one preprocessed scan.
+    Returns the action probabilities and the chosen action.
+    """
+    if INFERENCE_BACKEND in ("torch", "int8"):
+        with torch.no_grad():
+            output = model(torch.from_numpy(input_data).to(device))
+            probabilities = torch.softmax(output, dim=1).cpu().numpy()[0]  # Convert to probabilities
+            return probabilities, torch.argmax(output, dim=1).item()
+    output = model(input_data)
+    return softmax(output)[0], int(np.argmax(output[0]))
+
+def predict_batch(inputs):
+    """
+    Runs the model on a (n, input_size) batch of preprocessed scans.
+    Returns (n, actions) probabilities and the n chosen actions.
+    """
+    if INFERENCE_BACKEND in ("torch", "int8"):
+        with torch.no_grad():
+            output = model(torch.from_numpy(inputs).to(device))
+            return torch.softmax(output, dim=1).cpu().numpy(), torch.argmax(output, dim=1).cpu().numpy()
+    output = model(inputs)
+    return softmax(output), np.argmax(output, axis=1)
 
 # Lidar setup
 PORT_NAME = '/dev/ttyUSB0'
-lidar = RPLidar(port=PORT_NAME, baudrate=115200, timeout=1)
-latest_scan = []
-scan_lock = threading.Lock()
+lidar = None  # Opened in __main__
+latest_scan = LatestScan()  # Newest scan with its sequence number, wakes the controller
 stop_event = threading.Event()
+profiler = StageProfiler()  # Off unless --profile or SIGUSR1, see Instrumentation.py
+verbose = False  # Print the probabilities of every decision
+
+binner = ScanBinner(max_length=input_size)
 
 def preprocess_lidar_scan(scan, max_length=360):
     """
     Preprocesses a single Lidar scan for the neural network.
-    - Converts [angle, distance] pairs into a 360-item array.
+    - Bins the (angle, distance) points into a 360-item array (see ScanBinning).
     - Normalizes distances to the range [-1, 1].
     """
-    distances = [0] * max_length  # Initialize array with zeros
-    for angle, distance in scan:
-        rounded_angle = round(angle)  # Round angle to the nearest integer
-        if 0 <= rounded_angle < max_length:  # Ensure angle is within bounds
-            distances[rounded_angle] = distance
+    if binner.max_length != max_length:
+        raise ValueError(f"Binner is set up for {binner.max_length} bins, not {max_length}")
+    return normalize_per_scan(binner.bin_scan(scan[:, 0], scan[:, 1]))  # (1, 360), batch dimension included
 
-    # Normalize distances (scale between -1 and 1)
-    distances = np.array(distances)
-    if np.max(distances) > 0:  # Avoid division by zero
-        distances = (distances / np.max(distances)) * 2 - 1
-
-    return torch.tensor(distances, dtype=torch.float32).unsqueeze(0).to(device)  # Add batch dimension
+def preprocess_lidar_batch(angles, distances, offsets):
+    """
+    preprocess_lidar_scan for many scans stored back to back (offsets as in
+    ScanBinner.bin_batch). Returns a (n, 360) view that the next call overwrites.
+    """
+    return normalize_per_scan(binner.bin_batch(angles, distances, offsets))
 
 def scan_thread():
     """
     Continuously collects Lidar scans in a separate thread.
     """
-    global latest_scan
     try:
         for scan in lidar.iter_scans():
             if stop_event.is_set():
                 break
-            with scan_lock:
-                latest_scan = [(angle, distance) for quality, angle, distance in scan if quality > 0 and distance > 0]
+            t = profiler.start()
+            # RPLidar angles are multiples of 1/64 degree, so float32 bins them exactly
+            points = np.asarray(scan, dtype=np.float32).reshape(-1, 3)
+            points = points[(points[:, 0] > 0) & (points[:, 2] > 0), 1:]  # Keep (angle, distance)
+            latest_scan.publish(points)
+            profiler.lap('scan_convert', t)
     except RPLidarException as e:
         print(f"Lidar error: {e}")
         GPIO.setmode(GPIO.BOARD)
         GPIO.setup(11, GPIO.OUT)
         GPIO.output(11, GPIO.LOW)
+    finally:
+        stop_event.set()  # No more scans: the control loop ends and stops the motors
+        latest_scan.close()  # Wake the controller so it can exit
 
 def execute_action(action):
     """
@@ -144,49 +143,81 @@ def execute_action(action):
     - 2: Right
     """
     if action == 0:
-        forward(0.2)  # Move forward for 0.1 seconds
+        motors.forward(0.2)  # Move forward for 0.2 seconds
     elif action == 1:
-        left_turn(0.1)  # Turn left for 0.1 seconds
+        motors.left_turn(0.1)  # Turn left for 0.1 seconds
     elif action == 2:
-        right_turn(0.1)  # Turn right for 0.1 seconds
+        motors.right_turn(0.1)  # Turn right for 0.1 seconds
     
 
 def control_robot():
     """
     Main control loop for the robot.
-    Continuously collects Lidar data, makes predictions, and executes actions.
+    Sleeps until a new Lidar scan arrives, makes a prediction and starts the
+    action, so every scan is acted on once and never twice.
     """
+    stats = LoopStats()
+    seq = 0
     try:
         while not stop_event.is_set():
-            # Get the latest Lidar scan
-            with scan_lock:
-                scan_copy = latest_scan.copy()
-
-            if not scan_copy:
+            # Wait for a scan newer than the last one we acted on
+            newest = latest_scan.wait_newer(seq, timeout=1.0)
+            if newest is None:
+                continue  # No scan yet; the loop condition notices if the Lidar stopped
+            seq, scan, scan_stamp = newest
+            t = profiler.start()
+            profiler.record('acquire', t - scan_stamp)  # Scan published -> controller awake
+
+            if len(scan) == 0:
                 continue  # Skip if no scan data is available
 
             # Preprocess the Lidar data
-            input_data = preprocess_lidar_scan(scan_copy)
+            input_data = preprocess_lidar_scan(scan)
+            t = profiler.lap('preprocess', t)
 
             # Predict the action
-            with torch.no_grad():
-                output = model(input_data)
-                probabilities = torch.softmax(output, dim=1).cpu().numpy()[0]  # Convert to probabilities
-                predicted_action = torch.argmax(output, dim=1).item()
+            probabilities, predicted_action = predict(input_data)
+            t = profiler.lap('inference', t)
 
             # Debugging: Print the probabilities and chosen action
-            print(f"Probabilities: {probabilities}, Chosen Action: {predicted_action}")
+            if verbose:
+                print(f"Probabilities: {probabilities}, Chosen Action: {predicted_action}")
 
             execute_action(predicted_action)
+            t = profiler.lap('actuate', t)
+            profiler.record('scan_to_actuation', t - scan_stamp)
+            stats.record(scan_stamp)
+            profiler.tick()
 
     except KeyboardInterrupt:
         print("Stopping robot control.")
         stop_event.set()  # Signal the scanning thread to stop
+    finally:
+        motors.stop()
+        print(stats.summary())
+        profiler.dump()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive the robot with the trained network.")
+    parser.add_argument('--inference', choices=["numpy", "torch", "int8"], default=INFERENCE_BACKEND,
+                        help="runtime for the network (default: %(default)s)")
+    parser.add_argument('--model', help=f"model file (default: {', '.join(f'{f} for {b}' for b, f in MODEL_FILES.items())})")
+    parser.add_argument('--verbose', action='store_true', help="print the probabilities of every decision")
+    add_backend_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    verbose = args.verbose
+    profiler = make_profiler(args)
+
+    GPIO = load_gpio(args)
+    motors = MotorController(GPIO, R1, R2, L1, L2, ENB, speed=right_pwm)
+    load_model(args.inference, args.model)
+    lidar = open_lidar(args, PORT_NAME, baudrate=115200, timeout=1)
+    thread = None
     try:
-        init()
+        motors.init()
         GPIO.setup(11, GPIO.OUT)  # Lidar motor control pin
         GPIO.output(11, GPIO.HIGH)  
         time.sleep(0.5)
@@ -201,10 +232,12 @@ if __name__ == "__main__":
         stop_event.set()  
     finally:
         # Cleanup resources
-        if thread.is_alive():
+        if thread is not None and thread.is_alive():
             thread.join()
         if lidar._serial_port.is_open:
             lidar.stop()
             lidar.disconnect()
         GPIO.output(11, GPIO.LOW)
+        motors.close()
         GPIO.cleanup()
+        close_gpio(GPIO, args)
@@ -1,89 +1,42 @@
-import csv
 import time
 import threading
-import RPi.GPIO as GPIO
-from rplidar import RPLidar, RPLidarException
-import json
+import argparse
 import sys
 import termios
 import tty
+from DatasetManifest import Dataset, format_stats
+from MotorControl import MotorController
+from Backends import RPLidarException, add_backend_arguments, load_gpio, open_lidar, close_gpio
+
+GPIO = None  # RPi.GPIO or a fake, chosen in __main__ (see Backends.py)
 
 # GPIO motor pins
 R1, R2, L1, L2 = 22, 16, 18, 13
 ENB = 32
 
 right_pwm = 80
-def init():
-    global pwm
-    GPIO.setmode(GPIO.BOARD)
-    GPIO.setup(R1, GPIO.OUT)
-    GPIO.setup(R2, GPIO.OUT)
-    GPIO.setup(L1, GPIO.OUT)
-    GPIO.setup(L2, GPIO.OUT)
-    GPIO.setup(ENB, GPIO.OUT)
-    pwm = GPIO.PWM(ENB, 1000)
-    pwm.start(0)
-
-def stop():
-    GPIO.output(R1, False)
-    GPIO.output(R2, False)
-    GPIO.output(L1, False)
-    GPIO.output(L2, False)
-    pwm.ChangeDutyCycle(0) 
-
-def forward():
-    GPIO.output(R1, False)
-    GPIO.output(L2, False)
-    GPIO.output(R2, True)
-    GPIO.output(L1, True)
-    pwm.ChangeDutyCycle(right_pwm)  
-
-def reverse():
-    GPIO.output(R1, True)
-    GPIO.output(R2, False)
-    GPIO.output(L1, False)
-    GPIO.output(L2, True)
-    pwm.ChangeDutyCycle(right_pwm)
-
-def right_turn():
-    GPIO.output(R1, True)
-    GPIO.output(R2, False)
-    GPIO.output(L1, True)
-    GPIO.output(L2, False)
-    pwm.ChangeDutyCycle(right_pwm) 
-
-def left_turn():
-    GPIO.output(R1, False)
-    GPIO.output(R2, True)
-    GPIO.output(L1, False)
-    GPIO.output(L2, True)
-    pwm.ChangeDutyCycle(right_pwm) 
+motors = None  # MotorController, built in __main__
 
 # Lidar Setup
 PORT_NAME = '/dev/ttyUSB0'
 motorPin = 11
-CSV_FILE = "lidar_training_data.csv"
+CSV_FILE = "lidar_training_data.csv"  # Old format, see LidarSession.convert_csv
+DATASET_DIR = "lidar_training_data.dataset"  # One shard per recording run, see DatasetManifest.py
 
-GPIO.setmode(GPIO.BOARD)
-GPIO.setwarnings(False)
-GPIO.setup(motorPin, GPIO.OUT, initial=GPIO.LOW)
-
-lidar = RPLidar(port=PORT_NAME, baudrate=115200, timeout=1)
+lidar = None  # Opened in __main__
 latest_scan = []
 scan_lock = threading.Lock()
 
 # Add a threading event to signal the thread to stop
 stop_event = threading.Event()
 
-def save_lidar_scan(scan, action):
-    scan_data = [(angle, distance) for quality, angle, distance in scan if quality > 0 and distance > 0]
+def save_lidar_scan(writer, scan, action):
+    scan_data = [(quality, angle, distance) for quality, angle, distance in scan if quality > 0 and distance > 0]
     if not scan_data:  # Skip saving if the scan is empty
         print("Empty or invalid scan, not saving.")
         return
     try:
-        with open(CSV_FILE, mode="a", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow([json.dumps(scan_data), action])
+        writer.append(scan_data, action)
     except Exception as e:
         print(f"Error saving scan: {e}")
 
@@ -113,35 +66,21 @@ def get_key():
         termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
     return ch
 
-def count_csv_rows(file_path):
-    """Counts the number of rows in the CSV file."""
-    try:
-        with open(file_path, mode="r") as file:
-            return sum(1 for _ in file)
-    except FileNotFoundError:
-        return 0
-
-def count_action_distribution(file_path):
-    """Counts the distribution of actions in the CSV file."""
-    action_counts = {0: 0, 1: 0, 2: 0, 3: 0}  # Initialize counts for actions: Forward, Left, Right, Stop
-    try:
-        with open(file_path, mode="r") as file:
-            reader = csv.reader(file)
-            for row in reader:
-                try:
-                    if len(row) > 1:  # Ensure the row has both scan data and action
-                        action = int(row[1])  # Action is in the second column
-                        if action in action_counts:
-                            action_counts[action] += 1
-                except (ValueError, IndexError):
-                    # Skip rows with invalid format
-                    continue
-    except FileNotFoundError:
-        print("CSV file not found.")
-    return action_counts
-
-def run():
-    init()
+def finish_session(dataset, writer):
+    """
+    Closes this session's shard, dropping it if nothing was recorded, and
+    returns the summary lines, straight from the manifest.
+    """
+    writer.close()
+    if writer.num_scans == 0:
+        dataset.drop(writer.name)  # Nothing recorded, no empty shard
+        lines = ["Nothing recorded this session."]
+    else:
+        lines = [f"This session ({writer.name}):"] + format_stats(dataset.stats([writer.name]))
+    return lines + [f"All of {dataset.root}:"] + format_stats(dataset.stats())
+
+def run(dataset_dir=DATASET_DIR):
+    motors.init()
     GPIO.output(motorPin, GPIO.HIGH)  # Ensure Lidar motor is powered on
     time.sleep(0.5)
 
@@ -152,6 +91,8 @@ def run():
     print("Lidar is running. Press W/A/S/D to move. Q to quit.")
 
     action_map = {'w': 0, 'a': 1, 'd': 2, 's': 3}
+    dataset = Dataset(dataset_dir)
+    writer = dataset.new_shard()
 
     try:
         while True:
@@ -163,39 +104,48 @@ def run():
                 print(f"Action: {key.upper()}")
                 with scan_lock:
                     scan_copy = latest_scan.copy()
-                save_lidar_scan(scan_copy, action_map[key])
+                save_lidar_scan(writer, scan_copy, action_map[key])
                 if key == 'w':
-                    forward(0.1)
+                    motors.forward(0.1)
                 elif key == 'a':
-                    left_turn(0.05)
+                    motors.left_turn(0.05)
                 elif key == 'd':
-                    right_turn(0.05)
+                    motors.right_turn(0.05)
                 elif key == 's':
-                    stop()
+                    motors.stop()
                 print("Saved scan + action.")
     except KeyboardInterrupt:
         print("\nStopped by Ctrl+C.")
     finally:
-        # Signal the scan thread to stop
-        stop_event.set()
-        thread.join()  # Wait for the thread to finish
-        lidar.stop()
-        lidar.disconnect()
-        GPIO.setmode(GPIO.BOARD)
-        GPIO.setup(motorPin, GPIO.OUT)
-        GPIO.output(motorPin, GPIO.LOW)  # Turn off Lidar motor
-        GPIO.cleanup()
-
-        
-
-        action_counts = count_action_distribution(CSV_FILE)
-        row_count = count_csv_rows(CSV_FILE) - action_counts[3]  # Exclude stop actions from the count
-        print(f"Total sets of training data: {row_count}") 
-        print("Action distribution:")
-        print(f"  Forward: {action_counts[0]} {action_counts[0] / row_count * 100:.2f}%")
-        print(f"  Left: {action_counts[1]} {action_counts[1] / row_count * 100:.2f}%")
-        print(f"  Right: {action_counts[2]} {action_counts[2] / row_count * 100:.2f}%")
+        # Hardware first, so a failing manifest write cannot leave the motors running
+        try:
+            motors.close()
+            # Signal the scan thread to stop
+            stop_event.set()
+            thread.join()  # Wait for the thread to finish
+            lidar.stop()
+            lidar.disconnect()
+            GPIO.setmode(GPIO.BOARD)
+            GPIO.setup(motorPin, GPIO.OUT)
+            GPIO.output(motorPin, GPIO.LOW)  # Turn off Lidar motor
+            GPIO.cleanup()
+        finally:
+            print("\n".join(finish_session(dataset, writer)))
 
 
 if __name__ == "__main__":
-    run()
+    parser = argparse.ArgumentParser(description="Record labelled Lidar scans while driving with W/A/S/D.")
+    parser.add_argument('--dataset', default=DATASET_DIR, help="dataset directory to add this session to (default: %(default)s)")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    GPIO = load_gpio(args)
+    motors = MotorController(GPIO, R1, R2, L1, L2, ENB, speed=right_pwm)
+    GPIO.setmode(GPIO.BOARD)
+    GPIO.setwarnings(False)
+    GPIO.setup(motorPin, GPIO.OUT, initial=GPIO.LOW)
+    lidar = open_lidar(args, PORT_NAME, baudrate=115200, timeout=1)
+    try:
+        run(args.dataset)
+    finally:
+        close_gpio(GPIO, args)
@@ -0,0 +1,77 @@
+import torch
+
+# =========================
+# Batched scan augmentation for training
+# =========================
+# Every labelled scan costs a keypress (AITraining.py), so the trainer makes
+# more of each one by perturbing scans on the fly, differently every epoch:
+# - mirroring left/right about the robot's heading, swapping the Left and
+#   Right labels;
+# - rotating by a few degrees (the Lidar is never mounted perfectly square);
+# - noise on the measured distances;
+# - dropping beams, as dark or glancing surfaces do.
+# All four run as tensor ops on a whole batch at once, so no Python runs
+# per sample. A mirror plus a rotation is a gather with one of only a few
+# distinct index rows, which are built once; noise and dropout come from a
+# single uniform draw. Applied to training batches only; validation sees the
+# real scans.
+
+FORWARD_DEGREES = 90   # Heading of the robot in Lidar angles (SectorDecision's front window is 60-120)
+EMPTY = -1.0           # A bin without a return after either normalization (ScanBinning.NORMALIZATIONS)
+FORWARD, LEFT, RIGHT, STOP = 0, 1, 2, 3  # AITraining.py's labels
+
+
+class ScanAugmenter:
+    """
+    Usage:
+        augment = ScanAugmenter()
+        X_batch, y_batch = augment(X_batch, y_batch)   # (n, bins) normalized scans, (n,) labels
+    Returns new tensors; the inputs are left untouched. Draws from torch's
+    global RNG unless a generator is given.
+    """
+
+    def __init__(self, mirror=0.5, max_rotation=3.0, noise=0.01, dropout=0.02, generator=None):
+        self.mirror = mirror              # Probability of mirroring a scan
+        self.max_rotation = max_rotation  # Degrees, uniform in +-max_rotation
+        self.noise = noise                # Std of the distance noise, in normalized units
+        self.dropout = dropout            # Probability of dropping each return
+        self.generator = generator
+        self._table = self._table_key = None
+        self.shift_bins = 0
+
+    def _index_table(self, bins, device):
+        """Gather rows for every (mirrored, shift) pair: output bin i reads forward + sign * (i - forward) + shift."""
+        key = (bins, device)
+        if self._table_key != key:
+            self.shift_bins = round(self.max_rotation * bins / 360)
+            forward = round(FORWARD_DEGREES * bins / 360)
+            offsets = torch.arange(bins, device=device) - forward
+            shifts = torch.arange(-self.shift_bins, self.shift_bins + 1, device=device)
+            rows = [(forward + sign * offsets[None, :] + shifts[:, None]) % bins for sign in (1, -1)]
+            self._table = torch.cat(rows)  # Unmirrored rows first, then mirrored ones
+            self._table_key = key
+        return self._table
+
+    def __call__(self, X, y):
+        n, bins = X.shape
+        device = X.device
+        table = self._index_table(bins, device)
+        shifts = 2 * self.shift_bins + 1
+
+        mirrored = torch.rand(n, generator=self.generator, device=device) < self.mirror
+        shift = torch.randint(shifts, (n,), generator=self.generator, device=device)
+        X = torch.gather(X, 1, table[mirrored.long() * shifts + shift])
+
+        y = y.clone()
+        left, right = mirrored & (y == LEFT), mirrored & (y == RIGHT)
+        y[left], y[right] = RIGHT, LEFT
+
+        if self.noise or self.dropout:
+            # u < dropout drops the beam; above it, u rescaled to [0, 1) gives
+            # uniform noise with standard deviation self.noise
+            u = torch.rand(X.shape, generator=self.generator, device=device)
+            returns = X > EMPTY
+            noise = (u - self.dropout) / (1 - self.dropout) - 0.5
+            noisy = (X + noise * (self.noise * 12 ** 0.5)).clamp_(EMPTY, 1.0)
+            X = torch.where(returns, noisy, X).masked_fill_(returns & (u < self.dropout), EMPTY)
+        return X, y
@@ -0,0 +1,230 @@
+import os
+import time
+import threading
+from collections import deque
+import numpy as np
+from LidarSession import SessionWriter, SessionReader
+
+# =========================
+# Pluggable Lidar and GPIO backends
+# =========================
+# Every entry point talks to an RPLidar and RPi.GPIO. Swapping them for a
+# replayed session and a fake GPIO lets the control, SLAM and mapping
+# pipelines run headless on any Linux box, e.g.
+#   python AIDriving.py --replay lidar_training_data.session --fast --fake-gpio
+# Neither rplidar nor RPi.GPIO is imported unless the real device is used.
+
+REPLAY_HZ = 10  # Scan rate assumed for sessions without timestamps (converted CSVs)
+RECORD_LABEL = -1  # Label for scans recorded without an action
+
+try:
+    from rplidar import RPLidarException
+except ImportError:  # Off the robot: replaying needs no serial driver
+    class RPLidarException(Exception):
+        pass
+
+
+class _ReplayPort:
+    """Stands in for RPLidar._serial_port, which AIDriving checks on exit."""
+    is_open = True
+
+
+class ReplayLidar:
+    """
+    Replays a LidarSession through the parts of the RPLidar API the scripts
+    use. iter_scans() yields lists of (quality, angle, distance) tuples like
+    the real driver, either at the recorded cadence (realtime=True) or as
+    fast as the consumer takes them.
+    """
+
+    def __init__(self, session_dir, realtime=True, loop=False):
+        self.session = SessionReader(session_dir)
+        self.realtime = realtime
+        self.loop = loop
+        self._serial_port = _ReplayPort()
+        self._stopped = threading.Event()
+
+    def _scan_times(self):
+        times = np.array(self.session.timestamps, dtype=np.float64)
+        if len(times) == 0 or np.isnan(times).any():
+            return np.arange(len(times)) / REPLAY_HZ
+        return times - times[0]
+
+    def iter_scans(self, max_buf_meas=3000, min_len=5):
+        self._stopped.clear()
+        times = self._scan_times()
+        while True:
+            start = time.perf_counter()
+            for i in range(len(self.session)):
+                if self._stopped.is_set():
+                    return
+                if self.realtime:
+                    delay = start + times[i] - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                # (quality, angle, distance) order, as the real driver yields them
+                scan = self.session.scan(i)[:, [2, 0, 1]]
+                if len(scan) >= min_len:
+                    yield [(int(quality), angle, distance) for quality, angle, distance in scan.tolist()]
+            if not self.loop:
+                return
+
+    def stop(self):
+        self._stopped.set()
+
+    def start_motor(self):
+        pass
+
+    def stop_motor(self):
+        pass
+
+    def disconnect(self):
+        self._serial_port.is_open = False
+        self.session.close()
+
+
+class RecordingLidar:
+    """
+    Wraps a real RPLidar and appends every scan it yields to a session, so
+    the run can be replayed later with ReplayLidar.
+    """
+
+    def __init__(self, lidar, session_dir):
+        self._lidar = lidar
+        self.writer = SessionWriter(session_dir)
+
+    def iter_scans(self, *args, **kwargs):
+        for scan in self._lidar.iter_scans(*args, **kwargs):
+            self.writer.append(scan, RECORD_LABEL)
+            yield scan
+
+    def disconnect(self):
+        self.writer.close()
+        self._lidar.disconnect()
+
+    def __getattr__(self, name):
+        return getattr(self._lidar, name)
+
+
+class FakeGPIO:
+    """
+    Records pin and PWM activity instead of driving hardware. Mirrors the
+    RPi.GPIO calls the scripts use. Every call is counted in `writes`, and
+    changes of value are kept as (time, pin, value) in `transitions`
+    (bounded, oldest dropped first). PWM pins appear as 'pwm<pin>' with the
+    duty cycle as the value.
+    """
+    BOARD, BCM = 10, 11
+    OUT, IN = 0, 1
+    LOW, HIGH = 0, 1
+
+    def __init__(self, max_transitions=100000):
+        self.started = time.perf_counter()
+        self.state = {}
+        self.writes = 0
+        self.transitions = deque(maxlen=max_transitions)
+        self._lock = threading.Lock()
+
+    def _set(self, pin, value):
+        with self._lock:
+            self.writes += 1
+            if self.state.get(pin) != value:
+                self.state[pin] = value
+                self.transitions.append((time.perf_counter() - self.started, pin, value))
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pins, mode, initial=None, pull_up_down=None):
+        for pin in (pins if isinstance(pins, (list, tuple)) else [pins]):
+            if mode == self.OUT:
+                self._set(pin, int(initial or 0))
+
+    def output(self, pins, values):
+        pins = pins if isinstance(pins, (list, tuple)) else [pins]
+        values = values if isinstance(values, (list, tuple)) else [values] * len(pins)
+        for pin, value in zip(pins, values):
+            self._set(pin, int(bool(value)))
+
+    def input(self, pin):
+        return self.state.get(pin, 0)
+
+    def cleanup(self, pins=None):
+        pass
+
+    def PWM(self, pin, frequency):
+        return _FakePWM(self, pin)
+
+    def dump(self, path):
+        """Writes the recorded transitions as 'seconds,pin,value' lines."""
+        with open(path, 'w') as f:
+            for stamp, pin, value in self.transitions:
+                f.write(f"{stamp:.6f},{pin},{value}\n")
+
+
+class _FakePWM:
+    def __init__(self, gpio, pin):
+        self.gpio = gpio
+        self.name = f"pwm{pin}"
+
+    def start(self, duty):
+        self.gpio._set(self.name, duty)
+
+    def ChangeDutyCycle(self, duty):
+        self.gpio._set(self.name, duty)
+
+    def ChangeFrequency(self, frequency):
+        pass
+
+    def stop(self):
+        self.gpio._set(self.name, 0)
+
+
+def add_backend_arguments(parser, lidar=True, gpio=True):
+    """Adds the backend selection flags to an entry point's argument parser."""
+    if lidar:
+        parser.add_argument('--replay', metavar='SESSION', help="replay a recorded session instead of the RPLidar")
+        parser.add_argument('--fast', action='store_true', help="replay as fast as possible instead of in real time")
+        parser.add_argument('--loop', action='store_true', help="restart the replay when it ends")
+        parser.add_argument('--record', metavar='SESSION', help="record every RPLidar scan to a session")
+    if gpio:
+        parser.add_argument('--fake-gpio', action='store_true', help="record GPIO activity instead of driving pins")
+        parser.add_argument('--gpio-log', metavar='FILE', help="with --fake-gpio, write pin transitions here on exit; SLAM.py --goal logs its drive motors alongside, as <name>-motors<ext>")
+
+
+def load_gpio(args):
+    """Returns RPi.GPIO, or a FakeGPIO when --fake-gpio was given."""
+    if getattr(args, 'fake_gpio', False):
+        return FakeGPIO()
+    import RPi.GPIO as GPIO
+    return GPIO
+
+
+def open_lidar(args, port, **kwargs):
+    """Opens the RPLidar on port, or the replayed session; wraps it for --record."""
+    if getattr(args, 'replay', None):
+        return ReplayLidar(args.replay, realtime=not args.fast, loop=args.loop)
+    from rplidar import RPLidar
+    lidar = RPLidar(port, **kwargs)
+    if getattr(args, 'record', None):
+        return RecordingLidar(lidar, args.record)
+    return lidar
+
+
+def close_gpio(GPIO, args, name=None):
+    """
+    Writes the --gpio-log file if one was asked for. A GPIO used by another
+    process passes a name, and its log goes to <log>-<name><ext> instead.
+    """
+    if isinstance(GPIO, FakeGPIO):
+        path = getattr(args, 'gpio_log', None)
+        if path and name:
+            root, ext = os.path.splitext(path)
+            path = f"{root}-{name}{ext}"
+        if path:
+            GPIO.dump(path)
+        label = f"Fake GPIO ({name})" if name else "Fake GPIO"
+        print(f"{label}: {GPIO.writes} writes, {len(GPIO.transitions)} transitions")
@@ -0,0 +1,95 @@
+import time
+import sys
+import numpy as np
+from ScanBinning import ScanBinner, BIN_MODES, normalize_per_scan, normalize_global, scan_to_arrays
+
+# =========================
+# Scan binning microbenchmark
+# =========================
+# Compares scans/sec of ScanBinning against the per-point loops that used to
+# live in AIDriving.preprocess_lidar_scan and NeuralNetworkTraining.process_scan.
+# The torch tensor conversion is left out of both sides so this runs without torch.
+# Usage: python BenchmarkBinning.py [num_scans]
+
+POINTS_PER_SCAN = 250  # Roughly one A2M8 revolution
+
+
+def legacy_preprocess_lidar_scan(scan, max_length=360):
+    """Old AIDriving.preprocess_lidar_scan, minus the torch conversion."""
+    distances = [0] * max_length
+    for angle, distance in scan:
+        rounded_angle = round(angle)
+        if 0 <= rounded_angle < max_length:
+            distances[rounded_angle] = distance
+    distances = np.array(distances)
+    if np.max(distances) > 0:
+        distances = (distances / np.max(distances)) * 2 - 1
+    return distances
+
+
+def legacy_load_scans(scans, max_length=360):
+    """Old NeuralNetworkTraining binning step, minus the CSV parsing."""
+    def process_scan(scan):
+        distances = [0] * max_length
+        for angle, distance in scan:
+            rounded_angle = round(angle)
+            if 0 <= rounded_angle < max_length:
+                distances[rounded_angle] = distance
+        return distances
+
+    X = np.array([process_scan(scan) for scan in scans])
+    return (X / np.max(X)) * 2 - 1
+
+
+def make_scans(num_scans, seed=0):
+    """Random scans shaped like RPLidar output: ~250 points, 0-360 degrees, 150-6000 mm."""
+    rng = np.random.default_rng(seed)
+    scans = []
+    for _ in range(num_scans):
+        n = rng.integers(POINTS_PER_SCAN - 30, POINTS_PER_SCAN + 30)
+        angles = np.sort(rng.uniform(0, 360, n))
+        distances = rng.uniform(150, 6000, n)
+        scans.append(list(zip(angles.tolist(), distances.tolist())))
+    return scans
+
+
+def timed(label, num_scans, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {num_scans / elapsed:>12.0f} scans/sec")
+    return elapsed
+
+
+def run(num_scans=2000):
+    scans = make_scans(num_scans)
+    arrays = [np.asarray(scan, dtype=np.float64) for scan in scans]
+    lengths = np.array([len(scan) for scan in scans])
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    flat = np.concatenate(arrays)
+
+    # Sanity check before timing: the new path must match the old one
+    binner = ScanBinner()
+    for scan, points in zip(scans[:50], arrays[:50]):
+        new = normalize_per_scan(binner.bin_scan(points[:, 0], points[:, 1]))[0]
+        assert np.allclose(new, legacy_preprocess_lidar_scan(scan), atol=1e-5)
+
+    print(f"{num_scans} scans, ~{POINTS_PER_SCAN} points each\n")
+    print("Single scan (driving loop)")
+    timed("  legacy per-point loop", num_scans,
+          lambda: [legacy_preprocess_lidar_scan(scan) for scan in scans])
+    timed("  ScanBinner from list", num_scans,
+          lambda: [normalize_per_scan(binner.bin_scan(*scan_to_arrays(scan))) for scan in scans])
+    timed("  ScanBinner from array", num_scans,
+          lambda: [normalize_per_scan(binner.bin_scan(points[:, 0], points[:, 1])) for points in arrays])
+
+    print("\nWhole dataset (training loader)")
+    timed("  legacy per-point loop", num_scans, lambda: legacy_load_scans(scans))
+    for mode in BIN_MODES:
+        batch_binner = ScanBinner(max_scans=num_scans, mode=mode)
+        timed(f"  ScanBinner batch, mode={mode}", num_scans,
+              lambda: normalize_global(batch_binner.bin_batch(flat[:, 0], flat[:, 1], offsets)))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+import runpy
+import tempfile
+import numpy as np
+import torch
+import torch.optim as optim
+from Checkpointing import CheckpointWriter
+
+# =========================
+# Training checkpoints and early stopping: time saved
+# =========================
+# 1. How long the epoch loop stalls per checkpoint of the full 1536-wide
+#    RobotNN: torch.save inline, as train_model used to, vs
+#    CheckpointWriter.save, for the weights alone and for a resumable
+#    checkpoint with Adam's state.
+# 2. Wall-clock time of a 300-epoch fit with and without early stopping.
+#    Without a dataset argument, 6300 synthetic scans stand in: the label is
+#    the quarter of the scan with the most free space, with 10% of labels
+#    flipped, so validation loss plateaus and then creeps up as on real data.
+# Usage: python BenchmarkCheckpointing.py [dataset] [hidden_size]
+
+SAMPLES = 6300
+INPUT_SIZE = 360
+SAVES = 10
+
+
+def synthetic(rng):
+    X = rng.uniform(0, 1, (SAMPLES, INPUT_SIZE)).astype(np.float32)
+    y = X.reshape(SAMPLES, 4, -1).mean(axis=2).argmax(axis=1)
+    flip = rng.random(SAMPLES) < 0.1
+    y[flip] = rng.integers(0, 4, flip.sum())
+    split = int(SAMPLES * 0.8)
+    return (torch.tensor(X[:split]), torch.tensor(X[split:]),
+            torch.tensor(y[:split], dtype=torch.long), torch.tensor(y[split:], dtype=torch.long))
+
+
+def save_stalls(training, tmp):
+    model = training['RobotNN'](input_size=INPUT_SIZE)
+    optimizer = optim.Adam(model.parameters())
+    model(torch.rand(8, INPUT_SIZE)).sum().backward()
+    optimizer.step()  # Fills Adam's moment buffers
+    for label, state in (("weights", lambda: model.state_dict()),
+                         ("resumable", lambda: {'model': model.state_dict(), 'optimizer': optimizer.state_dict()})):
+        path = os.path.join(tmp, f"{label}.pth")
+        start = time.perf_counter()
+        for _ in range(SAVES):
+            torch.save(state(), path)
+        inline = (time.perf_counter() - start) / SAVES
+        writer = CheckpointWriter()
+        for _ in range(SAVES):
+            writer.save(path, state())
+            time.sleep(inline)  # An epoch's worth of training between saves
+        writer.close()
+        print(f"  {label:9s} ({os.path.getsize(path) / 1e6:.0f} MB): torch.save stalls {inline * 1000:.0f} ms, "
+              f"CheckpointWriter {writer.stall / SAVES * 1000:.1f} ms")
+
+
+def run():
+    training = runpy.run_path("NeuralNetworkTraining")  # Its __main__ block does not run
+    hidden = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    with tempfile.TemporaryDirectory() as tmp:
+        print("Stall per checkpoint, 1536-wide RobotNN:")
+        save_stalls(training, tmp)
+
+        if len(sys.argv) > 1:
+            data = training['load_training_data'](sys.argv[1])
+        else:
+            data = synthetic(np.random.default_rng(0))
+        print(f"300-epoch fit on {len(data[0]) + len(data[1])} samples, hidden {hidden}:")
+        results = {}
+        for label, patience in (("every epoch", None), (f"early stopping (patience {training['patience']})", training['patience'])):
+            torch.manual_seed(0)
+            start = time.perf_counter()
+            _, history = training['fit'](data, hidden_size=hidden, num_epochs=300, patience=patience,
+                                         best_path=os.path.join(tmp, "best.pth"),
+                                         checkpoint_path=os.path.join(tmp, "checkpoint.pth"), verbose=False)
+            results[label] = elapsed = time.perf_counter() - start
+            print(f"  {label}: {len(history['val_losses'])} epochs in {elapsed:.1f}s, "
+                  f"best val loss {history['best_val_loss']:.4f} at epoch {history['best_epoch']}")
+        full, early = results.values()
+        print(f"  saved {full - early:.1f}s ({100 * (1 - early / full):.0f}%)")
+
+
+if __name__ == "__main__":
+    run()
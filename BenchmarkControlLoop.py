@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+import numpy as np
+from ScanBinning import ScanBinner, normalize_per_scan
+from NumpyInference import NumpyRobotNN
+from ControlLoop import LatestScan, LoopStats
+from MotorControl import MotorController
+from Backends import FakeGPIO
+
+# =========================
+# Control loop benchmark: busy-spin + blocking moves vs event-driven
+# =========================
+# Runs the old AIDriving.control_robot structure and the new one against a
+# simulated 10 Hz Lidar (the new loop drives a MotorController on FakeGPIO),
+# with a randomly initialised RobotNN on the NumPy runtime. Reports
+# decisions/sec, how many distinct scans were acted on, and
+# scan-to-actuation latency.
+# Usage: python BenchmarkControlLoop.py [seconds per loop]
+
+SCAN_HZ = 10  # RPLidar A2M8 default
+MOVE_SECONDS = {0: 0.2, 1: 0.1, 2: 0.1}  # execute_action durations
+
+
+def make_model(tmp):
+    rng = np.random.default_rng(0)
+    sizes = [360, 1024, 1024, 1024, 3]
+    layers = {}
+    for i, (n_in, n_out) in enumerate(zip(sizes, sizes[1:]), start=1):
+        layers[f"w{i}"] = (rng.standard_normal((n_in, n_out)) / np.sqrt(n_in)).astype(np.float32)
+        layers[f"b{i}"] = np.zeros(n_out, dtype=np.float32)
+    path = os.path.join(tmp, "model.npz")
+    np.savez(path, **layers)
+    return NumpyRobotNN(path)
+
+
+def fake_lidar(publish, stop_event):
+    """Publishes a random ~250-point scan every 1 / SCAN_HZ seconds."""
+    rng = np.random.default_rng(1)
+    next_scan = time.perf_counter()
+    while not stop_event.is_set():
+        angles = np.sort(rng.uniform(0, 360, 250)).astype(np.float32)
+        publish(np.column_stack([angles, rng.uniform(150, 6000, 250).astype(np.float32)]))
+        next_scan += 1 / SCAN_HZ
+        time.sleep(max(0.0, next_scan - time.perf_counter()))
+
+
+def decide(model, binner, scan):
+    logits = model(normalize_per_scan(binner.bin_scan(scan[:, 0], scan[:, 1])))
+    return int(np.argmax(logits[0]))
+
+
+def run_legacy(model, seconds):
+    """Old loop: copy the latest scan under a lock every iteration, blocking moves."""
+    lock = threading.Lock()
+    state = {'scan': None, 'stamp': 0.0, 'seq': 0}
+    stop_event = threading.Event()
+
+    def publish(scan):
+        with lock:
+            state['scan'], state['stamp'] = scan, time.perf_counter()
+            state['seq'] += 1
+
+    lidar = threading.Thread(target=fake_lidar, args=(publish, stop_event), daemon=True)
+    lidar.start()
+    binner = ScanBinner()
+    stats = LoopStats()
+    seen = set()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        with lock:
+            scan = None if state['scan'] is None else state['scan'].copy()
+            stamp, seq = state['stamp'], state['seq']
+        if scan is None:
+            continue
+        action = decide(model, binner, scan)
+        stats.record(stamp)  # Motors start here...
+        seen.add(seq)
+        time.sleep(MOVE_SECONDS[action])  # ...and the loop is blind until they stop
+    stop_event.set()
+    lidar.join()
+    return stats, len(seen)
+
+
+def run_event_driven(model, seconds):
+    """New loop: sleep until a new scan, act once on it, moves run in the background."""
+    latest = LatestScan()
+    stop_event = threading.Event()
+    lidar = threading.Thread(target=fake_lidar, args=(latest.publish, stop_event), daemon=True)
+    lidar.start()
+    motors = MotorController(FakeGPIO(), 22, 16, 18, 13, 32)
+    motors.init()
+    moves = {0: motors.forward, 1: motors.left_turn, 2: motors.right_turn}
+    binner = ScanBinner()
+    stats = LoopStats()
+    seen = set()
+    seq = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        newest = latest.wait_newer(seq, timeout=1.0)
+        if newest is None:
+            continue
+        seq, scan, stamp = newest
+        action = decide(model, binner, scan)
+        moves[action](MOVE_SECONDS[action])
+        stats.record(stamp)
+        seen.add(seq)
+    motors.close()
+    stop_event.set()
+    lidar.join()
+    return stats, len(seen)
+
+
+def run(seconds=5.0):
+    with tempfile.TemporaryDirectory() as tmp:
+        model = make_model(tmp)
+    print(f"Simulated {SCAN_HZ} Hz Lidar, {seconds:.0f} s per loop ({int(seconds * SCAN_HZ)} scans)\n")
+    for label, loop in (("busy-spin, blocking moves", run_legacy), ("event-driven, timed moves", run_event_driven)):
+        stats, distinct = loop(model, seconds)
+        print(f"{label}:\n  {stats.summary()}\n  distinct scans acted on: {distinct}")
+
+
+if __name__ == "__main__":
+    run(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0)
@@ -0,0 +1,89 @@
+import os
+import csv
+import sys
+import json
+import time
+import tempfile
+import numpy as np
+from DatasetManifest import Dataset
+from DatasetLoader import load_dataset
+
+# =========================
+# Dataset statistics and subset loading: one CSV vs a manifest of shards
+# =========================
+# Records the same scans twice, as the old single lidar_training_data.csv
+# and as a dataset of sessions (DatasetManifest.py), then times
+# - the end-of-recording statistics: re-reading the whole CSV twice, as
+#   AITraining.run did with count_csv_rows and count_action_distribution,
+#   vs opening the dataset and summing its manifest;
+# - loading one session for training: the CSV can only be loaded whole,
+#   a dataset loads just the chosen shard (cold, then from the cache).
+# Usage: python BenchmarkDataset.py [scans] [sessions]
+
+POINTS_PER_SCAN = 250
+REPEATS = 5
+
+
+def count_csv_rows(file_path):
+    with open(file_path, mode="r") as file:
+        return sum(1 for _ in file)
+
+
+def count_action_distribution(file_path):
+    """The counting AITraining.run did before the manifest."""
+    action_counts = {0: 0, 1: 0, 2: 0, 3: 0}
+    with open(file_path, mode="r") as file:
+        for row in csv.reader(file):
+            if len(row) > 1 and int(row[1]) in action_counts:
+                action_counts[int(row[1])] += 1
+    return action_counts
+
+
+def record(tmp, scans, sessions, rng):
+    csv_file = os.path.join(tmp, "lidar_training_data.csv")
+    dataset = Dataset(os.path.join(tmp, "lidar_training_data.dataset"))
+    with open(csv_file, 'w', newline='') as f:
+        rows = csv.writer(f)
+        for session in range(sessions):
+            with dataset.new_shard(f"session-{session}", flush_every=1024) as writer:
+                for _ in range(scans // sessions):
+                    angles = np.round(np.sort(rng.uniform(0, 360, POINTS_PER_SCAN)), 2)
+                    distances = np.round(rng.uniform(100, 6000, POINTS_PER_SCAN), 1)
+                    label = int(rng.integers(0, 4))
+                    rows.writerow([json.dumps(np.column_stack([angles, distances]).tolist()), label])
+                    writer.append(np.column_stack([np.full(POINTS_PER_SCAN, 15.0), angles, distances]), label)
+    return csv_file, dataset.root
+
+
+def best_of(function):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run():
+    scans = int(sys.argv[1]) if len(sys.argv) > 1 else 6300
+    sessions = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_file, dataset_dir = record(tmp, scans, sessions, np.random.default_rng(0))
+        print(f"{scans} scans in {sessions} sessions, CSV {os.path.getsize(csv_file) / 1e6:.1f} MB")
+
+        old = best_of(lambda: (count_csv_rows(csv_file), count_action_distribution(csv_file)))
+        new = best_of(lambda: Dataset(dataset_dir).stats())
+        print(f"End-of-recording statistics: CSV re-read {old * 1000:.1f} ms, manifest {new * 1000:.2f} ms ({old / new:.0f}x)")
+
+        cache = os.path.join(tmp, "cache")
+        whole = best_of(lambda: load_dataset(csv_file, cache_dir=None))
+        start = time.perf_counter()
+        load_dataset(dataset_dir, shards=["session-0"], cache_dir=cache)
+        cold = time.perf_counter() - start
+        warm = best_of(lambda: load_dataset(dataset_dir, shards=["session-0"], cache_dir=cache))
+        print(f"Training on one session: whole CSV {whole * 1000:.0f} ms, "
+              f"one shard {cold * 1000:.1f} ms cold, {warm * 1000:.1f} ms cached")
+
+
+if __name__ == "__main__":
+    run()
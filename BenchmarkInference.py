@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import subprocess
+import tempfile
+import numpy as np
+import torch
+from RobotModel import RobotNN
+from NumpyInference import NumpyRobotNN, export_weights, softmax
+
+# =========================
+# Torch vs NumPy inference: parity and latency benchmark
+# =========================
+# Exports a RobotNN to .npz, reports how far the NumPy runtime's logits and
+# actions are from torch's (test_NumpyInference.py asserts they match), then
+# times one decision (a single 360-float scan) on both paths and reports p50/p99.
+# Usage: python BenchmarkInference.py [model.pth]
+# Without a model file a randomly initialised RobotNN is used.
+
+INPUT_SIZE = 360
+PARITY_SAMPLES = 1000
+TIMED_DECISIONS = 2000
+WARMUP_DECISIONS = 50
+
+
+def report_parity(torch_model, numpy_model, num_samples=PARITY_SAMPLES):
+    """Compares both runtimes on random scans in [-1, 1], e.g. for a trained model file."""
+    rng = np.random.default_rng(0)
+    inputs = rng.uniform(-1, 1, (num_samples, INPUT_SIZE)).astype(np.float32)
+    with torch.no_grad():
+        expected = torch_model(torch.from_numpy(inputs)).numpy()
+    actual = np.array([numpy_model(row)[0].copy() for row in inputs])  # Output buffer is reused
+
+    max_error = np.abs(actual - expected).max()
+    agreement = (actual.argmax(axis=1) == expected.argmax(axis=1)).mean()
+    prob_error = np.abs(softmax(actual) - torch.softmax(torch.from_numpy(expected), dim=1).numpy()).max()
+    print(f"Parity over {num_samples} scans: max |logit diff| {max_error:.2e}, "
+          f"max |prob diff| {prob_error:.2e}, action agreement {agreement * 100:.2f}%")
+
+
+def latency(decide, num_decisions=TIMED_DECISIONS):
+    """Per-decision latency in microseconds: (p50, p99)."""
+    scan = np.random.default_rng(1).uniform(-1, 1, (1, INPUT_SIZE)).astype(np.float32)
+    for _ in range(WARMUP_DECISIONS):
+        decide(scan)
+    samples = np.empty(num_decisions)
+    for i in range(num_decisions):
+        start = time.perf_counter()
+        decide(scan)
+        samples[i] = time.perf_counter() - start
+    return np.percentile(samples, 50) * 1e6, np.percentile(samples, 99) * 1e6
+
+
+def import_time(module):
+    """Seconds a fresh interpreter takes to import module (the cold-start cost on the robot)."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], check=True)
+    return time.perf_counter() - start
+
+
+def run(pth_file=None):
+    torch_model = RobotNN(input_size=INPUT_SIZE)
+    if pth_file:
+        torch_model.load_state_dict(torch.load(pth_file, map_location="cpu"))
+    torch_model.eval()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not pth_file:
+            pth_file = os.path.join(tmp, "random_model.pth")
+            torch.save(torch_model.state_dict(), pth_file)
+        npz_file = os.path.join(tmp, "model.npz")
+        export_weights(pth_file, npz_file)
+        numpy_model = NumpyRobotNN(npz_file)
+
+    report_parity(torch_model, numpy_model)
+
+    # The same work AIDriving.predict does per decision
+    def torch_decide(scan):
+        with torch.no_grad():
+            output = torch_model(torch.from_numpy(scan))
+            torch.softmax(output, dim=1).numpy()
+            return torch.argmax(output, dim=1).item()
+
+    def numpy_decide(scan):
+        output = numpy_model(scan)
+        softmax(output)
+        return int(np.argmax(output[0]))
+
+    print(f"\nPer-decision latency over {TIMED_DECISIONS} decisions ({torch.get_num_threads()} torch threads)")
+    for label, decide in (("torch", torch_decide), ("numpy", numpy_decide)):
+        p50, p99 = latency(decide)
+        print(f"  {label:<6} p50 {p50:8.1f} us   p99 {p99:8.1f} us   import {import_time(label):.2f} s")
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else None)
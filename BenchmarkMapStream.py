@@ -0,0 +1,103 @@
+import math
+import time
+import zlib
+import tempfile
+import threading
+import numpy as np
+from OccupancyGrid import OccupancyGrid
+from MapStream import MapPublisher, MapSubscriber
+from BenchmarkOdometry import cast
+
+# =========================
+# Map streaming benchmark: bytes per frame, delta vs whole map
+# =========================
+# Builds a 500 px / 10 m map of BenchmarkOdometry's synthetic room while
+# the robot drives a lap, then parks, publishing a frame every 5 scans (a
+# 2 Hz viewer at 10 scans/s). A loopback client on a Unix socket and one
+# on TCP rebuild the map; their copies are checked against the last frame.
+# Then the same lap is pasted into bigger maps tiled with the finished room,
+# as if the robot were driving in one room of a larger explored floor.
+# Usage: python BenchmarkMapStream.py
+
+SIZE_PIXELS, SIZE_METERS = 500, 10
+SCANS_PER_FRAME = 5
+
+
+def frames(laps_scans=400, parked_scans=200):
+    """(label, map image, pose) per published frame: a lap, then parked."""
+    rng = np.random.default_rng(0)
+    grid = OccupancyGrid(size=SIZE_PIXELS)
+    for i in range(laps_scans + parked_scans):
+        th = 2 * math.pi * min(i, laps_scans) / laps_scans
+        pose = (1500 * math.cos(th), 1000 * math.sin(th), math.degrees(th) + 180)
+        scan = cast(pose, rng)
+        grid.update(scan[:, 1], scan[:, 2], pose)
+        if i % SCANS_PER_FRAME == SCANS_PER_FRAME - 1:
+            yield ("driving" if i < laps_scans else "parked"), grid.image(), pose
+
+
+def receive(address, received):
+    subscriber = MapSubscriber(address, timeout=10)
+    count = 0
+    while subscriber.receive() is not None:
+        count += 1
+    received[address] = (count, subscriber.map)
+    subscriber.close()
+
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        unix_address, tcp_address = f"{tmp}/map.sock", "127.0.0.1:58000"
+        publishers = [MapPublisher(unix_address, SIZE_PIXELS, SIZE_METERS),
+                      MapPublisher(tcp_address, SIZE_PIXELS, SIZE_METERS)]
+        received = {}
+        clients = [threading.Thread(target=receive, args=(address, received))
+                   for address in (unix_address, tcp_address)]
+        for client in clients:
+            client.start()
+        time.sleep(0.2)  # Let both connect so the first frame is their keyframe
+
+        stats = {}
+        image = None
+        for label, image, pose in frames():
+            raw = image.tobytes()
+            started = time.perf_counter()
+            delta = publishers[0].publish(raw, pose)
+            elapsed = time.perf_counter() - started
+            publishers[1].publish(raw, pose)
+            whole = len(zlib.compress(raw, 1))
+            stats.setdefault(label, []).append((delta, whole, elapsed))
+        for publisher in publishers:
+            summary = publisher.summary()
+            publisher.close()
+        for client in clients:
+            client.join()
+
+    print(f"{SIZE_PIXELS} px map, raw frame {SIZE_PIXELS * SIZE_PIXELS / 1000:.0f} KB, publisher: {summary}")
+    for label, rows in stats.items():
+        delta, whole, elapsed = np.array(rows).T
+        print(f"{label:8s} {len(rows):3d} frames: delta mean {delta.mean() / 1000:6.2f} KB, p95 {np.percentile(delta, 95) / 1000:6.2f} KB"
+              f" | whole map zlib {whole.mean() / 1000:6.2f} KB | publish {1000 * elapsed.mean():.2f} ms")
+    for address, (count, rebuilt) in received.items():
+        print(f"client {address.split('/')[-1]}: {count} frames, map matches: {np.array_equal(rebuilt, image)}")
+
+    lap = [frame for label, frame, _ in frames() if label == "driving"]
+    print("same lap inside a bigger explored map:")
+    for size in (500, 1000, 2000):
+        floor = np.tile(lap[-1], (size // SIZE_PIXELS, size // SIZE_PIXELS))
+        with tempfile.TemporaryDirectory() as tmp:
+            publisher = MapPublisher(f"{tmp}/map.sock", size, size * SIZE_METERS // SIZE_PIXELS)
+            publisher.publish(floor.tobytes(), (0.0, 0.0, 0.0))
+            deltas, wholes = [], []
+            for frame in lap:
+                floor[:SIZE_PIXELS, :SIZE_PIXELS] = frame
+                raw = floor.tobytes()
+                deltas.append(publisher.publish(raw, (0.0, 0.0, 0.0)))
+                wholes.append(len(zlib.compress(raw, 1)))
+            publisher.close()
+        print(f"  {size:4d} px: raw {size * size / 1000:6.0f} KB, whole map zlib {np.mean(wholes) / 1000:6.2f} KB,"
+              f" delta {np.mean(deltas) / 1000:5.2f} KB per frame")
+
+
+if __name__ == "__main__":
+    run()
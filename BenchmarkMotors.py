@@ -0,0 +1,105 @@
+import sys
+import time
+import numpy as np
+from MotorControl import MotorController, DIRECTIONS
+from Backends import FakeGPIO
+
+# =========================
+# Motor command benchmark: copy-pasted pin functions vs MotorController
+# =========================
+# Replays a command stream like the driving loops produce (mostly repeats of
+# the current command, with a change now and then) against FakeGPIO. Reports
+# commands/sec and GPIO writes per command, then how quickly a new command
+# pre-empts a pending timed stop.
+# Usage: python BenchmarkMotors.py [commands]
+
+R1, R2, L1, L2 = 22, 16, 18, 13
+ENB = 32
+SPEED = 80
+CHANGE_EVERY = 20  # A new command about once every 20 decisions
+
+
+def command_stream(n):
+    rng = np.random.default_rng(0)
+    names = ['forward', 'left_turn', 'right_turn']
+    stream, current = [], 'forward'
+    for _ in range(n):
+        if rng.random() < 1 / CHANGE_EVERY:
+            current = names[rng.integers(len(names))]
+        stream.append(current)
+    return stream
+
+
+def run_legacy(stream):
+    """The old per-script functions: four pin writes and a duty change on every call."""
+    GPIO = FakeGPIO()
+    GPIO.setmode(GPIO.BOARD)
+    for pin in (R1, R2, L1, L2, ENB):
+        GPIO.setup(pin, GPIO.OUT)
+    pwm = GPIO.PWM(ENB, 1000)
+    pwm.start(0)
+
+    def command(name):
+        for pin, value in zip((R1, R2, L1, L2), DIRECTIONS[name]):
+            GPIO.output(pin, value)
+        pwm.ChangeDutyCycle(SPEED)
+
+    GPIO.writes = 0
+    start = time.perf_counter()
+    for name in stream:
+        command(name)
+    return time.perf_counter() - start, GPIO.writes
+
+
+def run_controller(stream):
+    GPIO = FakeGPIO()
+    motors = MotorController(GPIO, R1, R2, L1, L2, ENB, speed=SPEED)
+    motors.init()
+    GPIO.writes = 0
+    start = time.perf_counter()
+    for name in stream:
+        motors.move(name)
+    elapsed = time.perf_counter() - start
+    writes = GPIO.writes
+    motors.close()
+    return elapsed, writes
+
+
+def preemption_latency(trials=200):
+    """
+    Starts a 50 ms timed move and replaces it with another 10 ms in.
+    Measures how long the new call takes to return and checks that the
+    first move's stop never fires.
+    """
+    GPIO = FakeGPIO()
+    motors = MotorController(GPIO, R1, R2, L1, L2, ENB, speed=SPEED)
+    motors.init()
+    latencies, early_stops = [], 0
+    for i in range(trials):
+        motors.forward(0.05)
+        time.sleep(0.01)
+        t = time.perf_counter()
+        motors.left_turn(0.05)
+        latencies.append(time.perf_counter() - t)
+        time.sleep(0.045)  # Past the first deadline, before the second
+        if motors.direction != 'left_turn':
+            early_stops += 1
+    motors.close()
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+    return p50, p99, early_stops
+
+
+def run(n=200_000):
+    stream = command_stream(n)
+    changes = sum(a != b for a, b in zip(stream, stream[1:]))
+    print(f"{n} commands, {changes} changes\n")
+    for label, runner in (("per-call pin writes", run_legacy), ("MotorController", run_controller)):
+        elapsed, writes = runner(stream)
+        print(f"{label:>20}: {n / elapsed:10.0f} commands/s, {writes / n:.3f} GPIO writes per command")
+    p50, p99, early = preemption_latency()
+    print(f"\nTimed-move pre-emption: call returns in p50 {p50:.1f} us, p99 {p99:.1f} us; "
+          f"stale stops fired: {early}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,117 @@
+import sys
+import math
+import time
+import tempfile
+import numpy as np
+from LidarSession import SessionWriter, SessionReader
+from OccupancyGrid import load_poses
+from ScanDecimation import AdaptiveDecimator
+from ScanMatcher import ScanOdometry, FRONT_ANGLE
+
+# =========================
+# Scan-matching odometry benchmark: time per scan and pose drift
+# =========================
+# Replays sessions through the same decimation SLAM.py uses, runs
+# ScanOdometry on every scan, and compares the accumulated pose with ground
+# truth. Without arguments it replays synthetic laps of a 6 x 4 m room at
+# three speeds; given a session and its poses (x,y,heading rows in the
+# OccupancyGrid frame), it replays that instead.
+# Usage: python BenchmarkOdometry.py [session poses.csv]
+
+ROOM = (3000.0, 2000.0)  # Half width, half height in mm
+PILLAR = (1000.0, 500.0, 200.0)  # x, y, radius
+BOX = (-1800.0, -1200.0, -1300.0, -900.0)  # x0, y0, x1, y1
+NOISE_MM = 10
+
+
+def cast(pose, rng, n=250):
+    """One synthetic scan of (quality, angle, distance) rows from pose (OccupancyGrid frame)."""
+    angles = np.sort(rng.uniform(0, 360, n))
+    px, py, heading = pose
+    lx, ly = -np.cos(np.radians(angles)), np.sin(np.radians(angles))
+    c, s = math.cos(math.radians(heading)), math.sin(math.radians(heading))
+    dx, dy = c * lx - s * ly, s * lx + c * ly
+    hit = np.full(n, np.inf)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for wall, d, p in ((ROOM[0], dx, px), (-ROOM[0], dx, px), (ROOM[1], dy, py), (-ROOM[1], dy, py)):
+            t = (wall - p) / d
+            hit = np.where((t > 0) & (t < hit), t, hit)
+        ox, oy = px - PILLAR[0], py - PILLAR[1]
+        b = ox * dx + oy * dy
+        disc = b * b - (ox * ox + oy * oy - PILLAR[2] ** 2)
+        t = -b - np.sqrt(np.where(disc > 0, disc, np.nan))
+        hit = np.where((disc > 0) & (t > 0) & (t < hit), t, hit)
+        x0, y0, x1, y1 = BOX  # Slab test
+        tx = np.sort(np.stack([(x0 - px) / dx, (x1 - px) / dx]), axis=0)
+        ty = np.sort(np.stack([(y0 - py) / dy, (y1 - py) / dy]), axis=0)
+        near, far = np.maximum(tx[0], ty[0]), np.minimum(tx[1], ty[1])
+        hit = np.where((near <= far) & (near > 0) & (near < hit), near, hit)
+    return np.column_stack([np.full(n, 15.0), angles, hit + rng.normal(0, NOISE_MM, n)])
+
+
+def make_lap(session_dir, scans_per_lap, spin_every=0):
+    """An elliptical lap, optionally with a 90 degree spin on the spot every spin_every scans."""
+    rng = np.random.default_rng(0)
+    poses = []
+    spin = 0.0
+    with SessionWriter(session_dir) as writer:
+        for i in range(scans_per_lap):
+            th = 2 * math.pi * i / scans_per_lap
+            if spin_every and i % spin_every >= spin_every - 6:
+                spin += 15.0  # Six fast 15 degree steps
+            pose = (1500 * math.cos(th), 1000 * math.sin(th), math.degrees(th) + 180 + spin)
+            writer.append(cast(pose, rng), -1, timestamp=i / 10)
+            poses.append(pose)
+    return np.array(poses)
+
+
+def relative(poses):
+    """Ground truth in the matcher frame of the first scan: x forward, y = -left, heading negated."""
+    x0, y0, h0 = poses[0]
+    h0 = math.radians(h0)
+    forward = np.array([-math.sin(h0), math.cos(h0)])  # OccupancyGrid heading 0 faces +y
+    left = np.array([-math.cos(h0), -math.sin(h0)])
+    delta = poses[:, :2] - (x0, y0)
+    return delta @ forward, -(delta @ left), -np.radians(poses[:, 2] - poses[0, 2])
+
+
+def replay(session_dir, poses):
+    decimator = AdaptiveDecimator()
+    odometry = ScanOdometry()
+    truth_x, truth_y, truth_h = relative(poses)
+    start = time.perf_counter()
+    used = []
+    with SessionReader(session_dir) as session:
+        for i in range(len(session)):
+            scan = session.scan(i)
+            angles = (scan[:, 0] - FRONT_ANGLE) % 360
+            if decimator.resample(scan[:, 2], angles, scan[:, 1]) is None:
+                continue  # SLAM.py skips these scans too
+            good = decimator.good(scan[:, 2], scan[:, 1])
+            odometry.update(scan[good, 1], angles[good], stamp=session.timestamps[i])
+            used.append(i)
+    elapsed = time.perf_counter() - start
+    last = used[-1]
+    path = np.hypot(np.diff(truth_x[used]), np.diff(truth_y[used])).sum()
+    error = math.hypot(odometry.pose[0] - truth_x[last], odometry.pose[1] - truth_y[last])
+    heading = math.degrees((odometry.pose[2] - truth_h[last] + math.pi) % (2 * math.pi) - math.pi)
+    print(f"  {odometry.summary()}, {len(used) / elapsed:.0f} scans/s end to end")
+    print(f"  drift after {path / 1000:.1f} m: {error:.0f} mm ({100 * error / max(path, 1e-9):.2f}%), heading {heading:+.2f} deg")
+
+
+def run():
+    if len(sys.argv) == 3:
+        print(f"{sys.argv[1]}:")
+        replay(sys.argv[1], load_poses(sys.argv[2]))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, scans, spin in (("slow lap, 400 scans", 400, 0), ("fast lap, 60 scans", 60, 0),
+                                   ("slow lap with fast spins", 400, 50)):
+            session_dir = f"{tmp}/{scans}-{spin}.session"
+            poses = make_lap(session_dir, scans, spin)
+            print(f"{label}:")
+            replay(session_dir, poses)
+
+
+if __name__ == "__main__":
+    run()
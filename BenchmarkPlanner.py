@@ -0,0 +1,107 @@
+import math
+import time
+import numpy as np
+from Planner import Planner, DStarLite, blocked_cells, WAYPOINT_TOLERANCE_MM
+
+# =========================
+# Planner benchmark: incremental vs from-scratch replanning per scan
+# =========================
+# A robot explores a synthetic 10 x 10 m floor of rooms with a 4 m range
+# sensor, building a getmap-style image (unknown 127, free 255, wall 0) as
+# it goes, and drives 150 mm along its plan after every scan. Each scan is
+# replanned both incrementally (Planner, D* Lite) and from scratch on the
+# same grid, and the latency is reported as the map fills in.
+# Usage: python BenchmarkPlanner.py
+
+SIZE_PIXELS, MM_PER_PIXEL = 500, 20
+RANGE_MM = 4000
+STEP_MM = 150
+START, GOAL = (1000.0, 1000.0), (9000.0, 1000.0)
+WALLS = (  # x0, y0, x1, y1 in mm
+    (0, 0, 10000, 200), (0, 9800, 10000, 10000), (0, 0, 200, 10000), (9800, 0, 10000, 10000),
+    (3300, 0, 3500, 4000), (3300, 5000, 3500, 10000),   # West rooms, door at y 4-5 m
+    (6500, 0, 6700, 6000), (6500, 7000, 6700, 10000),   # East rooms, door at y 6-7 m
+    (200, 6000, 2400, 6200), (3500, 2500, 5500, 2700),  # Partial walls
+    (7800, 3000, 9800, 3200), (4500, 7000, 5000, 7500),  # ... and a pillar
+)
+
+
+def floor():
+    truth = np.zeros((SIZE_PIXELS, SIZE_PIXELS), dtype=bool)
+    for x0, y0, x1, y1 in WALLS:
+        truth[y0 // MM_PER_PIXEL:y1 // MM_PER_PIXEL, x0 // MM_PER_PIXEL:x1 // MM_PER_PIXEL] = True
+    return truth
+
+
+def scan_into(image, truth, x, y, beams=360):
+    """Marks free space and walls seen from (x, y) mm in image, like SLAM's map filling in."""
+    angles = np.radians(np.arange(beams) * 360 / beams)[:, None]
+    r = np.arange(0, RANGE_MM, MM_PER_PIXEL / 2)[None, :]
+    cols = np.clip(((x + r * np.cos(angles)) // MM_PER_PIXEL).astype(int), 0, SIZE_PIXELS - 1)
+    rows = np.clip(((y + r * np.sin(angles)) // MM_PER_PIXEL).astype(int), 0, SIZE_PIXELS - 1)
+    hits = truth[rows, cols]
+    first = np.where(hits.any(axis=1), hits.argmax(axis=1), r.shape[1])
+    seen = np.arange(r.shape[1])[None, :] < first[:, None]
+    image[rows[seen], cols[seen]] = 255
+    hit = first < r.shape[1]
+    image[rows[hit, first[hit]], cols[hit, first[hit]]] = 0
+
+
+def run():
+    truth = floor()
+    image = np.full((SIZE_PIXELS, SIZE_PIXELS), 127, dtype=np.uint8)
+    planner = Planner(GOAL, MM_PER_PIXEL)
+    x, y = START
+    rows = []
+    driven = 0.0
+    for step in range(400):
+        scan_into(image, truth, x, y)
+        before = planner.search.expanded if planner.search is not None else 0
+        started = time.perf_counter()
+        waypoints = planner.update(image.tobytes(), (x, y, 0.0))
+        incremental = time.perf_counter() - started
+        expanded = planner.search.expanded - before
+
+        started = time.perf_counter()
+        grid = blocked_cells(image, planner.cell_pixels, planner.radius_cells)
+        n = len(grid)
+        scratch = DStarLite(grid, planner.search.goal)
+        scratch.plan(planner.search.start)
+        scratch.path()
+        full = time.perf_counter() - started
+
+        rows.append((np.mean(image != 127), incremental, full, expanded, scratch.expanded))
+        if not waypoints or math.hypot(GOAL[0] - x, GOAL[1] - y) < WAYPOINT_TOLERANCE_MM:
+            break
+        # Drive STEP_MM along the waypoints
+        left = STEP_MM
+        while waypoints and left > 0:
+            dx, dy = waypoints[0][0] - x, waypoints[0][1] - y
+            d = math.hypot(dx, dy)
+            move = min(d, left)
+            if d > 0:
+                x, y = x + dx / d * move, y + dy / d * move
+            left -= move
+            driven += move
+            if move == d:
+                waypoints = waypoints[1:]
+    reached = math.hypot(GOAL[0] - x, GOAL[1] - y) < WAYPOINT_TOLERANCE_MM
+
+    print(f"{len(rows)} scans, {driven / 1000:.1f} m driven, goal {'reached' if reached else 'NOT reached'}, "
+          f"{n} x {n} cells; {planner.summary()}")
+    data = np.array(rows)
+    print(" map known | scans | incremental p50 / p95 ms | expansions | from scratch p50 / p95 ms | expansions")
+    for lo, hi in ((0, 0.25), (0.25, 0.5), (0.5, 0.75), (0.75, 1.01)):
+        part = data[(data[:, 0] >= lo) & (data[:, 0] < hi)]
+        if not len(part):
+            continue
+        print(f" {100 * lo:3.0f}-{min(100 * hi, 100):3.0f}%  | {len(part):5d} | "
+              f"{1000 * np.median(part[:, 1]):8.2f} / {1000 * np.percentile(part[:, 1], 95):7.2f} | {np.median(part[:, 3]):10.0f} | "
+              f"{1000 * np.median(part[:, 2]):10.2f} / {1000 * np.percentile(part[:, 2], 95):7.2f} | {np.median(part[:, 4]):10.0f}")
+    later = data[1:]
+    print(f"after the first plan: incremental {1000 * later[:, 1].mean():.2f} ms/scan, "
+          f"from scratch {1000 * later[:, 2].mean():.2f} ms/scan ({later[:, 2].mean() / later[:, 1].mean():.1f}x)")
+
+
+if __name__ == "__main__":
+    run()
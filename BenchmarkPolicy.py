@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import resource
+import subprocess
+import numpy as np
+import AIDriving
+from LidarSession import SessionReader
+
+# =========================
+# Offline policy benchmark: replay sessions through AIDriving's decision path
+# =========================
+# Feeds every scan of one or more recorded sessions through
+# AIDriving.preprocess_lidar_scan and AIDriving.predict, as control_robot
+# does, or --batch N scans at a time through their batch twins. Scans are
+# filtered the way the live pipeline filters them before timing starts:
+# ReplayLidar drops scans with fewer than 5 points, scan_thread drops points
+# with zero quality or distance, and control_robot skips empty scans.
+# Reports decisions/s, latency percentiles (per decision, or per batch),
+# a confusion matrix of chosen actions against the recorded labels, and
+# peak memory. Each run is appended as one JSON line to --out, tagged with
+# the commit and the model file's hash, so runs can be compared over time.
+#
+# Usage:
+#   python BenchmarkPolicy.py lidar_training_data.session
+#   python BenchmarkPolicy.py a.session b.session --inference int8 --model distilled/student_64x1_int8.pt --batch 64
+
+RESULTS_FILE = "policy_benchmark.jsonl"
+MIN_POINTS = 5     # ReplayLidar/RPLidar.iter_scans min_len
+WARMUP_DECISIONS = 20
+ACTIONS = ("forward", "left", "right")  # AIDriving.execute_action
+
+
+def load_scans(session_dirs):
+    """
+    The points control_robot would see, back to back: (angles, distances,
+    offsets, labels) for every scan it would act on.
+    """
+    angles, distances, labels, counts = [], [], [], []
+    for session_dir in session_dirs:
+        session = SessionReader(session_dir)
+        points = np.array(session.points)  # Off the memory map, so disk reads are not timed
+        offsets = session.offsets
+        keep = (points[:, 2] > 0) & (points[:, 1] > 0)
+        running = np.concatenate([[0], np.cumsum(keep)])
+        kept = running[offsets[1:]] - running[offsets[:-1]]  # Points left per scan
+        usable = (session.counts >= MIN_POINTS) & (kept > 0)
+        points_usable = np.repeat(usable, session.counts) & keep
+        angles.append(points[points_usable, 0])
+        distances.append(points[points_usable, 1])
+        labels.append(np.array(session.labels)[usable])
+        counts.append(kept[usable])
+        session.close()
+    counts = np.concatenate(counts)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    return np.concatenate(angles), np.concatenate(distances), offsets, np.concatenate(labels)
+
+
+def replay_single(angles, distances, offsets):
+    """One scan at a time, as control_robot runs. Returns actions, per-stage seconds and the total."""
+    n = len(offsets) - 1
+    actions = np.empty(n, dtype=np.int64)
+    preprocess, inference = np.empty(n), np.empty(n)
+    scans = [np.column_stack((angles[offsets[i]:offsets[i + 1]], distances[offsets[i]:offsets[i + 1]]))
+             for i in range(n)]  # (angle, distance) arrays as scan_thread publishes them
+    for scan in scans[:WARMUP_DECISIONS]:
+        AIDriving.predict(AIDriving.preprocess_lidar_scan(scan))
+    began = time.perf_counter()
+    for i, scan in enumerate(scans):
+        start = time.perf_counter()
+        input_data = AIDriving.preprocess_lidar_scan(scan)
+        mid = time.perf_counter()
+        _, actions[i] = AIDriving.predict(input_data)
+        preprocess[i], inference[i] = mid - start, time.perf_counter() - mid
+    return actions, preprocess, inference, time.perf_counter() - began
+
+
+def replay_batched(angles, distances, offsets, batch):
+    """batch scans per call. Returns actions, per-batch stage seconds and the total."""
+    n = len(offsets) - 1
+    actions = np.empty(n, dtype=np.int64)
+    starts = range(0, n, batch)
+    preprocess, inference = np.empty(len(starts)), np.empty(len(starts))
+
+    def run(first):
+        bounds = offsets[first:first + batch + 1]
+        begin, end = bounds[0], bounds[-1]
+        inputs = AIDriving.preprocess_lidar_batch(angles[begin:end], distances[begin:end], bounds - begin)
+        mid = time.perf_counter()
+        return mid, AIDriving.predict_batch(inputs)[1]
+
+    run(0)  # Warm-up, also grows the binner's buffer once
+    began = time.perf_counter()
+    for i, first in enumerate(starts):
+        start = time.perf_counter()
+        mid, chosen = run(first)
+        actions[first:first + len(chosen)] = chosen
+        preprocess[i], inference[i] = mid - start, time.perf_counter() - mid
+    return actions, preprocess, inference, time.perf_counter() - began
+
+
+def percentiles_ms(seconds):
+    summary = {f"p{q}": float(np.percentile(seconds, q) * 1000) for q in (50, 95, 99)}
+    summary['max'] = float(seconds.max() * 1000)
+    return summary
+
+
+def confusion(labels, actions, num_actions):
+    """Confusion matrix (rows: recorded label, columns: chosen action) with accuracy and per-action recall/precision."""
+    labelled = labels >= 0  # Backends.RECORD_LABEL marks scans recorded without an action
+    size = max(num_actions, int(labels.max()) + 1 if labelled.any() else 0)
+    matrix = np.zeros((size, size), dtype=np.int64)
+    np.add.at(matrix, (labels[labelled], actions[labelled]), 1)
+    hits = np.diag(matrix)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        recall = np.where(matrix.sum(axis=1) > 0, hits / matrix.sum(axis=1), np.nan)
+        precision = np.where(matrix.sum(axis=0) > 0, hits / matrix.sum(axis=0), np.nan)
+    return {'labelled_scans': int(labelled.sum()),
+            'accuracy': float(hits.sum() / max(labelled.sum(), 1)),
+            'matrix': matrix.tolist(),
+            'recall': [None if np.isnan(r) else float(r) for r in recall],
+            'precision': [None if np.isnan(p) else float(p) for p in precision]}
+
+
+def rss_mb():
+    """Current resident set size (Linux)."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3  # KB on Linux
+
+
+def commit():
+    """Short hash of the checked-out commit, with '+dirty' for uncommitted changes; None outside git."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        head = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here, capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return head.stdout.strip() + ("+dirty" if dirty.stdout.strip() else "")
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def run(session_dirs, backend, model_file=None, batch=None):
+    """Replays the sessions and returns the result record."""
+    model_file = model_file or AIDriving.MODEL_FILES[backend]
+    AIDriving.load_model(backend, model_file)
+    angles, distances, offsets, labels = load_scans(session_dirs)
+    num_scans = len(labels)
+    if num_scans == 0:
+        raise ValueError(f"no usable scans in {', '.join(session_dirs)}")
+    rss_before = rss_mb()
+
+    if batch:
+        actions, preprocess, inference, wall = replay_batched(angles, distances, offsets, batch)
+    else:
+        actions, preprocess, inference, wall = replay_single(angles, distances, offsets)
+
+    num_actions = AIDriving.predict_batch(np.zeros((1, AIDriving.input_size), dtype=np.float32))[0].shape[1]
+    return {
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'commit': commit(),
+        'model': model_file, 'model_sha256': file_hash(model_file), 'inference': backend,
+        'sessions': list(session_dirs), 'scans': num_scans,
+        'mode': f"batch {batch}" if batch else "single",
+        'decisions_per_s': num_scans / wall,
+        'latency_unit': f"batch of {batch}" if batch else "decision",
+        'latency_ms': percentiles_ms(preprocess + inference),
+        'preprocess_ms': percentiles_ms(preprocess),
+        'inference_ms': percentiles_ms(inference),
+        'confusion': confusion(labels, actions, num_actions),
+        'action_counts': np.bincount(actions, minlength=num_actions).tolist(),
+        'rss_mb_before_replay': rss_before,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def print_record(record):
+    print(f"{record['scans']} scans from {', '.join(record['sessions'])}, {record['inference']} {record['model']}, {record['mode']}")
+    print(f"  {record['decisions_per_s']:.0f} decisions/s")
+    for stage in ('latency_ms', 'preprocess_ms', 'inference_ms'):
+        p = record[stage]
+        print(f"  {stage[:-3]:<10} per {record['latency_unit']}: p50 {p['p50']:.3f} ms  p95 {p['p95']:.3f} ms  "
+              f"p99 {p['p99']:.3f} ms  max {p['max']:.3f} ms")
+    c = record['confusion']
+    names = [ACTIONS[i] if i < len(ACTIONS) else str(i) for i in range(len(c['matrix']))]
+    print(f"  accuracy vs labels {c['accuracy'] * 100:.1f}% over {c['labelled_scans']} labelled scans "
+          f"(rows: label, columns: action)")
+    width = max(len(name) for name in names) + 2
+    print(" " * width + "".join(name.rjust(width) for name in names) + "recall".rjust(width))
+    for name, row, recall in zip(names, c['matrix'], c['recall']):
+        print(name.rjust(width) + "".join(str(v).rjust(width) for v in row)
+              + ("-" if recall is None else f"{recall * 100:.1f}%").rjust(width))
+    print(f"  memory: {record['rss_mb_before_replay']:.0f} MB resident before replay, peak {record['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded sessions through the driving policy offline.")
+    parser.add_argument('sessions', nargs='+', help="session directories (see LidarSession.py)")
+    parser.add_argument('--inference', choices=list(AIDriving.MODEL_FILES), default=AIDriving.INFERENCE_BACKEND,
+                        help="runtime for the network (default: %(default)s)")
+    parser.add_argument('--model', help="model file (default: AIDriving's file for the runtime)")
+    parser.add_argument('--batch', type=int, help="decide N scans per call instead of one at a time")
+    parser.add_argument('--out', default=RESULTS_FILE, help="JSON lines file to append the result to (default: %(default)s)")
+    args = parser.parse_args()
+
+    record = run(args.sessions, args.inference, args.model, args.batch)
+    print_record(record)
+    with open(args.out, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"Appended to {args.out}")
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from LidarSession import SessionWriter
+from MapRender import polar_to_cartesian, render_points, render_batch, write_png
+
+# =========================
+# Map rendering benchmark: scalar loop + plt.scatter vs NumPy raster
+# =========================
+# Renders the same synthetic capture with the old plot_lidar_data loop
+# (saved through matplotlib's Agg backend, so no display is needed) and with
+# MapRender, then renders a directory of sessions serially and across all
+# cores.
+# Usage: python BenchmarkRender.py [points] [sessions]
+
+
+def make_points(n):
+    rng = np.random.default_rng(0)
+    angles = rng.uniform(0, 360, n)
+    distances = 3000 + 1000 * np.sin(np.radians(angles) * 3) + rng.normal(0, 20, n)
+    return np.column_stack([angles, distances])
+
+
+def legacy_render(lidar_data, path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    x_points = []
+    y_points = []
+    for angle, distance in lidar_data:
+        angle_rad = np.radians(angle)
+        x_points.append(distance * np.cos(angle_rad) * -1)
+        y_points.append(distance * np.sin(angle_rad))
+    plt.figure(figsize=(10, 10))
+    plt.scatter(x_points, y_points, s=10, c='red')
+    plt.axis('equal')
+    plt.savefig(path)
+    plt.close()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def run(n=1_000_000, sessions=16):
+    points = make_points(n)
+    x, y = polar_to_cartesian(points[:, 0], points[:, 1])
+    angle, distance = points[123]
+    assert np.isclose(x[123], -distance * np.cos(np.radians(angle))) and np.isclose(y[123], distance * np.sin(np.radians(angle)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        new = timed(lambda: write_png(os.path.join(tmp, "new.png"), render_points(points)))
+        old = timed(legacy_render, points, os.path.join(tmp, "old.png"))
+        print(f"{n} points: scalar loop + scatter {old:.2f}s, raster + PNG {new:.3f}s ({old / new:.0f}x)")
+
+        captures = os.path.join(tmp, "captures")
+        os.makedirs(captures)
+        scan = np.column_stack([np.full(250, 15.0), points[:250]])  # (quality, angle, distance)
+        for i in range(sessions):
+            with SessionWriter(os.path.join(captures, f"s{i}.session"), flush_every=1024) as writer:
+                for _ in range(n // 250):
+                    writer.append(scan, -1)
+        serial = timed(render_batch, captures, os.path.join(tmp, "serial"), 1000, None, 'density', 'png', 1)
+        parallel = timed(render_batch, captures, os.path.join(tmp, "parallel"), 1000, None, 'density', 'png', None)
+        print(f"{sessions} sessions x {n} points: 1 process {serial:.2f}s, "
+              f"{os.cpu_count()} processes {parallel:.2f}s ({serial / parallel:.1f}x)")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 16)
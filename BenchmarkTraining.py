@@ -0,0 +1,101 @@
+import sys
+import time
+import runpy
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader, TensorDataset
+from EpochEngine import set_threads, train_epoch, evaluate
+from Augmentation import ScanAugmenter
+
+# =========================
+# Training epochs/s: DataLoader loop vs the in-memory epoch engine
+# =========================
+# Times whole epochs (train + validation) of NeuralNetworkTraining's
+# RobotNN on 6300 samples, 80/20 split as train_model does, with the old
+# DataLoader loop and with EpochEngine. A smaller network is timed too,
+# where the per-step overhead the engine removes is a bigger share, and
+# the engine is timed again with training augmentation (Augmentation.py).
+# Usage: python BenchmarkTraining.py [dataset]
+# Without a dataset, random scans with 4 labels stand in for the real ones
+# (timing does not depend on the values).
+
+SAMPLES = 6300
+INPUT_SIZE = 360
+EPOCHS = 3
+
+
+def old_epoch(model, train_loader, val_loader, criterion, optimizer):
+    """The loop train_model ran before EpochEngine."""
+    model.train()
+    epoch_train_loss = 0
+    for X_batch, y_batch in train_loader:
+        optimizer.zero_grad()
+        loss = criterion(model(X_batch), y_batch)
+        loss.backward()
+        optimizer.step()
+        epoch_train_loss += loss.item()
+    model.eval()
+    val_loss = 0
+    with torch.no_grad():
+        for X_batch, y_batch in val_loader:
+            val_loss += criterion(model(X_batch), y_batch).item()
+    return epoch_train_loss / len(train_loader), val_loss / len(val_loader)
+
+
+def new_epoch(model, data, criterion, optimizer, batch_size, augment=None):
+    X_train, X_val, y_train, y_val = data
+    return (train_epoch(model, X_train, y_train, criterion, optimizer, batch_size, augment=augment),
+            evaluate(model, X_val, y_val, criterion))
+
+
+def epochs_per_second(make_model, data, batch_size, engine, augment=None):
+    torch.manual_seed(0)
+    model = make_model()
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=0.0005, weight_decay=1e-4)
+    X_train, X_val, y_train, y_val = data
+    if engine:
+        run = lambda: new_epoch(model, data, criterion, optimizer, batch_size, augment)
+    else:
+        train_loader = DataLoader(TensorDataset(X_train, y_train), batch_size=batch_size, shuffle=True, pin_memory=True)
+        val_loader = DataLoader(TensorDataset(X_val, y_val), batch_size=batch_size, pin_memory=True)
+        run = lambda: old_epoch(model, train_loader, val_loader, criterion, optimizer)
+    run()  # Warm-up
+    start = time.perf_counter()
+    for _ in range(EPOCHS):
+        run()
+    return EPOCHS / (time.perf_counter() - start)
+
+
+def load(path=None):
+    if path is None:
+        rng = np.random.default_rng(0)
+        X = rng.uniform(0, 1, (SAMPLES, INPUT_SIZE)).astype(np.float32)
+        y = rng.integers(0, 4, SAMPLES)
+    else:
+        from DatasetLoader import load_dataset
+        X, y = load_dataset(path)
+    split = int(len(X) * 0.8)
+    return (torch.tensor(X[:split]), torch.tensor(X[split:]),
+            torch.tensor(y[:split], dtype=torch.long), torch.tensor(y[split:], dtype=torch.long))
+
+
+def run():
+    training = runpy.run_path("NeuralNetworkTraining")  # Not a module name; __main__ does not run
+    RobotNN, batch_size = training['RobotNN'], training['batch_size']
+    data = load(sys.argv[1] if len(sys.argv) > 1 else None)
+    threads = set_threads()
+    print(f"{len(data[0]) + len(data[1])} samples, batch {batch_size}, {threads} torch threads, {EPOCHS} timed epochs")
+    for label, hidden in (("RobotNN, hidden 1536", training['hidden_size']), ("RobotNN, hidden 128", 128)):
+        make_model = lambda: RobotNN(input_size=INPUT_SIZE, hidden_size=hidden)
+        old = epochs_per_second(make_model, data, batch_size, engine=False)
+        new = epochs_per_second(make_model, data, batch_size, engine=True)
+        augmented = epochs_per_second(make_model, data, batch_size, engine=True, augment=ScanAugmenter())
+        print(f"{label}: DataLoader loop {old:.2f} epochs/s, epoch engine {new:.2f} epochs/s ({new / old:.2f}x), "
+              f"with augmentation {augmented:.2f} epochs/s")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,84 @@
+import os
+import time
+import threading
+import torch
+
+# =========================
+# Background checkpoint writer for training
+# =========================
+# torch.save of a 1536-wide RobotNN writes ~20 MB; doing it inside the
+# epoch loop stalls training for as long as the disk takes. save() only
+# takes a private in-memory copy of the state (model, optimizer, ...) and
+# returns; a writer thread serializes it to a temporary file and renames it
+# into place, so a crash never leaves a half-written checkpoint. If a newer
+# state for the same path arrives before the older one was written, only
+# the newer one is written.
+
+
+def snapshot(state):
+    """A copy of nested dicts/lists/tuples of tensors that training can no longer change."""
+    if isinstance(state, torch.Tensor):
+        return state.detach().to('cpu', copy=True)
+    if isinstance(state, dict):
+        return {key: snapshot(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot(value) for value in state)
+    return state
+
+
+class CheckpointWriter:
+    """
+    Usage:
+        writer = CheckpointWriter()
+        writer.save("best_model.pth", model.state_dict())   # returns at once
+        writer.close()   # waits for pending writes; raises if one failed
+    """
+
+    def __init__(self):
+        self._pending = {}  # path -> newest state not yet written
+        self._wake = threading.Condition()
+        self._closed = False
+        self._error = None
+        self.saves = self.writes = 0
+        self.stall = 0.0  # Seconds the training thread spent in save()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def save(self, path, state):
+        started = time.perf_counter()
+        state = snapshot(state)
+        with self._wake:
+            if self._error is not None:
+                raise self._error
+            self._pending[path] = state
+            self.saves += 1
+            self._wake.notify()
+        self.stall += time.perf_counter() - started
+
+    def _run(self):
+        while True:
+            with self._wake:
+                while not self._pending and not self._closed:
+                    self._wake.wait()
+                if not self._pending:
+                    return
+                path, state = self._pending.popitem()
+            try:
+                tmp_path = f"{path}.tmp"
+                torch.save(state, tmp_path)
+                os.replace(tmp_path, path)
+                self.writes += 1
+            except Exception as e:  # Reported to the training thread on its next save or close
+                with self._wake:
+                    self._error = e
+
+    def close(self):
+        with self._wake:
+            self._closed = True
+            self._wake.notify()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def summary(self):
+        return f"{self.saves} checkpoints saved, {self.writes} written, training stalled {self.stall * 1000:.0f} ms"
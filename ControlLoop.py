@@ -0,0 +1,75 @@
+import time
+import threading
+from collections import deque
+import numpy as np
+
+# =========================
+# Building blocks for event-driven control loops
+# =========================
+# LatestScan hands the newest Lidar scan from the scan thread to the
+# controller and wakes it only when a new scan arrives. LoopStats tracks
+# decision rate and scan-to-actuation latency. Timed, pre-emptible motor
+# moves live in MotorControl.py.
+
+
+class LatestScan:
+    """
+    Holds the most recent scan, tagged with a sequence number and the time it
+    arrived. Older scans are simply replaced: the controller always acts on
+    the newest one.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._scan = None
+        self._seq = 0
+        self._stamp = 0.0
+        self._closed = False
+
+    def publish(self, scan):
+        """Stores a new scan and wakes any waiting controller. Returns its sequence number."""
+        with self._cond:
+            self._scan = scan
+            self._seq += 1
+            self._stamp = time.perf_counter()
+            self._cond.notify_all()
+            return self._seq
+
+    def wait_newer(self, last_seq, timeout=None):
+        """
+        Blocks until a scan newer than last_seq is published.
+        Returns (seq, scan, arrival time), or None on timeout or close().
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != last_seq or self._closed, timeout)
+            if self._seq == last_seq or self._closed:
+                return None
+            return self._seq, self._scan, self._stamp
+
+    def close(self):
+        """Releases every waiting controller."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class LoopStats:
+    """Decision rate and scan-to-actuation latency over the last `window` decisions."""
+
+    def __init__(self, window=1000):
+        self.started = time.perf_counter()
+        self.decisions = 0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, scan_stamp):
+        """Call right after actuating on the scan that arrived at scan_stamp."""
+        self.decisions += 1
+        self.latencies.append(time.perf_counter() - scan_stamp)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.decisions / elapsed if elapsed > 0 else 0.0
+        if not self.latencies:
+            return f"{self.decisions} decisions, {rate:.1f}/s"
+        p50, p99 = np.percentile(self.latencies, [50, 99]) * 1000
+        return f"{self.decisions} decisions, {rate:.1f}/s, scan-to-actuation p50 {p50:.1f} ms, p99 {p99:.1f} ms"
@@ -0,0 +1,162 @@
+import os
+import csv
+import json
+import glob
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from ScanBinning import ScanBinner, NORMALIZATIONS
+from LidarSession import SessionReader, is_session, INDEX_FILE, POINTS_FILE
+from DatasetManifest import Dataset, is_dataset
+
+# =========================
+# Parallel, cached training data loader
+# =========================
+# Parses and bins a CSV or session into (X, y) arrays, then caches them keyed
+# by the source's content hash and the binning parameters. Editing the data
+# or changing a parameter changes the key, so stale results are never used.
+# A multi-session dataset (DatasetManifest.py) is loaded and cached shard by
+# shard, so recording a new session only bins the new shard, and shards that
+# were not selected are never opened.
+
+CACHE_DIR = ".dataset_cache"
+CACHE_VERSION = 1  # Bump when the parsing or binning code changes its output
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024  # Smaller CSVs parse faster in one process
+
+
+def content_hash(path):
+    """SHA-256 of a CSV file, or of both files of a session directory."""
+    digest = hashlib.sha256()
+    files = [os.path.join(path, INDEX_FILE), os.path.join(path, POINTS_FILE)] if is_session(path) else [path]
+    for file_path in files:
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(source_hash, max_length, normalization, bin_mode):
+    params = json.dumps({'version': CACHE_VERSION, 'max_length': max_length,
+                         'normalization': normalization, 'bin_mode': bin_mode}, sort_keys=True)
+    return hashlib.sha256((source_hash + params).encode()).hexdigest()[:20]
+
+
+def _chunk_ranges(csv_file, num_chunks):
+    """Splits a file into byte ranges that start and end on line boundaries."""
+    size = os.path.getsize(csv_file)
+    bounds = [0]
+    with open(csv_file, 'rb') as f:
+        for i in range(1, num_chunks):
+            f.seek(max(size * i // num_chunks, bounds[-1]))
+            f.readline()  # Move to the start of the next line
+            bounds.append(min(f.tell(), size))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def _bin_csv_chunk(csv_file, start, end, max_length, bin_mode):
+    """Parses and bins the CSV rows in [start, end). Runs in a worker process."""
+    with open(csv_file, 'rb') as f:
+        f.seek(start)
+        lines = f.read(end - start).decode().splitlines()
+
+    points, lengths, labels = [], [], []
+    for row in csv.reader(lines):
+        if len(row) < 2:
+            continue
+        scan = json.loads(row[0])
+        points.extend(scan)
+        lengths.append(len(scan))
+        labels.append(int(row[1]))
+
+    offsets = np.concatenate(([0], np.cumsum(lengths, dtype=np.int64)))
+    points = np.array(points, dtype=np.float64).reshape(-1, 2)
+    binner = ScanBinner(max_length=max_length, max_scans=len(lengths), mode=bin_mode)
+    return binner.bin_batch(points[:, 0], points[:, 1], offsets), np.array(labels, dtype=np.int64)
+
+
+def bin_csv(csv_file, max_length=360, bin_mode='last', workers=None):
+    """
+    Parses and bins the old JSON-in-CSV format across a process pool.
+    Returns un-normalized X and the labels y.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or os.path.getsize(csv_file) < PARALLEL_MIN_BYTES:
+        return _bin_csv_chunk(csv_file, 0, os.path.getsize(csv_file), max_length, bin_mode)
+
+    ranges = _chunk_ranges(csv_file, workers * 4)  # A few chunks per worker to even out the load
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_bin_csv_chunk, csv_file, start, end, max_length, bin_mode) for start, end in ranges]
+        parts = [future.result() for future in futures]
+    return np.concatenate([X for X, _ in parts]), np.concatenate([y for _, y in parts])
+
+
+def bin_session(session_dir, max_length=360, bin_mode='last'):
+    """Bins a LidarSession straight from its memory-mapped arrays."""
+    with SessionReader(session_dir) as session:
+        binner = ScanBinner(max_length=max_length, max_scans=len(session), mode=bin_mode)
+        X = binner.bin_batch(session.angles, session.distances, session.offsets)
+        return X, np.array(session.labels, dtype=np.int64)
+
+
+def load_dataset(path, max_length=360, normalization='global', bin_mode='last', workers=None, cache_dir=CACHE_DIR,
+                 shards=None, since=None, until=None):
+    """
+    Loads a CSV file, session directory or dataset directory as binned,
+    normalized (X, y). For a dataset, shards/since/until pick the sessions
+    (see Dataset.select); by default all of them are loaded.
+    normalization=None leaves the distances in mm.
+    Results are cached in cache_dir; pass cache_dir=None to always rebuild.
+    """
+    if normalization is not None and normalization not in NORMALIZATIONS:
+        raise ValueError(f"Unknown normalization {normalization!r}, expected one of {tuple(NORMALIZATIONS)}")
+    if is_dataset(path):
+        return load_shards(path, shards, since, until, max_length, normalization, bin_mode, workers, cache_dir)
+
+    cache_file = None
+    if cache_dir is not None:
+        key = cache_key(content_hash(path), max_length, normalization, bin_mode)
+        # Same-named sources in different directories must not evict each other's entries
+        source = os.path.abspath(path)
+        source_id = hashlib.sha256(source.encode()).hexdigest()[:8]
+        prefix = os.path.join(cache_dir, f"{os.path.basename(source)}-{source_id}")
+        cache_file = f"{prefix}-{key}.npz"
+        if os.path.exists(cache_file):
+            with np.load(cache_file) as cached:
+                return cached['X'], cached['y']
+
+    if is_session(path):
+        X, y = bin_session(path, max_length, bin_mode)
+    else:
+        X, y = bin_csv(path, max_length, bin_mode, workers)
+    if normalization is not None:
+        NORMALIZATIONS[normalization](X)
+
+    if cache_file is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        for stale in glob.glob(f"{glob.escape(prefix)}-{'?' * len(key)}.npz"):  # Older versions of this source
+            os.remove(stale)
+        tmp_file = f"{cache_file}.tmp.npz"
+        np.savez(tmp_file, X=X, y=y)
+        os.replace(tmp_file, cache_file)  # Never leave a half-written cache behind
+    return X, y
+
+
+def load_shards(dataset_dir, shards=None, since=None, until=None, max_length=360, normalization='global',
+                bin_mode='last', workers=None, cache_dir=CACHE_DIR):
+    """
+    Loads the selected shards of a dataset, each through load_dataset's
+    cache. Global normalization scales by the maximum over the whole
+    selection, so shards are loaded in mm and normalized once joined.
+    """
+    dataset = Dataset(dataset_dir)
+    names = [name for name in dataset.select(shards, since, until) if dataset.shards[name]['scans']]
+    if not names:
+        raise ValueError(f"no scans in the selected shards of {dataset_dir}")
+    per_shard = None if normalization == 'global' else normalization
+    parts = [load_dataset(dataset.shard_path(name), max_length, per_shard, bin_mode, workers, cache_dir) for name in names]
+    X = np.concatenate([X for X, _ in parts])
+    y = np.concatenate([y for _, y in parts])
+    if normalization == 'global':
+        NORMALIZATIONS[normalization](X)
+    return X, y
@@ -0,0 +1,261 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+from LidarSession import SessionWriter, SessionReader, is_session, convert_csv, INDEX_FILE, HEADER_SIZE, INDEX_DTYPE
+
+# =========================
+# Multi-session dataset with a manifest
+# =========================
+# A dataset is a directory of shards, one LidarSession per recording run,
+# plus manifest.json holding each shard's scan and point counts, label
+# histogram and first/last timestamp. ShardWriter updates the counts as
+# scans are appended and rewrites the manifest (atomically) every time the
+# session is flushed, so statistics never need to read scan data. If a run
+# crashed between a flush of the session and of the manifest, the next open
+# notices from the index file's size and recounts just that shard.
+# Shards can be listed, selected by name or time, imported and dropped; the
+# training loader (DatasetLoader.load_dataset) reads only the selected ones.
+#
+# Usage:
+#   python DatasetManifest.py lidar_training_data.dataset stats
+#   python DatasetManifest.py lidar_training_data.dataset import lidar_training_data.session
+#   python DatasetManifest.py lidar_training_data.dataset drop session-20260101-120000
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+ACTIONS = {0: "Forward", 1: "Left", 2: "Right", 3: "Stop"}  # AITraining.py's keys W/A/D/S
+
+
+def is_dataset(path):
+    """True if path is a dataset directory."""
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def _scans_on_disk(session_dir):
+    """Complete index records in a session, from the file size alone."""
+    return (os.path.getsize(os.path.join(session_dir, INDEX_FILE)) - HEADER_SIZE) // INDEX_DTYPE.itemsize
+
+
+def _time(value):
+    """JSON has no NaN: sessions converted from CSV have no timestamps."""
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def shard_stats(session_dir):
+    """Counts a session's scans, points, labels and time range by reading its index."""
+    with SessionReader(session_dir) as session:
+        labels, counts = np.unique(session.labels, return_counts=True)
+        times = np.asarray(session.timestamps, dtype=np.float64)
+        times = times[~np.isnan(times)]
+        return {'scans': len(session), 'points': int(session.counts.sum()),
+                'labels': {str(label): int(count) for label, count in zip(labels, counts)},
+                'first': _time(times.min()) if len(times) else None,
+                'last': _time(times.max()) if len(times) else None}
+
+
+class ShardWriter(SessionWriter):
+    """
+    SessionWriter for one shard of a Dataset. Keeps the shard's entry in the
+    manifest current with every append and saves the manifest on each flush.
+    """
+
+    def __init__(self, dataset, name, flush_every=32):
+        super(ShardWriter, self).__init__(dataset.shard_path(name), flush_every)
+        self.dataset = dataset
+        self.name = name
+        self.stats = dataset.shards[name]
+
+    def append(self, scan, label, timestamp=None):
+        super(ShardWriter, self).append(scan, label, timestamp)
+        stats = self.stats
+        stats['scans'] += 1
+        stats['points'] += int(self._record['count'][0])
+        key = str(int(label))
+        stats['labels'][key] = stats['labels'].get(key, 0) + 1
+        stamp = _time(self._record['timestamp'][0])
+        if stamp is not None:
+            stats['first'] = stamp if stats['first'] is None else min(stats['first'], stamp)
+            stats['last'] = stamp if stats['last'] is None else max(stats['last'], stamp)
+
+    def flush(self):
+        super(ShardWriter, self).flush()  # Session first: the manifest never counts scans that are not on disk
+        self.dataset.save()
+
+
+class Dataset:
+    """
+    Usage:
+        dataset = Dataset("lidar_training_data.dataset")
+        with dataset.new_shard() as writer:
+            writer.append(scan, label)
+        dataset.stats()                          # instant, from the manifest
+        dataset.select(since=time.time() - 86400)
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.manifest_path = os.path.join(root, MANIFEST_FILE)
+        os.makedirs(root, exist_ok=True)
+        self.shards = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest.get('version') != MANIFEST_VERSION:
+                raise ValueError(f"{self.manifest_path} has unsupported version {manifest.get('version')}")
+            self.shards = manifest['shards']
+        if self._reconcile() or not os.path.exists(self.manifest_path):
+            self.save()
+
+    def _reconcile(self):
+        """Brings the manifest in line with the shards on disk; True if anything changed."""
+        changed = False
+        for name in list(self.shards):
+            path = self.shard_path(name)
+            if not is_session(path):
+                print(f"Shard {name} is missing from {self.root}, dropping it from the manifest")
+                del self.shards[name]
+                changed = True
+            elif _scans_on_disk(path) != self.shards[name]['scans']:
+                self.shards[name].update(shard_stats(path))  # Crashed before the manifest caught up
+                changed = True
+        for name in sorted(os.listdir(self.root)):
+            if name not in self.shards and is_session(self.shard_path(name)):
+                self.shards[name] = dict(shard_stats(self.shard_path(name)), created=time.time())
+                changed = True
+        return changed
+
+    def shard_path(self, name):
+        return os.path.join(self.root, name)
+
+    def save(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'shards': self.shards}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)  # Never leave a half-written manifest behind
+
+    def _new_name(self, name=None):
+        name = name or time.strftime("session-%Y%m%d-%H%M%S")
+        base, suffix = name, 1
+        while name in self.shards or os.path.exists(self.shard_path(name)):
+            suffix += 1
+            name = f"{base}-{suffix}"
+        return name
+
+    def new_shard(self, name=None, flush_every=32):
+        """Starts a new shard and returns its ShardWriter."""
+        name = self._new_name(name)
+        self.shards[name] = {'scans': 0, 'points': 0, 'labels': {}, 'first': None, 'last': None, 'created': time.time()}
+        return ShardWriter(self, name, flush_every)
+
+    def import_path(self, path, name=None):
+        """Copies a session directory, or converts an old CSV, into a new shard; returns its name."""
+        name = self._new_name(name or os.path.splitext(os.path.basename(os.path.normpath(path)))[0])
+        if is_session(path):
+            shutil.copytree(path, self.shard_path(name))
+        else:
+            convert_csv(path, self.shard_path(name))
+        self.shards[name] = dict(shard_stats(self.shard_path(name)), created=time.time())
+        self.save()
+        return name
+
+    def drop(self, name):
+        """Deletes a shard and its data."""
+        if name not in self.shards:
+            raise KeyError(f"no shard {name!r} in {self.root}")
+        shutil.rmtree(self.shard_path(name))  # If this is interrupted, the next open forgets the shard anyway
+        del self.shards[name]
+        self.save()
+
+    def _check_names(self, names):
+        unknown = [name for name in names or () if name not in self.shards]
+        if unknown:
+            raise KeyError(f"no shard {', '.join(map(repr, unknown))} in {self.root}")
+
+    def select(self, names=None, since=None, until=None):
+        """
+        Shard names, oldest first: the given names (all if None) whose
+        recordings overlap [since, until] (Unix times; None is open-ended).
+        Shards without timestamps only match when no time range is given.
+        """
+        self._check_names(names)
+        chosen = []
+        for name in names if names is not None else self.shards:
+            shard = self.shards[name]
+            if since is not None or until is not None:
+                if shard['first'] is None:
+                    continue
+                if (since is not None and shard['last'] < since) or (until is not None and shard['first'] > until):
+                    continue
+            chosen.append(name)
+        def started(name):
+            shard = self.shards[name]
+            return (shard['created'] if shard['first'] is None else shard['first'], name)
+        return sorted(chosen, key=started)
+
+    def stats(self, names=None):
+        """Totals over the given shards (all if None), from the manifest alone."""
+        self._check_names(names)
+        names = list(self.shards) if names is None else names
+        labels = {}
+        for name in names:
+            for label, count in self.shards[name]['labels'].items():
+                labels[int(label)] = labels.get(int(label), 0) + count
+        firsts = [self.shards[name]['first'] for name in names if self.shards[name]['first'] is not None]
+        lasts = [self.shards[name]['last'] for name in names if self.shards[name]['last'] is not None]
+        return {'shards': len(names), 'scans': sum(self.shards[name]['scans'] for name in names),
+                'points': sum(self.shards[name]['points'] for name in names), 'labels': labels,
+                'first': min(firsts) if firsts else None, 'last': max(lasts) if lasts else None}
+
+
+def format_stats(stats):
+    """Human-readable lines for Dataset.stats(); Stop scans are left out of the training total, as before."""
+    trained = stats['scans'] - stats['labels'].get(3, 0)
+    lines = [f"Total sets of training data: {trained} ({stats['scans']} scans in {stats['shards']} shards)"]
+    if stats['first'] is not None:
+        lines.append(f"Recorded {time.strftime('%Y-%m-%d %H:%M', time.localtime(stats['first']))} to "
+                     f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(stats['last']))}")
+    lines.append("Action distribution:")
+    for label in (0, 1, 2):
+        count = stats['labels'].get(label, 0)
+        lines.append(f"  {ACTIONS[label]}: {count} {count / trained * 100 if trained else 0:.2f}%")
+    return lines
+
+
+def print_shards(dataset):
+    print(f"{'shard':<28}{'scans':>8}{'fwd':>7}{'left':>7}{'right':>7}{'stop':>7}  recorded")
+    for name in dataset.select():
+        shard = dataset.shards[name]
+        counts = [shard['labels'].get(str(label), 0) for label in ACTIONS]
+        when = time.strftime('%Y-%m-%d %H:%M', time.localtime(shard['first'])) if shard['first'] is not None else "-"
+        print(f"{name:<28}{shard['scans']:>8}" + "".join(f"{count:>7}" for count in counts) + f"  {when}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and edit a multi-session training dataset.")
+    parser.add_argument('dataset', help="dataset directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help="per-shard and total statistics")
+    importer = commands.add_parser('import', help="copy a session or convert a CSV into a new shard")
+    importer.add_argument('path')
+    importer.add_argument('--name', help="shard name (default: from the path)")
+    dropper = commands.add_parser('drop', help="delete a shard")
+    dropper.add_argument('name')
+    args = parser.parse_args()
+
+    if args.command != 'import' and not is_dataset(args.dataset):
+        print(f"{args.dataset} is not a dataset")
+        sys.exit(1)
+    dataset = Dataset(args.dataset)
+    if args.command == 'import':
+        name = dataset.import_path(args.path, args.name)
+        print(f"Imported {args.path} as {name} ({dataset.shards[name]['scans']} scans)")
+    elif args.command == 'drop':
+        dataset.drop(args.name)
+        print(f"Dropped {args.name}")
+    else:
+        print_shards(dataset)
+        print("\n".join(format_stats(dataset.stats())))
@@ -0,0 +1,230 @@
+import os
+import time
+import runpy
+import argparse
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+import torch.optim as optim
+from RobotModel import RobotNN, StudentNN
+from NumpyInference import NumpyRobotNN, export_weights, softmax
+from EpochEngine import set_threads, train_epoch, evaluate, EarlyStopping
+from Sweep import write_results, print_results
+
+# =========================
+# Distill and quantize best_model.pth into small, fast students
+# =========================
+# The deployed RobotNN spends ~2.5M multiply-adds per decision. This trains
+# StudentNNs of several widths and depths to match its outputs (knowledge
+# distillation: the teacher's softened probabilities plus the true labels),
+# then applies post-training dynamic int8 quantization to every model.
+# Each student is exported as .pth, as .npz for the NumPy runtime and as a
+# TorchScript int8 .pt (AIDriving.py --inference int8), and measured on the
+# validation split (the trainer's 80/20 split, which the teacher has not
+# seen), and per one-scan decision on this CPU through the runtime that runs it.
+# The table goes to <out>/distill_results.csv; the pick is the fastest
+# model within --tolerance accuracy points of the teacher.
+#
+# Usage:
+#   python Distill.py lidar_training_data.session
+#   python Distill.py data.csv --teacher best_model.pth --widths 32,64,128,256 --depths 1,2 --tolerance 0.5
+
+DISTILL_DIR = "distilled"
+RESULTS_FILE = "distill_results.csv"
+WIDTHS = (64, 128, 256)
+DEPTHS = (1, 2)
+TEMPERATURE = 4.0  # Softens the teacher's probabilities so runner-up actions carry signal
+ALPHA = 0.7        # Weight of matching the teacher vs the true labels
+TOLERANCE = 1.0    # Accuracy points below the teacher a pick may be
+LATENCY_RUNS = 2000
+TRAINING_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "NeuralNetworkTraining")
+
+
+class DistillationLoss(nn.Module):
+    """
+    alpha * T^2 * KL(teacher || student) at temperature T, plus (1 - alpha) *
+    cross-entropy with the labels. The target packs the teacher's logits and
+    the label as its last column, so EpochEngine slices both in one go.
+    """
+
+    def __init__(self, temperature=TEMPERATURE, alpha=ALPHA):
+        super(DistillationLoss, self).__init__()
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def forward(self, logits, target):
+        teacher, labels = target[:, :-1], target[:, -1].long()
+        T = self.temperature
+        soft = F.kl_div(F.log_softmax(logits / T, dim=1), F.log_softmax(teacher / T, dim=1),
+                        reduction='batchmean', log_target=True) * T * T
+        return self.alpha * soft + (1 - self.alpha) * F.cross_entropy(logits, labels)
+
+
+def load_teacher(pth_file):
+    """A RobotNN sized from the state dict, so both the trainer's and the deployed layouts load."""
+    state = torch.load(pth_file, map_location="cpu")
+    teacher = RobotNN(input_size=state['fc1.weight'].shape[1], hidden_size=state['fc1.weight'].shape[0],
+                      output_size=state['fc4.weight'].shape[0])
+    teacher.load_state_dict(state)
+    return teacher.eval()
+
+
+@torch.no_grad()
+def logits_of(model, X):
+    model.eval()
+    return model(X)
+
+
+def distill(teacher_logits, data, hidden_sizes, epochs=100, patience=10, learning_rate=1e-3, batch_size=256,
+            temperature=TEMPERATURE, alpha=ALPHA):
+    """Trains a StudentNN against the teacher; returns it with the weights of its best validation epoch."""
+    X_train, X_val, y_train, y_val = data
+    train_logits, val_logits = teacher_logits
+    targets = torch.cat([train_logits, y_train.float().unsqueeze(1)], dim=1)
+    val_targets = torch.cat([val_logits, y_val.float().unsqueeze(1)], dim=1)
+
+    student = StudentNN(X_train.shape[1], hidden_sizes, train_logits.shape[1])
+    criterion = DistillationLoss(temperature, alpha)
+    optimizer = optim.Adam(student.parameters(), lr=learning_rate)
+    stopper = EarlyStopping(patience)
+    best_loss, best_state = float('inf'), None
+    for _ in range(epochs):
+        train_epoch(student, X_train, targets, criterion, optimizer, batch_size)
+        val_loss = evaluate(student, X_val, val_targets, criterion)
+        if val_loss < best_loss:
+            best_loss, best_state = val_loss, {k: v.clone() for k, v in student.state_dict().items()}
+        if stopper.step(val_loss):
+            break
+    if best_state is None:  # NaN from the first epoch on: no weights are worth keeping
+        raise ValueError(f"student {hidden_sizes} never reached a finite validation loss in {epochs} epochs")
+    student.load_state_dict(best_state)
+    return student.eval()
+
+
+def quantize(model):
+    """Dynamic int8 quantization of every Linear layer, traced to TorchScript so it loads without this code."""
+    quantized = torch.ao.quantization.quantize_dynamic(model.eval(), {nn.Linear}, dtype=torch.qint8)
+    with torch.no_grad():
+        return torch.jit.trace(quantized, torch.zeros(1, model.fc1.in_features))
+
+
+def numpy_decider(npz_file):
+    """One decision on the NumPy runtime, as AIDriving.predict makes it."""
+    model = NumpyRobotNN(npz_file)
+
+    def decide(scan):
+        output = model(scan)
+        return softmax(output)[0], int(np.argmax(output[0]))
+    return decide
+
+
+def torch_decider(model):
+    """One decision on a torch model, as AIDriving.predict makes it."""
+    def decide(scan):
+        with torch.no_grad():
+            output = model(torch.from_numpy(scan))
+            return torch.softmax(output, dim=1).numpy()[0], torch.argmax(output, dim=1).item()
+    return decide
+
+
+def latency_us(decide, input_size, runs=LATENCY_RUNS):
+    """(p50, p99) of one single-scan decision in microseconds."""
+    scan = np.random.default_rng(1).uniform(-1, 1, (1, input_size)).astype(np.float32)
+    for _ in range(50):
+        decide(scan)
+    samples = np.empty(runs)
+    for i in range(runs):
+        start = time.perf_counter()
+        decide(scan)
+        samples[i] = time.perf_counter() - start
+    return np.percentile(samples, 50) * 1e6, np.percentile(samples, 99) * 1e6
+
+
+def measure(name, runtime, path, decide, val_logits, data, teacher_actions):
+    """One row of the results table."""
+    X_val, y_val = data[1], data[3]
+    actions = val_logits.argmax(dim=1)
+    p50, p99 = latency_us(decide, X_val.shape[1])
+    return {'model': name, 'runtime': runtime, 'file': os.path.basename(path),
+            'size_kb': os.path.getsize(path) / 1024,
+            'val_accuracy': 100 * (actions == y_val).float().mean().item(),
+            'teacher_agreement': 100 * (actions == teacher_actions).float().mean().item(),
+            'p50_us': p50, 'p99_us': p99}
+
+
+def export_and_measure(name, model, out_dir, data, teacher_actions):
+    """Writes model as .pth, .npz and int8 .pt under out_dir; returns a row for each runtime."""
+    pth_file = os.path.join(out_dir, f"{name}.pth")
+    npz_file = os.path.join(out_dir, f"{name}.npz")
+    int8_file = os.path.join(out_dir, f"{name}_int8.pt")
+    torch.save(model.state_dict(), pth_file)
+    export_weights(pth_file, npz_file)
+    torch.jit.save(quantize(model), int8_file)
+    int8_model = torch.jit.load(int8_file)  # Measure what was written
+
+    X_val = data[1]
+    rows = [measure(name, 'numpy', npz_file, numpy_decider(npz_file), logits_of(model, X_val), data, teacher_actions),
+            measure(name, 'int8', int8_file, torch_decider(int8_model), logits_of(int8_model, X_val), data, teacher_actions)]
+    params = sum(p.numel() for p in model.parameters())
+    for row in rows:
+        row['params'] = params
+    return rows
+
+
+def run_distill(dataset, teacher_file="best_model.pth", widths=WIDTHS, depths=DEPTHS, tolerance=TOLERANCE,
+                normalization='scan', epochs=100, threads=None, out_dir=DISTILL_DIR):
+    """Distills, quantizes and measures every student; returns the rows, fastest first."""
+    set_threads(threads)
+    os.makedirs(out_dir, exist_ok=True)
+    load_training_data = runpy.run_path(TRAINING_SCRIPT)['load_training_data']  # Its __main__ block does not run
+    data = load_training_data(dataset, normalization=normalization)  # 'scan' is what AIDriving feeds the model
+    teacher = load_teacher(teacher_file)
+    if int(data[2].max()) >= teacher.fc4.out_features:
+        raise ValueError(f"{dataset} has label {int(data[2].max())}, but {teacher_file} has only {teacher.fc4.out_features} outputs")
+    teacher_logits = (logits_of(teacher, data[0]), logits_of(teacher, data[1]))
+    teacher_actions = teacher_logits[1].argmax(dim=1)
+
+    print(f"{len(data[0])} training / {len(data[1])} validation scans, teacher {teacher_file}")
+    rows = export_and_measure("teacher", teacher, out_dir, data, teacher_actions)
+    for depth in depths:
+        for width in widths:
+            name = f"student_{width}x{depth}"
+            start = time.perf_counter()
+            torch.manual_seed(0)
+            student = distill(teacher_logits, data, [width] * depth, epochs=epochs)
+            rows += export_and_measure(name, student, out_dir, data, teacher_actions)
+            print(f"{name}: distilled in {time.perf_counter() - start:.0f}s, "
+                  f"val accuracy {rows[-2]['val_accuracy']:.1f}% (int8 {rows[-1]['val_accuracy']:.1f}%)")
+
+    floor = rows[0]['val_accuracy'] - tolerance
+    for row in rows:
+        row['within_tolerance'] = row['val_accuracy'] >= floor
+    rows.sort(key=lambda row: row['p50_us'])
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill best_model.pth into small students and quantize them to int8.")
+    parser.add_argument('dataset', help="training CSV or session directory")
+    parser.add_argument('--teacher', default="best_model.pth", help="model to distill (default: %(default)s)")
+    parser.add_argument('--widths', default=",".join(map(str, WIDTHS)), help="student hidden sizes (default: %(default)s)")
+    parser.add_argument('--depths', default=",".join(map(str, DEPTHS)), help="student hidden layer counts (default: %(default)s)")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="accuracy points below the teacher a pick may be (default: %(default)s)")
+    parser.add_argument('--normalization', choices=['scan', 'global'], default='scan',
+                        help="scan normalization the teacher was trained for (default: %(default)s)")
+    parser.add_argument('--epochs', type=int, default=100, help="maximum distillation epochs per student (default: %(default)s)")
+    parser.add_argument('--threads', type=int, help="torch threads (default: one per core)")
+    parser.add_argument('--out', default=DISTILL_DIR, help="directory for the exports and results (default: %(default)s)")
+    args = parser.parse_args()
+
+    rows = run_distill(args.dataset, args.teacher, [int(w) for w in args.widths.split(',')],
+                       [int(d) for d in args.depths.split(',')], args.tolerance, args.normalization,
+                       args.epochs, args.threads, args.out)
+    write_results(rows, os.path.join(args.out, RESULTS_FILE))
+    print_results(rows)
+    pick = next(row for row in rows if row['within_tolerance'])  # The teacher itself always qualifies
+    target = "best_model.npz" if pick['runtime'] == 'numpy' else "best_model_int8.pt"
+    print(f"Pick: {pick['file']} ({pick['runtime']}, {pick['val_accuracy']:.1f}% at p50 {pick['p50_us']:.0f} us); "
+          f"deploy it as {target}" + (" and drive with --inference int8" if pick['runtime'] == 'int8' else ""))
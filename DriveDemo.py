@@ -1,59 +1,22 @@
-import RPi.GPIO as GPIO
 import time
 import termios
 import tty
 import sys
 import threading
+import argparse
+from MotorControl import MotorController
+from Backends import add_backend_arguments, load_gpio, close_gpio
+
+parser = argparse.ArgumentParser(description="Drive the robot by hand with W/A/S/D.")
+add_backend_arguments(parser, lidar=False)
+args = parser.parse_args()
+GPIO = load_gpio(args)
 
 R1, R2, L1, L2 = 22, 16, 15, 13
 ENB = 32
 
 right_pwm = 80
-def init():
-    global pwm
-    GPIO.setmode(GPIO.BOARD)
-    GPIO.setup(R1, GPIO.OUT)
-    GPIO.setup(R2, GPIO.OUT)
-    GPIO.setup(L1, GPIO.OUT)
-    GPIO.setup(L2, GPIO.OUT)
-    GPIO.setup(ENB, GPIO.OUT)
-    pwm = GPIO.PWM(ENB, 1000)
-    pwm.start(0)
-
-def stop():
-    GPIO.output(R1, False)
-    GPIO.output(R2, False)
-    GPIO.output(L1, False)
-    GPIO.output(L2, False)
-    pwm.ChangeDutyCycle(0) 
-
-def forward():
-    GPIO.output(R1, False)
-    GPIO.output(L2, False)
-    GPIO.output(R2, True)
-    GPIO.output(L1, True)
-    pwm.ChangeDutyCycle(right_pwm)  
-
-def reverse():
-    GPIO.output(R1, True)
-    GPIO.output(R2, False)
-    GPIO.output(L1, False)
-    GPIO.output(L2, True)
-    pwm.ChangeDutyCycle(100)
-
-def right_turn():
-    GPIO.output(R1, True)
-    GPIO.output(R2, False)
-    GPIO.output(L1, True)
-    GPIO.output(L2, False)
-    pwm.ChangeDutyCycle(right_pwm) 
-
-def left_turn():
-    GPIO.output(R1, False)
-    GPIO.output(R2, True)
-    GPIO.output(L1, False)
-    GPIO.output(L2, True)
-    pwm.ChangeDutyCycle(right_pwm) 
+motors = MotorController(GPIO, R1, R2, L1, L2, ENB, speed=right_pwm, reverse_speed=100)
 
 def get_key():
     """Non-blocking key read from terminal."""
@@ -66,9 +29,9 @@ def get_key():
         termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
     return ch
 
-action_map = {'w': forward, 'a': left_turn, 'd': right_turn, 's': reverse}
+action_map = {'w': motors.forward, 'a': motors.left_turn, 'd': motors.right_turn, 's': motors.reverse}
 
-init()
+motors.init()
 try:
     print("Press W/A/S/D to move. Hold the key to keep moving. Release the key to stop. Press Q to quit.")
     current_action = None
@@ -79,7 +42,7 @@ try:
         global stop_thread, current_action
         while not stop_thread:
             if current_action is None:
-                stop()
+                motors.stop()  # Free when already stopped: unchanged pins are not rewritten
             time.sleep(0.1)
 
     # Start a thread to stop the robot when no key is pressed
@@ -102,4 +65,6 @@ except KeyboardInterrupt:
 finally:
     stop_thread = True
     thread.join()
+    motors.close()
     GPIO.cleanup()
+    close_gpio(GPIO, args)
@@ -0,0 +1,82 @@
+import os
+import torch
+
+# =========================
+# In-memory epoch engine for train_model
+# =========================
+# The whole dataset already sits in memory as tensors, so DataLoader's
+# per-sample indexing and collation are pure overhead, and pin_memory only
+# helps copies to a GPU, which the training box does not have. Instead,
+# each epoch draws one permutation, gathers the training tensors into that
+# order once and trains on contiguous slices of it. Losses are summed on the
+# device and read once per epoch instead of syncing with loss.item() every
+# step, and validation is a single forward pass over the whole set.
+# An optional augment(X, y) (see Augmentation.py) runs once per epoch on the
+# whole shuffled training set, so its tensor ops are big enough for torch to
+# spread over every core and there is no per-batch launch cost; the model
+# sees a fresh draw of each scan every epoch. evaluate never augments.
+# EarlyStopping ends runs that have stopped improving.
+
+
+def set_threads(threads=None):
+    """Fixes torch's intra-op thread count (default: one per core); returns it."""
+    threads = threads or os.cpu_count()
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)  # One model, nothing to run side by side
+    except RuntimeError:  # Only allowed before torch's first parallel work
+        pass
+    return threads
+
+
+def train_epoch(model, X, y, criterion, optimizer, batch_size, generator=None, augment=None):
+    """One pass over X, y in a fresh random order, augmented if given; returns the mean loss per sample."""
+    model.train()
+    order = torch.randperm(len(X), generator=generator, device=X.device)
+    X, y = X[order], y[order]
+    if augment is not None:
+        X, y = augment(X, y)
+    total = torch.zeros((), device=X.device)
+    for start in range(0, len(X), batch_size):
+        X_batch, y_batch = X[start:start + batch_size], y[start:start + batch_size]
+        optimizer.zero_grad(set_to_none=True)
+        loss = criterion(model(X_batch), y_batch)
+        loss.backward()
+        optimizer.step()
+        total += loss.detach() * len(X_batch)
+    return total.item() / len(X)
+
+
+@torch.no_grad()
+def evaluate(model, X, y, criterion):
+    """Loss over the whole of X, y in one forward pass."""
+    model.eval()
+    return criterion(model(X), y).item()
+
+
+class EarlyStopping:
+    """
+    Ends a run once the validation loss has gone `patience` epochs without
+    improving on its best by more than min_delta. patience=None never stops.
+    """
+
+    def __init__(self, patience=None, min_delta=0.0):
+        self.patience = patience
+        self.min_delta = min_delta
+        self.best = float('inf')
+        self.bad_epochs = 0
+
+    def step(self, val_loss):
+        """Records one epoch's validation loss; True when training should stop."""
+        if val_loss < self.best - self.min_delta:
+            self.best = val_loss
+            self.bad_epochs = 0
+        else:
+            self.bad_epochs += 1
+        return self.patience is not None and self.bad_epochs >= self.patience
+
+    def state_dict(self):
+        return {'best': self.best, 'bad_epochs': self.bad_epochs}
+
+    def load_state_dict(self, state):
+        self.best, self.bad_epochs = state['best'], state['bad_epochs']
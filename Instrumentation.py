@@ -0,0 +1,147 @@
+import os
+import json
+import math
+import time
+import signal
+
+# =========================
+# Per-stage latency instrumentation
+# =========================
+# Times the stages of a control loop (scan acquisition, preprocessing,
+# inference, actuation) into fixed-size log-scale histograms and writes
+# p50/p95/p99 summaries to a JSON file periodically and on exit.
+# When disabled, start() and lap() return after one attribute check, so the
+# calls can stay in the hot path. SIGUSR1 toggles it while the robot runs:
+#   kill -USR1 <pid>
+
+PROFILE_FILE = "latency_profile.json"
+MIN_SECONDS = 1e-6  # Histogram range: 1 us ...
+DECADES = 7         # ... to 10 s
+BINS_PER_DECADE = 20  # ~12% wide bins
+
+
+class LatencyHistogram:
+    """
+    Counts durations in log-spaced bins, so memory stays fixed however long
+    the robot runs. Percentiles are accurate to one bin width.
+    Not thread-safe: record each stage from a single thread.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (DECADES * BINS_PER_DECADE + 2)  # Plus underflow and overflow bins
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        if seconds <= MIN_SECONDS:
+            i = 0
+        else:
+            i = min(int(math.log10(seconds / MIN_SECONDS) * BINS_PER_DECADE) + 1, len(self.counts) - 1)
+        self.counts[i] += 1
+        self.total += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper edge of the bin holding the q-th percentile, in seconds."""
+        if not self.total:
+            return 0.0
+        target = q / 100 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(MIN_SECONDS * 10 ** (i / BINS_PER_DECADE), self.max)
+        return self.max
+
+    def summary(self):
+        ms = 1000
+        return {'count': self.total,
+                'mean_ms': self.sum / self.total * ms if self.total else 0.0,
+                'p50_ms': self.percentile(50) * ms,
+                'p95_ms': self.percentile(95) * ms,
+                'p99_ms': self.percentile(99) * ms,
+                'max_ms': self.max * ms}
+
+
+class StageProfiler:
+    """
+    Usage in a loop:
+        t = profiler.start()
+        ...acquire...
+        t = profiler.lap('acquire', t)
+        ...preprocess...
+        t = profiler.lap('preprocess', t)
+    lap() records the time since t under the stage name and returns the new
+    start time. Summaries go to `path` every `dump_every` seconds (checked by
+    tick(), once per loop) and on dump().
+    """
+
+    def __init__(self, path=PROFILE_FILE, enabled=False, dump_every=10.0):
+        self.path = path
+        self.enabled = enabled
+        self.dump_every = dump_every
+        self.stages = {}
+        self._next_dump = time.monotonic() + dump_every
+
+    def start(self):
+        if not self.enabled:
+            return 0.0
+        return time.perf_counter()
+
+    def lap(self, stage, started):
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        if started:  # 0.0 when profiling was switched on mid-iteration
+            self._histogram(stage).record(now - started)
+        return now
+
+    def record(self, stage, seconds):
+        """Records a duration measured elsewhere (e.g. from a scan timestamp)."""
+        if self.enabled and seconds >= 0:  # Negative if profiling was switched on mid-iteration
+            self._histogram(stage).record(seconds)
+
+    def _histogram(self, stage):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages[stage] = LatencyHistogram()
+        return histogram
+
+    def tick(self):
+        """Dumps a summary if dump_every seconds have passed. Call once per loop."""
+        if self.enabled and time.monotonic() >= self._next_dump:
+            self._next_dump = time.monotonic() + self.dump_every
+            self.dump()
+
+    def toggle(self, *_):
+        self.enabled = not self.enabled
+        print(f"Latency profiling {'on' if self.enabled else 'off'}")
+
+    def summary(self):
+        return {stage: histogram.summary() for stage, histogram in list(self.stages.items())}
+
+    def dump(self):
+        """Writes the current summary to path; a no-op if nothing was recorded."""
+        if not self.stages:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'time': time.time(), 'stages': self.summary()}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', action='store_true', help="record per-stage latencies from the start (SIGUSR1 toggles)")
+    parser.add_argument('--profile-file', default=PROFILE_FILE, help="where latency summaries go (default: %(default)s)")
+    parser.add_argument('--profile-every', type=float, default=10.0, metavar='SEC', help="summary interval (default: %(default)s)")
+
+
+def make_profiler(args):
+    """Builds the profiler from the command line and lets SIGUSR1 switch it on and off."""
+    profiler = StageProfiler(args.profile_file, enabled=args.profile, dump_every=args.profile_every)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, profiler.toggle)
+    return profiler
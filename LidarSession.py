@@ -0,0 +1,235 @@
+import os
+import csv
+import json
+import sys
+import time
+import numpy as np
+
+# =========================
+# Binary Lidar session format
+# =========================
+# A session is a directory holding two append-only files:
+# - points.f32: every recorded point as float32 (angle, distance, quality) rows
+# - index.bin:  a short header, then one fixed-size record per scan with the
+#               scan's first point, point count, label and timestamp
+# Index records are held back until their points have been fsynced, so even
+# after a power loss the index never refers to points that are not on disk;
+# a crash can at worst leave trailing bytes (or the records of the last few
+# unsynced scans) that are trimmed the next time the session is opened.
+
+POINTS_FILE = "points.f32"
+INDEX_FILE = "index.bin"
+MAGIC = b"LIDARSES"
+VERSION = 1
+HEADER_SIZE = 16  # MAGIC + uint32 version + uint32 record size
+
+POINT_DTYPE = np.dtype('<f4')
+POINT_WIDTH = 3  # angle, distance, quality
+POINT_SIZE = POINT_DTYPE.itemsize * POINT_WIDTH
+INDEX_DTYPE = np.dtype([('offset', '<i8'), ('count', '<u4'), ('label', '<i4'), ('timestamp', '<f8')])
+
+# Old CSV rows only kept points with quality > 0 but did not save the value
+CSV_QUALITY = 1.0
+
+
+def _header():
+    return MAGIC + np.array([VERSION, INDEX_DTYPE.itemsize], dtype='<u4').tobytes()
+
+
+def _check_header(header, path):
+    if len(header) < HEADER_SIZE or header[:8] != MAGIC:
+        raise ValueError(f"{path} is not a Lidar session index")
+    version, record_size = np.frombuffer(header[8:HEADER_SIZE], dtype='<u4')
+    if version != VERSION or record_size != INDEX_DTYPE.itemsize:
+        raise ValueError(f"{path} has unsupported version {version} (record size {record_size})")
+
+
+def _repair(session_dir):
+    """
+    Trims a partially written trailing index record and any points that were
+    written without an index record. Returns the number of complete scans.
+    """
+    index_path = os.path.join(session_dir, INDEX_FILE)
+    points_path = os.path.join(session_dir, POINTS_FILE)
+    with open(index_path, 'rb') as f:
+        _check_header(f.read(HEADER_SIZE), index_path)
+
+    index_bytes = os.path.getsize(index_path) - HEADER_SIZE
+    num_scans = index_bytes // INDEX_DTYPE.itemsize
+    if index_bytes != num_scans * INDEX_DTYPE.itemsize:
+        os.truncate(index_path, HEADER_SIZE + num_scans * INDEX_DTYPE.itemsize)
+
+    points_end = 0
+    if num_scans:
+        with open(index_path, 'rb') as f:
+            f.seek(HEADER_SIZE + (num_scans - 1) * INDEX_DTYPE.itemsize)
+            last = np.frombuffer(f.read(INDEX_DTYPE.itemsize), dtype=INDEX_DTYPE)[0]
+        points_end = (int(last['offset']) + int(last['count'])) * POINT_SIZE
+    if os.path.getsize(points_path) > points_end:
+        os.truncate(points_path, points_end)
+    return num_scans
+
+
+class SessionWriter:
+    """
+    Appends scans to a session, keeping both files open between scans.
+    Points go through the file buffer and index records wait in memory;
+    both are written every flush_every scans, on flush() and on close().
+    """
+
+    def __init__(self, session_dir, flush_every=32):
+        self.session_dir = session_dir
+        self.flush_every = flush_every
+        os.makedirs(session_dir, exist_ok=True)
+        index_path = os.path.join(session_dir, INDEX_FILE)
+        points_path = os.path.join(session_dir, POINTS_FILE)
+
+        if os.path.exists(index_path):
+            self.num_scans = _repair(session_dir)
+        else:
+            with open(index_path, 'wb') as f:
+                f.write(_header())
+            open(points_path, 'wb').close()
+            self.num_scans = 0
+
+        self.num_points = os.path.getsize(points_path) // POINT_SIZE
+        self._points = open(points_path, 'ab')
+        self._index = open(index_path, 'ab')
+        self._record = np.zeros(1, dtype=INDEX_DTYPE)
+        self._records = bytearray()  # Index records whose points are not synced yet
+        self._pending = 0
+
+    def append(self, scan, label, timestamp=None):
+        """
+        Appends one scan of (quality, angle, distance) triples, as yielded by
+        RPLidar.iter_scans(), with its action label.
+        """
+        triples = np.asarray(scan, dtype=POINT_DTYPE).reshape(-1, 3)
+        points = triples[:, [1, 2, 0]]  # Stored as (angle, distance, quality)
+        self._points.write(np.ascontiguousarray(points).tobytes())
+
+        record = self._record
+        record['offset'] = self.num_points
+        record['count'] = len(points)
+        record['label'] = label
+        record['timestamp'] = time.time() if timestamp is None else timestamp
+        self._records += self._record.tobytes()
+
+        self.num_points += len(points)
+        self.num_scans += 1
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        # Points durably first, so the index never refers to points that are
+        # not on disk. The index itself is not synced: losing its last records
+        # only loses those scans, whose points the next open trims.
+        self._points.flush()
+        os.fsync(self._points.fileno())
+        self._index.write(self._records)
+        self._index.flush()
+        self._records.clear()
+        self._pending = 0
+
+    def close(self):
+        if self._points.closed:
+            return
+        self.flush()
+        self._points.close()
+        self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SessionReader:
+    """
+    Memory-maps a session. Every array attribute is a view into the mapped
+    files, so opening a session costs the same however many scans it holds.
+    - points: (num_points, 3) float32 rows of (angle, distance, quality)
+    - angles, distances, qualities: column views of points
+    - labels, timestamps, counts: one entry per scan
+    - offsets: first point of each scan followed by the total point count,
+      the layout ScanBinner.bin_batch expects
+    """
+
+    def __init__(self, session_dir):
+        self.session_dir = session_dir
+        index_path = os.path.join(session_dir, INDEX_FILE)
+        points_path = os.path.join(session_dir, POINTS_FILE)
+        with open(index_path, 'rb') as f:
+            _check_header(f.read(HEADER_SIZE), index_path)
+
+        num_scans = (os.path.getsize(index_path) - HEADER_SIZE) // INDEX_DTYPE.itemsize
+        if num_scans:
+            self.index = np.memmap(index_path, dtype=INDEX_DTYPE, mode='r', offset=HEADER_SIZE, shape=(num_scans,))
+        else:
+            self.index = np.zeros(0, dtype=INDEX_DTYPE)
+
+        # Only map points that a complete index record refers to
+        num_points = int(self.index['offset'][-1] + self.index['count'][-1]) if num_scans else 0
+        if num_points:
+            self.points = np.memmap(points_path, dtype=POINT_DTYPE, mode='r', shape=(num_points, POINT_WIDTH))
+        else:
+            self.points = np.zeros((0, POINT_WIDTH), dtype=POINT_DTYPE)
+
+        self.angles = self.points[:, 0]
+        self.distances = self.points[:, 1]
+        self.qualities = self.points[:, 2]
+        self.labels = self.index['label']
+        self.timestamps = self.index['timestamp']
+        self.counts = self.index['count']
+        self.offsets = np.append(self.index['offset'], num_points)
+
+    def __len__(self):
+        return len(self.index)
+
+    def scan(self, i):
+        """Returns the (count, 3) points of scan i as a view."""
+        return self.points[self.offsets[i]:self.offsets[i + 1]]
+
+    def close(self):
+        # The maps are released once no views into them are left
+        self.points = self.index = None
+        self.angles = self.distances = self.qualities = None
+        self.labels = self.timestamps = self.counts = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_session(path):
+    """True if path is a session directory."""
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+
+def convert_csv(csv_file, session_dir):
+    """
+    One-shot converter from the old JSON-in-CSV training data to a session.
+    The CSV did not record quality or time, so quality is CSV_QUALITY and
+    timestamps are NaN. Returns the number of scans written.
+    """
+    with open(csv_file, newline="") as file, SessionWriter(session_dir, flush_every=1024) as writer:
+        for row in csv.reader(file):
+            if len(row) < 2:
+                continue
+            scan = [(CSV_QUALITY, angle, distance) for angle, distance in json.loads(row[0])]
+            writer.append(scan, int(row[1]), timestamp=float('nan'))
+        return writer.num_scans
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python LidarSession.py <csv_file> <session_dir>")
+        sys.exit(1)
+
+    start = time.time()
+    count = convert_csv(sys.argv[1], sys.argv[2])
+    print(f"Converted {count} scans to {sys.argv[2]} in {time.time() - start:.2f}s")
@@ -0,0 +1,196 @@
+import os
+import sys
+import zlib
+import struct
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from LidarSession import SessionReader, is_session
+
+# =========================
+# Headless rasterized map rendering
+# =========================
+# Converts (angle, distance) points to Cartesian in one vectorized step and
+# counts them straight into a fixed-size image with np.bincount, so
+# rendering costs the same few arrays however many points a capture holds.
+# Images are written as PNG or PGM with only NumPy and zlib; matplotlib is
+# not needed. Sessions are rendered in chunks straight from their memory
+# maps, and a directory of sessions is spread across a process pool.
+
+IMAGE_SIZE = 1000    # Pixels per side
+CHUNK_POINTS = 1 << 20  # Points rasterized per pass over a session
+ROBOT_SHADE = 128    # Grey marker at the Lidar's position
+FORMATS = ('png', 'pgm')
+STYLES = ('density', 'occupancy')
+
+
+def polar_to_cartesian(angles, distances):
+    """
+    Lidar angles (degrees) and distances (mm) to x, y in mm, with x mirrored
+    the way the original plots drew it.
+    """
+    radians = np.radians(angles)
+    return -distances * np.cos(radians), distances * np.sin(radians)
+
+
+def load_points(path):
+    """
+    (n, 2) float64 (angle, distance) rows from a session directory or an
+    old comma-separated text capture.
+    """
+    if is_session(path):
+        with SessionReader(path) as session:
+            return np.column_stack([session.angles, session.distances]).astype(np.float64)
+    return np.loadtxt(path, delimiter=',', ndmin=2).reshape(-1, 2)
+
+
+class Rasterizer:
+    """
+    Accumulates point counts into a size x size grid covering
+    [-extent, extent] mm on both axes, with the Lidar at the centre.
+    Points outside the extent are ignored.
+    """
+
+    def __init__(self, extent, size=IMAGE_SIZE):
+        self.extent = float(extent)
+        self.size = size
+        self.counts = np.zeros(size * size, dtype=np.int64)
+
+    def add(self, angles, distances):
+        x, y = polar_to_cartesian(np.asarray(angles, dtype=np.float64), np.asarray(distances, dtype=np.float64))
+        scale = self.size / (2 * self.extent)
+        cols = np.floor((x + self.extent) * scale).astype(np.int64)
+        rows = np.floor((self.extent - y) * scale).astype(np.int64)  # Image rows run downwards
+        inside = (cols >= 0) & (cols < self.size) & (rows >= 0) & (rows < self.size)
+        self.counts += np.bincount(rows[inside] * self.size + cols[inside], minlength=self.counts.size)
+
+    def image(self, style='density'):
+        """
+        uint8 greyscale image, points dark on white. 'density' shades by
+        log hit count, 'occupancy' marks every pixel with a hit black.
+        """
+        if style not in STYLES:
+            raise ValueError(f"Unknown style {style!r}, expected one of {STYLES}")
+        counts = self.counts.reshape(self.size, self.size)
+        if style == 'occupancy' or not counts.any():
+            image = np.where(counts > 0, 0, 255).astype(np.uint8)
+        else:
+            shade = np.log1p(counts) / np.log1p(counts.max())
+            image = (255 - np.rint(shade * 255)).astype(np.uint8)
+        centre = self.size // 2
+        image[max(centre - 2, 0):centre + 3, max(centre - 2, 0):centre + 3] = ROBOT_SHADE
+        return image
+
+
+def max_extent(distances):
+    """Smallest extent that fits every point, in mm."""
+    return float(np.max(distances, initial=0.0)) or 1.0
+
+
+def write_pgm(path, image):
+    with open(path, 'wb') as f:
+        f.write(f"P5\n{image.shape[1]} {image.shape[0]}\n255\n".encode())
+        f.write(np.ascontiguousarray(image, dtype=np.uint8).tobytes())
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+def write_png(path, image):
+    """8-bit greyscale PNG, every row unfiltered."""
+    height, width = image.shape
+    rows = np.zeros((height, width + 1), dtype=np.uint8)  # Leading filter-type byte per row
+    rows[:, 1:] = image
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0)))
+        f.write(_png_chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)))
+        f.write(_png_chunk(b'IEND', b''))
+
+
+def write_image(path, image):
+    """Writes PNG or PGM depending on the file extension."""
+    if path.lower().endswith('.pgm'):
+        write_pgm(path, image)
+    else:
+        write_png(path, image)
+
+
+def render_points(points, size=IMAGE_SIZE, extent=None, style='density'):
+    """Renders an (n, 2) array of (angle, distance) rows to a uint8 image."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    rasterizer = Rasterizer(extent or max_extent(points[:, 1]), size)
+    rasterizer.add(points[:, 0], points[:, 1])
+    return rasterizer.image(style)
+
+
+def render_file(path, image_path, size=IMAGE_SIZE, extent=None, style='density'):
+    """
+    Renders a session or text capture to image_path. Sessions are read
+    CHUNK_POINTS at a time from the memory map, so memory stays flat.
+    Returns (image_path, number of points).
+    """
+    if not is_session(path):
+        points = load_points(path)
+        write_image(image_path, render_points(points, size, extent, style))
+        return image_path, len(points)
+
+    with SessionReader(path) as session:
+        angles, distances = session.angles, session.distances
+        rasterizer = Rasterizer(extent or max_extent(distances), size)
+        for start in range(0, len(angles), CHUNK_POINTS):
+            rasterizer.add(angles[start:start + CHUNK_POINTS], distances[start:start + CHUNK_POINTS])
+        write_image(image_path, rasterizer.image(style))
+        return image_path, len(angles)
+
+
+def find_captures(directory):
+    """Session directories and .txt captures directly inside directory, sorted by name."""
+    captures = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if is_session(path) or (name.endswith('.txt') and os.path.isfile(path)):
+            captures.append(path)
+    return captures
+
+
+def render_batch(directory, out_dir, size=IMAGE_SIZE, extent=None, style='density', image_format='png', workers=None):
+    """
+    Renders every capture in directory to out_dir/<name>.<format> across a
+    process pool. Returns [(image_path, number of points)] in name order.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = []
+    for path in find_captures(directory):
+        name = os.path.splitext(os.path.basename(os.path.normpath(path)))[0]
+        jobs.append((path, os.path.join(out_dir, f"{name}.{image_format}")))
+    workers = min(workers or os.cpu_count() or 1, max(len(jobs), 1))
+    if workers == 1:
+        return [render_file(path, image_path, size, extent, style) for path, image_path in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_file, path, image_path, size, extent, style) for path, image_path in jobs]
+        return [future.result() for future in futures]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render Lidar captures to PNG/PGM images without a display.")
+    parser.add_argument('source', help="session directory, text capture, or (with --batch) a directory of them")
+    parser.add_argument('output', help="image file, or output directory with --batch")
+    parser.add_argument('--batch', action='store_true', help="render every capture in source across all cores")
+    parser.add_argument('--size', type=int, default=IMAGE_SIZE, help="image side in pixels (default: %(default)s)")
+    parser.add_argument('--extent', type=float, help="half-width of the rendered area in mm (default: fit the points)")
+    parser.add_argument('--style', choices=STYLES, default='density')
+    parser.add_argument('--format', choices=FORMATS, default='png', help="image format in batch mode (default: %(default)s)")
+    parser.add_argument('--workers', type=int, help="processes for batch mode (default: all cores)")
+    args = parser.parse_args()
+
+    if args.batch:
+        results = render_batch(args.source, args.output, args.size, args.extent, args.style, args.format, args.workers)
+    else:
+        results = [render_file(args.source, args.output, args.size, args.extent, args.style)]
+    if not results:
+        print(f"No captures found in {args.source}")
+        sys.exit(1)
+    for image_path, count in results:
+        print(f"{image_path}: {count} points")
@@ -0,0 +1,229 @@
+import os
+import time
+import zlib
+import socket
+import struct
+import argparse
+import numpy as np
+from MapRender import write_image
+
+# =========================
+# Delta-encoded SLAM map streaming
+# =========================
+# MapPublisher splits the map into square tiles, compares each new frame
+# with the last one it sent and streams only the tiles that changed, zlib
+# compressed, together with the pose. Newly connected clients first get a
+# keyframe with every tile that holds anything. Bandwidth therefore follows
+# how much of the map changed rather than the map's size.
+#
+# Wire format, little endian, one frame per publish:
+#   header: b'MAPS', map pixels (H), tile pixels (H), map meters (f),
+#           tile count (I), payload bytes (I), x mm, y mm, theta deg (3d)
+#   tiles:  tile column (H), tile row (H), compressed bytes (I), data
+# Addresses are "host:port" for TCP or a filesystem path for a Unix socket.
+#
+# Viewer on another machine:
+#   python MapStream.py robot.local:5800 --image live_map.png
+
+MAGIC = b'MAPS'
+HEADER = struct.Struct('<4sHHfII3d')
+TILE = struct.Struct('<HHI')
+TILE_PIXELS = 50        # 10 x 10 tiles for SLAM.py's 500 px map
+UNKNOWN = 127           # breezyslam's value for unexplored pixels
+COMPRESSION = 1         # zlib level; the Pi's CPU is scarcer than the bytes it would save
+SEND_TIMEOUT = 1.0      # A client that cannot take a frame within this is dropped
+DEFAULT_PORT = 5800
+
+
+def parse_address(address):
+    """(family, address) for "host:port", ":port" or a Unix socket path."""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return socket.AF_INET, (host or '0.0.0.0', int(port))
+    return socket.AF_UNIX, address
+
+
+def encode_frame(image, tiles, tile_pixels, meters, pose):
+    """One frame carrying the listed (column, row) tiles of image."""
+    t = tile_pixels
+    parts = []
+    for tx, ty in tiles:
+        data = zlib.compress(np.ascontiguousarray(image[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t]), COMPRESSION)
+        parts.append(TILE.pack(tx, ty, len(data)))
+        parts.append(data)
+    payload = b''.join(parts)
+    return HEADER.pack(MAGIC, len(image), t, meters, len(tiles), len(payload), *pose) + payload
+
+
+class MapPublisher:
+    """
+    Serves a SLAM map to any number of viewers:
+        publisher = MapPublisher(":5800", MAP_SIZE_PIXELS, MAP_SIZE_METERS)
+        publisher.publish(mapbytes, (x, y, theta))   # per frame
+    publish() never waits for a connection and drops clients that stop
+    reading.
+    """
+
+    def __init__(self, address, size_pixels, meters, tile_pixels=TILE_PIXELS):
+        if size_pixels % tile_pixels:
+            raise ValueError(f"map size {size_pixels} is not a multiple of the tile size {tile_pixels}")
+        self.size = size_pixels
+        self.meters = meters
+        self.tile_pixels = tile_pixels
+        self.tiles = size_pixels // tile_pixels
+        self.last = np.full((size_pixels, size_pixels), UNKNOWN, dtype=np.uint8)
+        self.clients = []
+        self.frames = self.keyframes = self.tiles_sent = self.bytes_sent = 0
+
+        family, self.address = parse_address(address)
+        if family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)  # Stale socket from a previous run
+        self.server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen()
+        self.server.setblocking(False)
+
+    def _accept(self):
+        """Picks up waiting viewers; they get a keyframe before their first delta."""
+        new = []
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except BlockingIOError:
+                return new
+            client.setblocking(True)
+            client.settimeout(SEND_TIMEOUT)
+            client.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+            if client.family == socket.AF_INET:
+                client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            new.append(client)
+
+    def _tile_grid(self, mask):
+        """(column, row) of every tile where mask has any pixel set."""
+        t = self.tile_pixels
+        rows, columns = np.nonzero(mask.reshape(self.tiles, t, self.tiles, t).any(axis=(1, 3)))
+        return list(zip(columns.tolist(), rows.tolist()))
+
+    def _send(self, clients, frame):
+        for client in clients:
+            try:
+                client.sendall(frame)
+                self.bytes_sent += len(frame)
+            except OSError:  # Gone or too slow
+                client.close()
+                self.clients.remove(client)
+
+    def publish(self, mapbytes, pose):
+        """Sends the tiles that changed since the last call; returns the delta frame's size in bytes."""
+        image = np.frombuffer(mapbytes, dtype=np.uint8).reshape(self.size, self.size)
+        new = self._accept()
+        if new:
+            self.clients.extend(new)
+            keyframe = encode_frame(image, self._tile_grid(image != UNKNOWN), self.tile_pixels, self.meters, pose)
+            self.keyframes += len(new)
+            self._send(new, keyframe)
+        dirty = self._tile_grid(image != self.last)
+        frame = encode_frame(image, dirty, self.tile_pixels, self.meters, pose)
+        self.last[:] = image
+        self.frames += 1
+        self.tiles_sent += len(dirty)
+        self._send([client for client in self.clients if client not in new], frame)
+        return len(frame)
+
+    def summary(self):
+        return (f"{self.frames} frames, {self.tiles_sent / max(self.frames, 1):.1f} tiles/frame, "
+                f"{self.bytes_sent / 1e6:.2f} MB sent, {self.keyframes} keyframes, {len(self.clients)} viewers")
+
+    def close(self):
+        for client in self.clients:
+            client.close()
+        self.clients = []
+        self.server.close()
+        if self.server.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+class MapSubscriber:
+    """Rebuilds the publisher's map: each receive() applies one frame and returns (map, pose)."""
+
+    def __init__(self, address, timeout=None):
+        family, address = parse_address(address)
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        self.map = None
+        self.meters = None
+        self.pose = (0.0, 0.0, 0.0)
+
+    def _read(self, size):
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        while view:
+            got = self.sock.recv_into(view)
+            if not got:
+                raise EOFError
+            view = view[got:]
+        return buffer
+
+    def receive(self):
+        """The map (uint8 array) and pose after the next frame, or None once the publisher closes."""
+        try:
+            magic, size, t, self.meters, count, length, *pose = HEADER.unpack(self._read(HEADER.size))
+            payload = self._read(length)
+        except EOFError:
+            return None
+        if magic != MAGIC:
+            raise ValueError("not a map stream")
+        if self.map is None or len(self.map) != size:
+            self.map = np.full((size, size), UNKNOWN, dtype=np.uint8)
+        offset = 0
+        for _ in range(count):
+            tx, ty, n = TILE.unpack_from(payload, offset)
+            offset += TILE.size
+            tile = np.frombuffer(zlib.decompress(payload[offset:offset + n]), dtype=np.uint8)
+            self.map[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t] = tile.reshape(t, t)
+            offset += n
+        self.pose = tuple(pose)
+        return self.map, self.pose
+
+    def close(self):
+        self.sock.close()
+
+
+def watch(address, image_file=None, every=2.0):
+    """Shows the streamed map in a roboviz window, or writes it to image_file every `every` seconds."""
+    subscriber = MapSubscriber(address)
+    viz = None
+    next_image = time.monotonic()
+    frames = 0
+    try:
+        while (received := subscriber.receive()) is not None:
+            mapped, (x, y, theta) = received
+            frames += 1
+            if image_file is None:
+                if viz is None:
+                    from roboviz import MapVisualizer
+                    viz = MapVisualizer(len(mapped), subscriber.meters, 'SLAM (remote)')
+                if not viz.display(x / 1000., y / 1000., theta, mapped.reshape(-1)):
+                    break
+            elif time.monotonic() >= next_image:
+                write_image(image_file, mapped)
+                next_image += every
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if image_file is not None and subscriber.map is not None:
+            write_image(image_file, subscriber.map)
+        subscriber.close()
+        print(f"{frames} frames received")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="View a map streamed by SLAM.py --stream.")
+    parser.add_argument('address', help=f'"host:port" (e.g. robot.local:{DEFAULT_PORT}) or Unix socket path')
+    parser.add_argument('--image', help="write PNG/PGM snapshots instead of opening a window")
+    parser.add_argument('--every', type=float, default=2.0, help="seconds between snapshots (default: %(default)s)")
+    args = parser.parse_args()
+    watch(args.address, args.image, args.every)
@@ -0,0 +1,119 @@
+import time
+import threading
+
+# =========================
+# Motor controller shared by every script
+# =========================
+# Drives the two TT motors through the H-bridge direction pins and one PWM
+# enable pin. The last value written to each pin and the duty cycle are
+# cached, so repeating a command costs no GPIO calls. Moves can be given a
+# duration: the call returns at once, a scheduler thread stops the motors
+# when the time is up, and any newer command pre-empts the pending stop.
+
+# Direction pin states (R1, R2, L1, L2)
+DIRECTIONS = {
+    'stop':       (False, False, False, False),
+    'forward':    (False, True,  True,  False),
+    'reverse':    (True,  False, False, True),
+    'right_turn': (True,  False, True,  False),
+    'left_turn':  (False, True,  False, True),
+}
+
+
+class MotorController:
+    """
+    GPIO can be RPi.GPIO or Backends.FakeGPIO. The scripts disagree on the
+    L1 pin (18 in AIDriving/AITraining, 15 in DriveDemo/obstacleAvoidance),
+    so each passes its own pin numbers.
+    """
+
+    def __init__(self, GPIO, R1, R2, L1, L2, ENB, speed=80, reverse_speed=None, frequency=1000):
+        self.GPIO = GPIO
+        self.pins = (R1, R2, L1, L2)
+        self.ENB = ENB
+        self.speed = speed
+        self.reverse_speed = speed if reverse_speed is None else reverse_speed
+        self.frequency = frequency
+        self.pwm = None
+        self.direction = None
+        self._written = {}  # pin -> last value written
+        self._duty = None
+        self._lock = threading.RLock()
+        self._deadline = None  # perf_counter() time of the pending stop
+        self._wake = threading.Condition(self._lock)
+        self._scheduler = None
+        self._closed = False
+
+    def init(self):
+        GPIO = self.GPIO
+        GPIO.setmode(GPIO.BOARD)
+        for pin in self.pins:
+            GPIO.setup(pin, GPIO.OUT)
+        GPIO.setup(self.ENB, GPIO.OUT)
+        self.pwm = GPIO.PWM(self.ENB, self.frequency)
+        self.pwm.start(0)
+        self._duty = 0
+        self._scheduler = threading.Thread(target=self._run_scheduler, daemon=True)
+        self._scheduler.start()
+
+    def _apply(self, direction, duty):
+        """Writes only the pins and duty cycle that differ from what is already set."""
+        for pin, value in zip(self.pins, DIRECTIONS[direction]):
+            if self._written.get(pin) != value:
+                self.GPIO.output(pin, value)
+                self._written[pin] = value
+        if self._duty != duty:
+            self.pwm.ChangeDutyCycle(duty)
+            self._duty = duty
+        self.direction = direction
+
+    def move(self, direction, sec=None, duty=None):
+        """
+        Starts moving in `direction`. With sec, stops after sec seconds unless
+        another command comes first; without it, keeps going until told otherwise.
+        """
+        if duty is None:
+            duty = 0 if direction == 'stop' else self.reverse_speed if direction == 'reverse' else self.speed
+        with self._lock:
+            self._apply(direction, duty)
+            self._deadline = None if sec is None else time.perf_counter() + sec
+            self._wake.notify()
+
+    def stop(self):
+        self.move('stop')
+
+    def forward(self, sec=None):
+        self.move('forward', sec)
+
+    def reverse(self, sec=None):
+        self.move('reverse', sec)
+
+    def right_turn(self, sec=None):
+        self.move('right_turn', sec)
+
+    def left_turn(self, sec=None):
+        self.move('left_turn', sec)
+
+    def _run_scheduler(self):
+        with self._lock:
+            while not self._closed:
+                if self._deadline is None:
+                    self._wake.wait()
+                    continue
+                remaining = self._deadline - time.perf_counter()
+                if remaining > 0:
+                    self._wake.wait(remaining)  # A new command moves or clears the deadline
+                    continue
+                self._deadline = None
+                self._apply('stop', 0)
+
+    def close(self):
+        """Stops the motors and the scheduler thread."""
+        with self._lock:
+            if self.pwm is not None:
+                self._apply('stop', 0)
+            self._deadline = None
+            self._closed = True
+            self._wake.notify()
+        if self._scheduler is not None:
+            self._scheduler.join()
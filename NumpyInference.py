@@ -0,0 +1,82 @@
+import sys
+import numpy as np
+
+# =========================
+# NumPy-only RobotNN runtime
+# =========================
+# Runs a trained RobotNN without torch. export_weights() turns a .pth state
+# dict into a flat .npz once (on any machine with torch); NumpyRobotNN then
+# loads only NumPy at drive time.
+# Dropout is the identity in eval mode, so the runtime is just
+# Linear -> ReLU -> ... -> Linear, with every activation buffer allocated once.
+
+
+def export_weights(pth_file, npz_file):
+    """
+    Writes the fc1..fcN layers of a RobotNN state dict to a flat float32 .npz.
+    Weights are stored transposed, as (in, out), so the forward pass is x @ W.
+    """
+    import torch  # Only needed for exporting
+
+    state = torch.load(pth_file, map_location="cpu")
+    layers = {}
+    i = 1
+    while f"fc{i}.weight" in state:
+        layers[f"w{i}"] = np.ascontiguousarray(state[f"fc{i}.weight"].numpy().T, dtype=np.float32)
+        layers[f"b{i}"] = state[f"fc{i}.bias"].numpy().astype(np.float32)
+        i += 1
+    if not layers:
+        raise ValueError(f"{pth_file} has no fc1..fcN layers")
+    np.savez(npz_file, **layers)
+    return i - 1
+
+
+class NumpyRobotNN:
+    """
+    Forward pass of an exported RobotNN in NumPy.
+    Supports batches up to max_batch rows; the returned logits are a view
+    into an internal buffer that the next call overwrites.
+    """
+
+    def __init__(self, npz_file, max_batch=1):
+        with np.load(npz_file) as data:
+            num_layers = len(data.files) // 2
+            self.weights = [data[f"w{i}"] for i in range(1, num_layers + 1)]
+            self.biases = [data[f"b{i}"] for i in range(1, num_layers + 1)]
+        self.input_size = self.weights[0].shape[0]
+        self.output_size = self.weights[-1].shape[1]
+        self._allocate(max_batch)
+
+    def _allocate(self, max_batch):
+        self.max_batch = max_batch
+        self._buffers = [np.empty((max_batch, w.shape[1]), dtype=np.float32) for w in self.weights]
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32).reshape(-1, self.input_size)
+        if len(x) > self.max_batch:
+            self._allocate(len(x))
+
+        last = len(self.weights) - 1
+        for i, (w, b, buffer) in enumerate(zip(self.weights, self.biases, self._buffers)):
+            out = buffer[:len(x)]
+            np.matmul(x, w, out=out)  # BLAS sgemm/sgemv
+            out += b
+            if i < last:
+                np.maximum(out, 0, out=out)  # ReLU
+            x = out
+        return x
+
+
+def softmax(logits):
+    """Row-wise softmax, the NumPy twin of torch.softmax(logits, dim=1)."""
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python NumpyInference.py <model.pth> <model.npz>")
+        sys.exit(1)
+
+    count = export_weights(sys.argv[1], sys.argv[2])
+    print(f"Exported {count} layers from {sys.argv[1]} to {sys.argv[2]}")
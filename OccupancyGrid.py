@@ -0,0 +1,150 @@
+import os
+import time
+import argparse
+import numpy as np
+from LidarSession import SessionReader
+from MapRender import polar_to_cartesian, write_image
+
+# =========================
+# Incremental log-odds occupancy grid
+# =========================
+# Each scan updates the grid in place given the robot's pose: cells along
+# every beam get a "free" update and the cell each beam ends in gets an
+# "occupied" update. Beams are traced together by sampling every ray at
+# half-cell steps in one flat NumPy array, so a scan costs time in the
+# number of points (times beam length), never in the size of the map.
+# Poses are (x mm, y mm, heading degrees) in the map frame, which is the
+# frame of the Lidar at pose (0, 0, 0) as drawn by MapRender.
+
+MAP_SIZE_METERS = 20
+RESOLUTION_MM = 20  # Cell side, as in SLAM.py (500 px over 10 m)
+MAX_RANGE_MM = 12000  # RPLidar A2M8; longer returns only clear space
+L_OCCUPIED = 0.85   # Log-odds added to a cell a beam ends in
+L_FREE = -0.4       # Log-odds added to a cell a beam passes through
+L_MIN, L_MAX = -5.0, 5.0  # Clamp, so the map can still change its mind
+STATIONARY_POSE = (0.0, 0.0, 0.0)
+
+
+class OccupancyGrid:
+    """
+    size x size cells of `resolution` mm, centred on the map origin.
+    log_odds[row, col] covers x in [origin + col * resolution, ...) and
+    y in [origin + row * resolution, ...), so row 0 is the bottom of the map.
+    """
+
+    def __init__(self, size=MAP_SIZE_METERS * 1000 // RESOLUTION_MM, resolution=RESOLUTION_MM, max_range=MAX_RANGE_MM):
+        self.size = int(size)
+        self.resolution = float(resolution)
+        self.max_range = float(max_range)
+        self.origin = -self.size * self.resolution / 2
+        self.log_odds = np.zeros((self.size, self.size), dtype=np.float32)
+        self.scans = 0
+
+    def _cells(self, x, y):
+        """Flat cell index of each (x, y) in mm, and a mask of those inside the map."""
+        cols = np.floor((x - self.origin) / self.resolution).astype(np.int64)
+        rows = np.floor((y - self.origin) / self.resolution).astype(np.int64)
+        inside = (cols >= 0) & (cols < self.size) & (rows >= 0) & (rows < self.size)
+        return rows * self.size + cols, inside
+
+    def _add(self, cells, value):
+        flat = self.log_odds.reshape(-1)
+        flat[cells] = np.clip(flat[cells] + value, L_MIN, L_MAX)
+
+    def update(self, angles, distances, pose=STATIONARY_POSE):
+        """Integrates one scan of Lidar angles (degrees) and distances (mm) taken at pose."""
+        angles = np.asarray(angles, dtype=np.float64)
+        distances = np.asarray(distances, dtype=np.float64)
+        valid = distances > 0
+        angles, distances = angles[valid], distances[valid]
+        hit = distances <= self.max_range
+        distances = np.minimum(distances, self.max_range)
+
+        # Beam directions in the map frame
+        local_x, local_y = polar_to_cartesian(angles, np.ones_like(distances))
+        px, py, heading = pose
+        c, s = np.cos(np.radians(heading)), np.sin(np.radians(heading))
+        dx, dy = c * local_x - s * local_y, s * local_x + c * local_y
+
+        # Every ray sampled at half-cell steps up to (not including) its end
+        step = self.resolution / 2
+        steps = np.floor(distances / step).astype(np.int64)
+        ray = np.repeat(np.arange(len(steps)), steps)
+        along = (np.arange(len(ray)) - np.repeat(np.cumsum(steps) - steps, steps)) * step
+        free, inside = self._cells(px + dx[ray] * along, py + dy[ray] * along)
+        free = np.unique(free[inside])  # One update per cell per scan
+
+        ends, inside = self._cells(px + dx[hit] * distances[hit], py + dy[hit] * distances[hit])
+        occupied = np.unique(ends[inside])
+        free = np.setdiff1d(free, occupied, assume_unique=True)
+
+        self._add(free, L_FREE)
+        self._add(occupied, L_OCCUPIED)
+        self.scans += 1
+
+    def probabilities(self):
+        return 1 - 1 / (1 + np.exp(self.log_odds))
+
+    def image(self):
+        """uint8 image with north up: occupied black, free white, unknown grey."""
+        return np.flipud(np.rint(255 * (1 - self.probabilities()))).astype(np.uint8)
+
+    def save(self, path):
+        """Writes the grid to an .npz file, replacing any previous version atomically."""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, log_odds=self.log_odds, resolution=self.resolution,
+                 max_range=self.max_range, scans=self.scans)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            grid = cls(len(saved['log_odds']), float(saved['resolution']), float(saved['max_range']))
+            grid.log_odds[:] = saved['log_odds']
+            grid.scans = int(saved['scans'])
+        return grid
+
+
+def load_poses(path):
+    """(n, 3) poses from a .npy file or a text file of "x,y,heading" rows."""
+    if path.endswith('.npy'):
+        return np.load(path).reshape(-1, 3)
+    return np.loadtxt(path, delimiter=',', ndmin=2).reshape(-1, 3)
+
+
+def map_session(session_dir, grid, poses=None):
+    """Integrates every scan of a session, with poses[i] for scan i (stationary if None)."""
+    with SessionReader(session_dir) as session:
+        if poses is not None and len(poses) != len(session):
+            raise ValueError(f"{len(poses)} poses for {len(session)} scans")
+        for i in range(len(session)):
+            scan = session.scan(i)
+            grid.update(scan[:, 0], scan[:, 1], STATIONARY_POSE if poses is None else poses[i])
+    return grid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build an occupancy grid from a recorded session.")
+    parser.add_argument('session', help="session directory (see LidarSession.py)")
+    parser.add_argument('grid', help="grid file (.npz); an existing grid is updated, not replaced")
+    parser.add_argument('--poses', help="one x,y,heading pose per scan (.npy or text); default: stationary")
+    parser.add_argument('--image', metavar='FILE', help="also write the map as PNG/PGM")
+    parser.add_argument('--size-m', type=float, default=MAP_SIZE_METERS, help="side of a new map in metres (default: %(default)s)")
+    parser.add_argument('--resolution', type=float, default=RESOLUTION_MM, help="cell side of a new map in mm (default: %(default)s)")
+    args = parser.parse_args()
+
+    if os.path.exists(args.grid):
+        grid = OccupancyGrid.load(args.grid)
+    else:
+        grid = OccupancyGrid(round(args.size_m * 1000 / args.resolution), args.resolution)
+    poses = load_poses(args.poses) if args.poses else None
+    before = grid.scans
+    start = time.perf_counter()
+    map_session(args.session, grid, poses)
+    elapsed = time.perf_counter() - start
+    grid.save(args.grid)
+    if args.image:
+        write_image(args.image, grid.image())
+    count = grid.scans - before
+    print(f"Integrated {count} scans in {elapsed:.2f}s ({count / max(elapsed, 1e-9):.0f} scans/s), "
+          f"{grid.scans} scans in {args.grid}")
@@ -0,0 +1,290 @@
+import math
+import time
+import heapq
+import numpy as np
+from Instrumentation import LatencyHistogram
+
+# =========================
+# Incremental path planning on the SLAM map
+# =========================
+# The getmap image (0 = wall, 255 = free, 127 = unknown) is reduced to a
+# coarse grid of CELL_PIXELS-square cells; a cell is blocked if any pixel in
+# it looks occupied, and blocked cells are grown by the robot's radius.
+# Unknown cells count as free, so the robot plans optimistically through
+# unexplored space and replans when it sees otherwise.
+#
+# Planning is D* Lite (Koenig & Likhachev, 2002): it searches from the goal
+# back to the robot and keeps its g/rhs values between scans, so after a
+# scan only the cells whose blocked state changed, and the parts of the
+# search that depended on them, are revisited instead of running A* over
+# the whole grid again.
+#
+# WaypointFollower turns the plan into timed MotorController moves, like
+# AIDriving does with the network's actions.
+
+CELL_PIXELS = 5           # 10 cm cells on SLAM.py's 20 mm pixels
+OCCUPIED_BELOW = 100      # Map values under this are obstacles
+ROBOT_RADIUS_MM = 150     # Blocked cells are grown by this much
+WAYPOINT_TOLERANCE_MM = 150
+HEADING_TOLERANCE_DEG = 20
+FORWARD_SECONDS = 0.2     # Same timed moves as AIDriving.execute_action
+TURN_SECONDS = 0.1
+INF = math.inf
+# Step costs in tenths of a cell. Integers keep D* Lite's key comparisons
+# exact: with floats, a cell whose key ties the robot's can round either
+# way and be left unexpanded.
+STRAIGHT, DIAGONAL = 10, 14
+MOVES = ((0, 1, STRAIGHT), (1, 0, STRAIGHT), (0, -1, STRAIGHT), (-1, 0, STRAIGHT),
+         (1, 1, DIAGONAL), (1, -1, DIAGONAL), (-1, 1, DIAGONAL), (-1, -1, DIAGONAL))
+
+
+def inflate(blocked, radius):
+    """blocked grown by a disk of radius cells."""
+    if radius <= 0:
+        return blocked.copy()
+    rows, cols = blocked.shape
+    padded = np.pad(blocked, radius)
+    out = np.zeros_like(blocked)
+    for dy in range(-radius, radius + 1):
+        for dx in range(-radius, radius + 1):
+            if dy * dy + dx * dx <= radius * radius:
+                out |= padded[radius + dy:radius + dy + rows, radius + dx:radius + dx + cols]
+    return out
+
+
+def blocked_cells(image, cell_pixels=CELL_PIXELS, radius_cells=0):
+    """Boolean planning grid [row = y, col = x] from a square getmap image."""
+    n = len(image) // cell_pixels
+    image = image[:n * cell_pixels, :n * cell_pixels].reshape(n, cell_pixels, n, cell_pixels)
+    return inflate(image.min(axis=(1, 3)) < OCCUPIED_BELOW, radius_cells)
+
+
+class DStarLite:
+    """
+    D* Lite on an 8-connected grid. Moving into a blocked cell costs INF;
+    moving out of one does not, so a robot whose own cell got inflated can
+    still leave. Cells are flat indices row * cols + col.
+    Usage:
+        planner = DStarLite(blocked, goal)
+        planner.plan(start)               # once
+        planner.update(blocked, start)    # after every map change
+        cells = planner.path()
+    """
+
+    def __init__(self, blocked, goal):
+        self.rows, self.cols = blocked.shape
+        self.grid = blocked.copy()
+        self.blocked = blocked.reshape(-1).tolist()
+        n = self.rows * self.cols
+        self.g = [INF] * n
+        self.rhs = [INF] * n
+        self.goal = goal
+        self.start = self.last = None
+        self.km = 0
+        self.open = {}  # cell -> key; heap entries whose key no longer matches are stale
+        self.heap = []
+        self.expanded = 0
+        self.rhs[goal] = 0
+
+    def _h(self, a, b):
+        """Octile distance, in the units of MOVES."""
+        dy, dx = abs(a // self.cols - b // self.cols), abs(a % self.cols - b % self.cols)
+        return STRAIGHT * max(dx, dy) + (DIAGONAL - STRAIGHT) * min(dx, dy)
+
+    def _neighbours(self, u):
+        row, col = divmod(u, self.cols)
+        for dy, dx, cost in MOVES:
+            r, c = row + dy, col + dx
+            if 0 <= r < self.rows and 0 <= c < self.cols:
+                yield r * self.cols + c, cost
+
+    def _key(self, u):
+        m = min(self.g[u], self.rhs[u])
+        return (m + self._h(self.start, u) + self.km, m)
+
+    def _update_vertex(self, u):
+        g, blocked = self.g, self.blocked
+        if u != self.goal:
+            self.rhs[u] = min((cost + g[v] for v, cost in self._neighbours(u) if not blocked[v]), default=INF)
+        if g[u] != self.rhs[u]:
+            key = self._key(u)
+            self.open[u] = key
+            heapq.heappush(self.heap, (key, u))
+        else:
+            self.open.pop(u, None)
+
+    def _top(self):
+        heap, open_ = self.heap, self.open
+        while heap and open_.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def _compute(self):
+        g, rhs, start = self.g, self.rhs, self.start
+        while True:
+            top = self._top()
+            if top is None or (top[0] >= self._key(start) and rhs[start] == g[start]):
+                return
+            k_old, u = heapq.heappop(self.heap)
+            self.expanded += 1
+            k_new = self._key(u)
+            if k_old < k_new:
+                self.open[u] = k_new
+                heapq.heappush(self.heap, (k_new, u))
+            elif g[u] > rhs[u]:
+                g[u] = rhs[u]
+                del self.open[u]
+                for v, _ in self._neighbours(u):
+                    self._update_vertex(v)
+            else:
+                g[u] = INF
+                self._update_vertex(u)
+                for v, _ in self._neighbours(u):
+                    self._update_vertex(v)
+
+    def plan(self, start):
+        self.start = self.last = start
+        self.open[self.goal] = self._key(self.goal)
+        heapq.heappush(self.heap, (self.open[self.goal], self.goal))
+        self._compute()
+
+    def update(self, blocked, start):
+        """Moves the robot to start and applies the cells whose blocked state changed."""
+        self.start = start
+        changed = np.flatnonzero(blocked != self.grid).tolist()
+        if not changed and start == self.last:
+            return 0
+        self.km += self._h(self.last, start)
+        self.last = start
+        self.grid = blocked.copy()
+        for v in changed:
+            self.blocked[v] = bool(self.grid.flat[v])
+        for v in changed:
+            # Only the cost of moving into v changed, which only its neighbours use
+            for u, _ in self._neighbours(v):
+                self._update_vertex(u)
+        self._compute()
+        return len(changed)
+
+    def path(self):
+        """Cells from start to goal, or [] if the goal cannot be reached."""
+        u = self.start
+        if self.g[u] == INF and self.rhs[u] == INF:
+            return []
+        cells = [u]
+        for _ in range(self.rows * self.cols):
+            if u == self.goal:
+                return cells
+            best, u_next = INF, None
+            for v, cost in self._neighbours(u):
+                if not self.blocked[v] and cost + self.g[v] < best:
+                    best, u_next = cost + self.g[v], v
+            if u_next is None:
+                return []
+            u = u_next
+            cells.append(u)
+        return []
+
+
+class Planner:
+    """
+    Plans from the robot's SLAM pose to a goal, both in mm in the SLAM map
+    frame (pixel = mm / mm_per_pixel, as breezyslam's getpos and getmap).
+    Call update() with every new map; it returns the waypoints still ahead,
+    straightened where the line between them is clear. reset() starts over,
+    e.g. after the map window moved under the robot.
+    """
+
+    def __init__(self, goal_mm, mm_per_pixel, cell_pixels=CELL_PIXELS, radius_mm=ROBOT_RADIUS_MM):
+        self.goal_mm = goal_mm
+        self.cell_mm = mm_per_pixel * cell_pixels
+        self.cell_pixels = cell_pixels
+        self.radius_cells = math.ceil(radius_mm / self.cell_mm)
+        self.search = None
+        self.timing = LatencyHistogram()
+        self.replans = self.changed = 0
+
+    def reset(self, goal_mm=None):
+        if goal_mm is not None:
+            self.goal_mm = goal_mm
+        self.search = None
+
+    def _cell(self, x_mm, y_mm, n):
+        """Flat index of the cell holding (x, y), clamped to the grid."""
+        col = int(np.clip(x_mm // self.cell_mm, 0, n - 1))
+        row = int(np.clip(y_mm // self.cell_mm, 0, n - 1))
+        return row * n + col
+
+    def _clear(self, grid, a, b):
+        """True if the straight line between cells a and b crosses no blocked cell."""
+        n = len(grid)
+        (ay, ax), (by, bx) = divmod(a, n), divmod(b, n)
+        steps = int(2 * max(abs(bx - ax), abs(by - ay))) + 1
+        t = np.linspace(0, 1, steps + 1)
+        return not grid[np.rint(ay + t * (by - ay)).astype(int), np.rint(ax + t * (bx - ax)).astype(int)].any()
+
+    def update(self, mapbytes, pose):
+        """Waypoints [(x mm, y mm), ...] from pose to the goal; [] if there is no way there."""
+        started = time.perf_counter()
+        size = math.isqrt(len(mapbytes))
+        grid = blocked_cells(np.frombuffer(mapbytes, dtype=np.uint8).reshape(size, size),
+                             self.cell_pixels, self.radius_cells)
+        n = len(grid)
+        start = self._cell(pose[0], pose[1], n)
+        if self.search is None or self.search.rows != n:
+            self.search = DStarLite(grid, self._cell(*self.goal_mm, n))
+            self.search.plan(start)
+        else:
+            self.changed += self.search.update(grid, start)
+        self.replans += 1
+        cells = self.search.path()
+
+        # Keep only the cells where a straight run has to bend; a robot
+        # already in the goal cell gets the goal itself
+        waypoints = cells[-1:] if len(cells) == 1 else []
+        anchor = 0
+        while anchor < len(cells) - 1:
+            reach = anchor + 1
+            while reach + 1 < len(cells) and self._clear(grid, cells[anchor], cells[reach + 1]):
+                reach += 1
+            waypoints.append(cells[reach])
+            anchor = reach
+        self.timing.record(time.perf_counter() - started)
+        return [((c % n + 0.5) * self.cell_mm, (c // n + 0.5) * self.cell_mm) for c in waypoints]
+
+    def summary(self):
+        timing = self.timing.summary()
+        expanded = 0 if self.search is None else self.search.expanded
+        return (f"{self.replans} plans, {self.changed} cells changed, {expanded} expansions, "
+                f"replan p50 {timing['p50_ms']:.2f} ms, p99 {timing['p99_ms']:.2f} ms")
+
+
+class WaypointFollower:
+    """
+    Drives a MotorController towards the first waypoint with timed moves:
+    turn while the heading is off by more than HEADING_TOLERANCE_DEG, else
+    go forward. Returns the direction it chose, 'stop' once there are no
+    waypoints left.
+
+    breezyslam's map is mirrored (the Lidar's angles are clockwise, see
+    ScanMatcher.py), so a right turn increases SLAM's theta.
+    """
+
+    def __init__(self, motors):
+        self.motors = motors
+
+    def step(self, pose, waypoints):
+        x, y, theta = pose
+        while waypoints and math.hypot(waypoints[0][0] - x, waypoints[0][1] - y) < WAYPOINT_TOLERANCE_MM:
+            waypoints = waypoints[1:]
+        if not waypoints:
+            self.motors.stop()
+            return 'stop'
+        bearing = math.degrees(math.atan2(waypoints[0][1] - y, waypoints[0][0] - x))
+        error = (bearing - theta + 180) % 360 - 180
+        if abs(error) <= HEADING_TOLERANCE_DEG:
+            self.motors.forward(FORWARD_SECONDS)
+            return 'forward'
+        direction = 'right_turn' if error > 0 else 'left_turn'
+        self.motors.move(direction, TURN_SECONDS)
+        return direction
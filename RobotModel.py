@@ -0,0 +1,53 @@
+import torch.nn as nn
+
+# =========================
+# Define the Neural Network
+# =========================
+# The network AIDriving.py drives with. Kept apart from AIDriving so the
+# NumPy runtime (NumpyInference.py) can drive without importing torch.
+class RobotNN(nn.Module):
+    def __init__(self, input_size, hidden_size=1024, output_size=3, dropout=0.4):  # Match NN.py
+        super(RobotNN, self).__init__()
+        self.fc1 = nn.Linear(input_size, hidden_size)
+        self.relu = nn.ReLU()
+        self.dropout1 = nn.Dropout(p=dropout)
+        self.fc2 = nn.Linear(hidden_size, hidden_size)
+        self.dropout2 = nn.Dropout(p=dropout)
+        self.fc3 = nn.Linear(hidden_size, hidden_size)
+        self.dropout3 = nn.Dropout(p=dropout)
+        self.fc4 = nn.Linear(hidden_size, output_size)
+
+    def forward(self, x):
+        x = self.fc1(x)
+        x = self.relu(x)
+        x = self.dropout1(x)
+        x = self.fc2(x)
+        x = self.relu(x)
+        x = self.dropout2(x)
+        x = self.fc3(x)
+        x = self.relu(x)
+        x = self.dropout3(x)
+        x = self.fc4(x)
+        return x
+
+
+class StudentNN(nn.Module):
+    """
+    A narrower/shallower RobotNN for distillation (see Distill.py):
+    Linear -> ReLU per entry of hidden_sizes, then the output layer. Layers
+    are named fc1..fcN like RobotNN's, so export_weights and NumpyRobotNN
+    run it unchanged. No dropout: distilled students train on soft targets.
+    """
+
+    def __init__(self, input_size, hidden_sizes=(128,), output_size=3):
+        super(StudentNN, self).__init__()
+        self.num_layers = len(hidden_sizes) + 1
+        sizes = [input_size, *hidden_sizes, output_size]
+        for i in range(self.num_layers):
+            setattr(self, f"fc{i + 1}", nn.Linear(sizes[i], sizes[i + 1]))
+        self.relu = nn.ReLU()
+
+    def forward(self, x):
+        for i in range(1, self.num_layers):
+            x = self.relu(getattr(self, f"fc{i}")(x))
+        return getattr(self, f"fc{self.num_layers}")(x)
@@ -1,8 +1,16 @@
 from breezyslam.algorithms import RMHC_SLAM
 from breezyslam.sensors import RPLidarA2 as LaserModel
-from rplidar import RPLidar as Lidar, RPLidarException
-from roboviz import MapVisualizer
-import RPi.GPIO as GPIO
+from Backends import add_backend_arguments, load_gpio, open_lidar, close_gpio
+from MapRender import write_image
+from ScanDecimation import AdaptiveDecimator, DEFAULT_BEAMS, MIN_QUALITY, BUDGET_SECONDS
+from ScanMatcher import ScanOdometry, FRONT_ANGLE
+from TiledMap import TiledMap, MapWindow
+from MapStream import MapPublisher
+from MotorControl import MotorController
+from Planner import Planner, WaypointFollower
+import multiprocessing as mp
+import numpy as np
+import argparse
 import time
 
 MAP_SIZE_PIXELS         = 500
@@ -10,77 +18,250 @@ MAP_SIZE_METERS         = 10
 LIDAR_DEVICE            = '/dev/ttyUSB0'
 
 motorPin = 11
-GPIO.setmode(GPIO.BOARD)
-GPIO.setwarnings(False)
-GPIO.setup(motorPin, GPIO.OUT, initial=GPIO.LOW)
 
-# Ideally we could use all 250 or so samples that the RPLidar delivers in one 
+# Drive motor pins, as in AIDriving.py (only used with --goal)
+R1, R2, L1, L2 = 22, 16, 18, 13
+ENB = 32
+right_pwm = 80
+
+# Ideally we could use all 250 or so samples that the RPLidar delivers in one
 # scan, but on slower computers you'll get an empty map and unchanging position
-# at that rate.
-MIN_SAMPLES   = 200    
+# at that rate. Scans are resampled to a fixed number of beams instead, and
+# the beam count and RMHC effort shrink until each scan, scan matching
+# included, fits the time budget (see ScanDecimation.py).
 
-lidar = Lidar(LIDAR_DEVICE)
-try:
+# SLAM runs in its own process and never waits for the display. The viewer
+# (or the snapshot timer when headless) asks for a map at its own rate; only
+# then does the SLAM process run getmap and copy the map into shared memory.
+VIEW_HZ = 2.0           # Viewer refreshes per second
+SNAPSHOT_FILE = "slam_map.png"
 
-    if __name__ == '__main__':
+# With --map DIR, the map above is only a window onto a persistent tiled
+# world map (see TiledMap.py): it follows the robot in whole tiles, and the
+# next run with the same DIR resumes from the saved map and pose.
+MM_PER_PIXEL = MAP_SIZE_METERS * 1000 / MAP_SIZE_PIXELS
 
-        # Connect to Lidar unit
-        
-        # Create an RMHC SLAM object with a laser model and optional robot model
-        slam = RMHC_SLAM(LaserModel(), MAP_SIZE_PIXELS, MAP_SIZE_METERS)
+# With --goal X,Y the SLAM process also drives: after every update it
+# replans on the fresh map (see Planner.py) and starts the next timed move
+# towards the first waypoint. Goals are in metres in the SLAM map frame,
+# where the robot starts at the centre, or in world metres with --map.
 
-        # Set up a SLAM display
-        viz = MapVisualizer(MAP_SIZE_PIXELS, MAP_SIZE_METERS, 'SLAM')
 
-        # Initialize an empty trajectory
-        trajectory = []
+class SharedSlamState:
+    """
+    What the SLAM process shares with the viewer: the map bytes and pose in
+    shared memory, update counters, and events for the map hand-over.
+    The viewer sets map_wanted; the SLAM process fills `map` and `pose`
+    after its next update and sets map_ready. Neither side touches the map
+    outside that hand-over, so it needs no lock.
+    """
+
+    def __init__(self, map_size_pixels):
+        self.map = mp.RawArray('B', map_size_pixels * map_size_pixels)
+        self.pose = mp.RawArray('d', 3)  # x mm, y mm, theta degrees
+        self.updates = mp.RawValue('L', 0)
+        self.maps = mp.RawValue('L', 0)  # getmap calls
+        self.map_wanted = mp.Event()
+        self.map_ready = mp.Event()
+        self.stop = mp.Event()
+
+    def mapbytes(self):
+        return np.frombuffer(self.map, dtype=np.uint8)
+
+    def request_map(self, timeout):
+        """Asks the SLAM process for a fresh map; True once it has been written."""
+        self.map_ready.clear()
+        self.map_wanted.set()
+        return self.map_ready.wait(timeout)
+
 
-        # Initialize empty map
-        mapbytes = bytearray(MAP_SIZE_PIXELS * MAP_SIZE_PIXELS)
+def slam_process(args, state, viewer):
+    """Reads the Lidar and updates SLAM until the session ends or state.stop is set."""
+    slam = RMHC_SLAM(LaserModel(), MAP_SIZE_PIXELS, MAP_SIZE_METERS)
+    decimator = AdaptiveDecimator(args.beams, args.min_quality, args.budget_ms / 1000, adapt=not args.fixed_effort)
+    odometry = None if args.no_odometry else ScanOdometry()
+    mapbytes = bytearray(MAP_SIZE_PIXELS * MAP_SIZE_PIXELS)
+    shared_map = memoryview(state.map).cast('B')
+    window = None
+    if args.map:
+        store = TiledMap(args.map, mm_per_pixel=MM_PER_PIXEL)
+        if store.mm_per_pixel != MM_PER_PIXEL:
+            raise ValueError(f"{args.map} was built at {store.mm_per_pixel} mm per pixel, not {MM_PER_PIXEL}")
+        window = MapWindow(store, MAP_SIZE_PIXELS)
+        if window.resume(slam):
+            print(f"Resuming {store.summary()} at {store.pose[0]:.0f} mm, {store.pose[1]:.0f} mm")
 
+    def local_goal():
+        """The goal in mm in the current map window."""
+        offset = window.origin * MM_PER_PIXEL if window is not None else (0, 0)
+        return args.goal[0] * 1000 - offset[0], args.goal[1] * 1000 - offset[1]
+
+    planner = motors = motors_gpio = follower = None
+    if args.goal:
+        planner = Planner(local_goal(), MM_PER_PIXEL)
+        motors_gpio = load_gpio(args)  # This process's own; the parent's GPIO drives only the Lidar motor
+        motors = MotorController(motors_gpio, R1, R2, L1, L2, ENB, speed=right_pwm)
+        motors.init()
+        follower = WaypointFollower(motors)
+    arrived = False
+    lidar = open_lidar(args, LIDAR_DEVICE)
+    x = y = theta = 0.0
+    started = time.perf_counter()
+    try:
         # Create an iterator to collect scan data from the RPLidar
-        GPIO.output(motorPin, GPIO.HIGH)
-        time.sleep(0.5) # Wait for the motor to reach higher speed
         iterator = lidar.iter_scans()
 
-        # We will use these to store previous scan in case current scan is inadequate
-        previous_distances = None
-        previous_angles    = None
-
         # First scan is crap, so ignore it
         next(iterator)
-        
-        while True:
-            # Extract (quality, angle, distance) triples from current scan
-            items = [item for item in next(iterator)]
-            # Extract distances and angles from triples
-            distances = [item[2] for item in items]
-            angles    = [item[1] for item in items]
-
-            # Update SLAM with current Lidar scan and scan angles if adequate
-            if len(distances) > MIN_SAMPLES:
-                slam.update(distances, scan_angles_degrees=angles)
-                previous_distances = distances.copy()
-                previous_angles    = angles.copy()
-
-            # If not adequate, use previous
-            elif previous_distances is not None:
-                slam.update(previous_distances, scan_angles_degrees=previous_angles)
-
-            # Get current robot position
+
+        started = time.perf_counter()
+        for scan in iterator:
+            if state.stop.is_set():
+                break
+            # Split (quality, angle, distance) triples into columns, with
+            # angles turned so the robot's front is 0 (SLAM's heading)
+            points = np.asarray(scan, dtype=np.float64).reshape(-1, 3)
+            angles = (points[:, 1] - FRONT_ANGLE) % 360
+
+            # Update SLAM with the resampled scan and the matched motion; scans
+            # with too few good returns are skipped rather than replaced by
+            # the previous one
+            if not decimator.update(slam, points[:, 0], angles, points[:, 2], odometry):
+                continue
+            state.updates.value += 1
+
+            # Get current robot position, moving the map window along with it
             x, y, theta = slam.getpos()
+            if window is not None and window.follow(slam, x, y):
+                x, y, theta = slam.getpos()
+                if planner is not None:
+                    planner.reset(local_goal())  # The grid moved under the plan
+
+            # Replan on the fresh map and head for the next waypoint
+            if planner is not None and not arrived:
+                slam.getmap(mapbytes)
+                waypoints = planner.update(mapbytes, (x, y, theta))
+                if follower.step((x, y, theta), waypoints) == 'stop' and waypoints:
+                    arrived = True  # No waypoints at all means no way there yet: keep mapping and replanning
+                    print(f"Goal reached after {planner.replans} plans")
+
+            # Only build the map when the viewer is waiting for one
+            if state.map_wanted.is_set():
+                if planner is None or arrived:
+                    slam.getmap(mapbytes)
+                shared_map[:] = mapbytes
+                state.pose[:] = (x, y, theta)
+                state.maps.value += 1
+                state.map_wanted.clear()
+                state.map_ready.set()
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print("Error")
+        print(e)
+    finally:
+        elapsed = time.perf_counter() - started
+        updates = state.updates.value
+        if window is not None:
+            window.save(slam, x, y, theta)
+            x, y, theta = window.world_pose(x, y, theta)
+            print(f"Map: {window.store.summary()}, window moved {window.recenters} times")
+        print(f"{updates} SLAM updates in {elapsed:.1f}s ({updates / max(elapsed, 1e-9):.1f}/s, viewer {viewer}), "
+              f"{state.maps.value} maps extracted, final pose {x:.0f} mm, {y:.0f} mm, {theta:.1f} deg")
+        print(f"Scan decimation: {decimator.summary()}")
+        if odometry is not None:
+            print(f"Scan matching: {odometry.summary()}")
+        if motors is not None:
+            motors.close()
+            print(f"Planning: {planner.summary()}")
+            close_gpio(motors_gpio, args, name="motors")
+        lidar.stop()
+        lidar.disconnect()
 
-            # Get current map bytes as grayscale
-            slam.getmap(mapbytes)
 
+def view(state, worker, viz, view_hz, snapshot_every, snapshot_file, publisher=None):
+    """
+    Shows and/or streams the map at view_hz and/or writes a snapshot every
+    snapshot_every seconds until the SLAM process ends or the window is
+    closed.
+    """
+    period = 1 / view_hz if viz is not None or publisher is not None else snapshot_every
+    next_snapshot = time.monotonic() + snapshot_every if snapshot_every else None
+    next_frame = time.monotonic()
+    while worker.is_alive():
+        next_frame += period
+        if state.request_map(timeout=max(next_frame - time.monotonic(), 0.01)):
+            x, y, theta = state.pose
             # Display map and robot pose, exiting gracefully if user closes it
-            if not viz.display(x/1000., y/1000., theta, mapbytes):
-                exit(0)
-except Exception as e:
-    print("Error")
-    print(e)
-finally:
-    # Shut down the lidar connection
-    GPIO.output(motorPin, GPIO.LOW)
-    lidar.stop()
-    lidar.disconnect()
\ No newline at end of file
+            if viz is not None and not viz.display(x/1000., y/1000., theta, state.mapbytes()):
+                return
+            if publisher is not None:
+                publisher.publish(state.mapbytes(), (x, y, theta))
+            if next_snapshot is not None and time.monotonic() >= next_snapshot:
+                write_image(snapshot_file, state.mapbytes().reshape(MAP_SIZE_PIXELS, MAP_SIZE_PIXELS))
+                next_snapshot += snapshot_every
+        time.sleep(max(next_frame - time.monotonic(), 0))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build a map with RMHC SLAM.")
+    parser.add_argument('--headless', action='store_true', help="run without the map window")
+    parser.add_argument('--view-hz', type=float, default=VIEW_HZ, help="map window refreshes per second (default: %(default)s)")
+    parser.add_argument('--snapshot-every', type=float, metavar='SEC', help="write the map to --snapshot-file every SEC seconds")
+    parser.add_argument('--snapshot-file', default=SNAPSHOT_FILE, help="PNG/PGM map snapshot (default: %(default)s)")
+    parser.add_argument('--beams', type=int, default=DEFAULT_BEAMS, help="angular bins per scan fed to SLAM (default: %(default)s)")
+    parser.add_argument('--min-quality', type=int, default=MIN_QUALITY, help="drop returns below this quality (default: %(default)s)")
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_SECONDS * 1000, help="time budget per scan, scan matching and SLAM update together (default: %(default)s)")
+    parser.add_argument('--fixed-effort', action='store_true', help="keep the beam count and RMHC effort fixed")
+    parser.add_argument('--no-odometry', action='store_true', help="let RMHC find each motion without scan matching")
+    parser.add_argument('--stream', metavar='ADDRESS', help='stream map changes to MapStream.py viewers on "host:port" or a Unix socket path')
+    parser.add_argument('--goal', type=lambda text: tuple(float(v) for v in text.split(',')), metavar='X,Y',
+                        help="drive to this point in metres, replanning after every scan")
+    parser.add_argument('--map', metavar='DIR', help="persistent tiled map to extend, resuming from its saved pose")
+    add_backend_arguments(parser)
+    args = parser.parse_args()
+
+    GPIO = load_gpio(args)
+    GPIO.setmode(GPIO.BOARD)
+    GPIO.setwarnings(False)
+    GPIO.setup(motorPin, GPIO.OUT, initial=GPIO.LOW)
+
+    state = SharedSlamState(MAP_SIZE_PIXELS)
+    worker = None
+    publisher = None
+    try:
+        # Set up a SLAM display
+        viz = None
+        if not args.headless:
+            from roboviz import MapVisualizer
+            viz = MapVisualizer(MAP_SIZE_PIXELS, MAP_SIZE_METERS, 'SLAM')
+
+        GPIO.output(motorPin, GPIO.HIGH)
+        time.sleep(0.5) # Wait for the motor to reach higher speed
+
+        viewer = f"{args.view_hz:g} Hz" if viz is not None else "off"
+        if args.stream:
+            publisher = MapPublisher(args.stream, MAP_SIZE_PIXELS, MAP_SIZE_METERS)
+            viewer += f", streaming {args.view_hz:g} Hz to {args.stream}"
+        if args.snapshot_every:
+            viewer += f", snapshots every {args.snapshot_every:g}s"
+        worker = mp.Process(target=slam_process, args=(args, state, viewer))
+        worker.start()
+        if viz is not None or publisher is not None or args.snapshot_every:
+            view(state, worker, viz, args.view_hz, args.snapshot_every, args.snapshot_file, publisher)
+        else:
+            worker.join()  # Headless: SLAM never builds a map
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print("Error")
+        print(e)
+    finally:
+        state.stop.set()
+        if worker is not None:
+            worker.join()
+        if publisher is not None:
+            print(f"Map stream: {publisher.summary()}")
+            publisher.close()
+        GPIO.output(motorPin, GPIO.LOW)
+        close_gpio(GPIO, args)
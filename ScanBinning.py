@@ -0,0 +1,137 @@
+import numpy as np
+
+# =========================
+# Shared Lidar scan binning
+# =========================
+# Both the driving loop (AIDriving.py) and the training loader
+# (NeuralNetworkTraining) turn (angle, distance) points into one distance per
+# degree. Keeping that step here guarantees the network sees the same input at
+# drive time as it did during training.
+
+MAX_LENGTH = 360  # One bin per degree
+BIN_MODES = ('last', 'min', 'mean')
+
+
+def scan_to_arrays(scan):
+    """
+    Splits a scan into flat angle and distance arrays.
+    Accepts a list of (angle, distance) pairs or an (N, 2) array.
+    Angles are kept in float64 so they round to the same bin as round() does.
+    """
+    points = np.asarray(scan, dtype=np.float64)
+    if points.size == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty
+    return points[:, 0], points[:, 1]
+
+
+class ScanBinner:
+    """
+    Bins Lidar scans into a preallocated (max_scans, max_length) buffer.
+    - mode 'last': the last point that rounds to a bin wins (original behaviour).
+    - mode 'min': the closest point in a bin wins.
+    - mode 'mean': points in a bin are averaged.
+    Angles are rounded half-to-even like Python's round(), and points that
+    fall outside [0, max_length) are dropped. Empty bins are 0.
+    The returned arrays are views into the binner's buffer and are
+    overwritten by the next call.
+    """
+
+    def __init__(self, max_length=MAX_LENGTH, max_scans=1, mode='last', dtype=np.float32):
+        if mode not in BIN_MODES:
+            raise ValueError(f"Unknown bin mode {mode!r}, expected one of {BIN_MODES}")
+        self.max_length = max_length
+        self.mode = mode
+        self.dtype = np.dtype(dtype)
+        self._allocate(max_scans)
+
+    def _allocate(self, max_scans):
+        self.max_scans = max_scans
+        self.out = np.zeros((max_scans, self.max_length), dtype=self.dtype)
+        # 'last' tracks the winning point index per bin, 'mean' the point count
+        self._slot = np.zeros(max_scans * self.max_length, dtype=np.int64)
+
+    def bin_scan(self, angles, distances):
+        """Bins a single scan and returns a (max_length,) view."""
+        bins = np.rint(angles).astype(np.int64)
+        valid = (bins >= 0) & (bins < self.max_length)
+        out = self.out[0]
+        self._fill(out, self._slot[:self.max_length], bins[valid], np.asarray(distances)[valid])
+        return out
+
+    def bin_batch(self, angles, distances, offsets):
+        """
+        Bins a batch of scans stored back to back in one vectorized pass.
+        - angles, distances: flat arrays holding every point of every scan.
+        - offsets: start index of each scan followed by the total point count.
+        Returns a (n_scans, max_length) view.
+        """
+        n_scans = len(offsets) - 1
+        if n_scans > self.max_scans:
+            self._allocate(n_scans)  # Grow once, then reuse
+
+        out = self.out[:n_scans]
+        flat_out = out.reshape(-1)
+
+        bins = np.rint(angles).astype(np.int64)
+        rows = np.repeat(np.arange(n_scans, dtype=np.int64), np.diff(offsets))
+        valid = (bins >= 0) & (bins < self.max_length)
+        flat = rows[valid] * self.max_length + bins[valid]
+        self._fill(flat_out, self._slot[:flat_out.size], flat, np.asarray(distances)[valid])
+        return out
+
+    def _fill(self, flat_out, slot, flat, values):
+        """Writes values into flat_out[flat], combining duplicates by self.mode."""
+        if self.mode == 'last':
+            # NumPy does not define which duplicate wins in a[idx] = v, so
+            # pick the highest point index per bin explicitly
+            slot.fill(-1)
+            np.maximum.at(slot, flat, np.arange(len(flat), dtype=np.int64))
+            flat_out.fill(0)
+            hit = slot >= 0
+            flat_out[hit] = values[slot[hit]]
+        elif self.mode == 'min':
+            flat_out.fill(np.inf)
+            np.minimum.at(flat_out, flat, values)
+            flat_out[np.isinf(flat_out)] = 0
+        else:
+            flat_out.fill(0)
+            slot.fill(0)
+            np.add.at(flat_out, flat, values)
+            np.add.at(slot, flat, 1)
+            np.divide(flat_out, slot, out=flat_out, where=slot > 0)
+
+
+def normalize_per_scan(binned):
+    """
+    Scales each scan to [-1, 1] by its own maximum, in place.
+    Scans with no returns are left at 0. Used by the driving loop.
+    """
+    binned = np.atleast_2d(binned)
+    peaks = binned.max(axis=1, keepdims=True)
+    has_data = peaks > 0
+    if has_data.all():
+        binned *= 2 / peaks
+        binned -= 1
+    else:
+        np.divide(binned, peaks, out=binned, where=has_data)
+        np.multiply(binned, 2, out=binned, where=has_data)
+        np.subtract(binned, 1, out=binned, where=has_data)
+    return binned
+
+
+def normalize_global(binned, scale=None):
+    """
+    Scales every scan to [-1, 1] by one shared maximum, in place.
+    Uses the batch maximum unless a scale is given. Used by the training loader.
+    Returns the scale that was applied.
+    """
+    if scale is None:
+        scale = float(binned.max())
+    binned /= scale
+    binned *= 2
+    binned -= 1
+    return scale
+
+
+NORMALIZATIONS = {'scan': normalize_per_scan, 'global': normalize_global}
@@ -0,0 +1,117 @@
+import time
+import numpy as np
+from ScanBinning import ScanBinner
+
+# =========================
+# Adaptive scan decimation for RMHC SLAM
+# =========================
+# Resamples each raw scan onto a grid of at most `beams` equal angular bins,
+# keeping the closest good-quality return in each bin, and hands only the
+# bins that got a return to slam.update. The cost of an RMHC update grows
+# with the number of points times the search iterations, so both are tuned
+# after every few updates to keep the whole per-scan step (resampling, scan
+# matching and the RMHC update) inside the time budget: over budget, the
+# search effort is cut first and then the beam count; with room to spare,
+# beams come back first (up to the configured count) and then effort.
+# Scan matching always uses the full-resolution scan, so its share of the
+# budget is fixed and SLAM gets what is left.
+
+DEFAULT_BEAMS = 180
+MIN_BEAMS, MAX_BEAMS = 60, 360
+MIN_QUALITY = 10        # RPLidar quality is 0-63; weaker returns are dropped
+MIN_FILLED = 1 / 3      # Fraction of beams that need a return to update at all
+BUDGET_SECONDS = 0.06   # Per scan; the A2M8 delivers a scan every 0.1 s
+MIN_ITERATIONS, MAX_ITERATIONS = 100, 1000  # RMHC search iterations (1000 is the breezyslam default)
+HEADROOM = 0.7          # Only add work back when updates take under 70% of the budget
+ADAPT_EVERY = 5         # Updates between adjustments
+SMOOTHING = 0.2         # Weight of the newest update time in the running average
+
+
+class AdaptiveDecimator:
+    """
+    Usage, once per scan:
+        updated = decimator.update(slam, qualities, angles, distances, odometry)
+    Returns False, leaving the map and pose alone, when too few beams had a
+    good return, instead of feeding SLAM the previous scan again.
+    With adapt=False the beam count and slam's search effort stay fixed.
+    """
+
+    def __init__(self, beams=DEFAULT_BEAMS, min_quality=MIN_QUALITY, budget=BUDGET_SECONDS,
+                 adapt=True, iterations=MAX_ITERATIONS):
+        self.min_quality = min_quality
+        self.budget = budget
+        self.adapt = adapt
+        self.iterations = iterations
+        self.average = None  # Running average time per updated scan, in seconds
+        self.updates = self.skipped = 0
+        self._since_adapt = 0
+        self.max_beams = int(np.clip(beams, MIN_BEAMS, MAX_BEAMS))
+        self._set_beams(self.max_beams)
+
+    def _set_beams(self, beams):
+        self.beams = int(np.clip(beams, MIN_BEAMS, self.max_beams))
+        self._binner = ScanBinner(max_length=self.beams, mode='min', dtype=np.float64)
+        self._centres = np.arange(self.beams) * (360 / self.beams)
+
+    def good(self, qualities, distances):
+        """Mask of returns with at least min_quality and a distance."""
+        return (np.asarray(qualities) >= self.min_quality) & (np.asarray(distances) > 0)
+
+    def resample(self, qualities, angles, distances):
+        """
+        (distances, angles) lists of the beams that got a good return, or
+        None if fewer than MIN_FILLED of them did.
+        """
+        good = self.good(qualities, distances)
+        distances = np.asarray(distances, dtype=np.float64)
+        scaled = np.asarray(angles, dtype=np.float64)[good] * (self.beams / 360)
+        scaled[scaled >= self.beams - 0.5] -= self.beams  # The last half bin wraps round to bin 0
+        binned = self._binner.bin_scan(scaled, distances[good])
+        filled = binned > 0
+        if filled.sum() < MIN_FILLED * self.beams:
+            return None
+        return binned[filled].tolist(), self._centres[filled].tolist()
+
+    def update(self, slam, qualities, angles, distances, odometry=None):
+        """
+        Resamples a scan and runs slam.update on it within the time budget.
+        With a ScanMatcher.ScanOdometry, the full-resolution good returns are
+        matched against the previous scan and the motion goes to SLAM as
+        pose_change; the match counts against the budget too.
+        """
+        started = time.perf_counter()
+        resampled = self.resample(qualities, angles, distances)
+        if resampled is None:
+            self.skipped += 1
+            return False
+        pose_change = None
+        if odometry is not None:
+            good = self.good(qualities, distances)
+            pose_change = odometry.update(np.asarray(distances)[good], np.asarray(angles)[good])
+        slam.max_search_iter = self.iterations
+        slam.update(resampled[0], pose_change=pose_change, scan_angles_degrees=resampled[1])
+        self._record(time.perf_counter() - started)
+        return True
+
+    def _record(self, seconds):
+        self.updates += 1
+        self.average = seconds if self.average is None else SMOOTHING * seconds + (1 - SMOOTHING) * self.average
+        self._since_adapt += 1
+        if not self.adapt or self._since_adapt < ADAPT_EVERY:
+            return
+        self._since_adapt = 0
+        if self.average > self.budget:
+            if self.iterations > MIN_ITERATIONS:
+                self.iterations = max(MIN_ITERATIONS, int(self.iterations * 0.8))
+            elif self.beams > MIN_BEAMS:
+                self._set_beams(self.beams * 0.8)
+        elif self.average < HEADROOM * self.budget:
+            if self.beams < self.max_beams:
+                self._set_beams(self.beams * 1.1 + 1)
+            elif self.iterations < MAX_ITERATIONS:
+                self.iterations = min(MAX_ITERATIONS, int(self.iterations * 1.1) + 1)
+
+    def summary(self):
+        average = 0.0 if self.average is None else self.average * 1000
+        return (f"{self.beams} beams, {self.iterations} RMHC iterations, "
+                f"{average:.1f} ms per scan (budget {self.budget * 1000:.0f} ms), {self.skipped} scans skipped")
@@ -0,0 +1,154 @@
+import math
+import time
+import numpy as np
+from Instrumentation import LatencyHistogram
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # Brute-force nearest neighbours; fine for a few hundred points
+    cKDTree = None
+
+# =========================
+# Scan-to-scan odometry for RMHC SLAM
+# =========================
+# The robot has no wheel encoders, so its motion between two scans is
+# estimated by aligning each scan to the previous one with point-to-line
+# ICP: nearest neighbours come from a KD-tree over the previous scan, and
+# each iteration solves a small linear least-squares problem for the rigid
+# 2D transform that best lays the new points onto the old surfaces. The
+# result is passed to slam.update as pose_change, so RMHC only has to
+# refine it instead of searching for the whole motion.
+#
+# Frame: the one RMHC_SLAM sees. Angles are the Lidar's own (clockwise)
+# shifted so the robot's front is 0, x points forward, and breezyslam
+# treats the angles as counter-clockwise, so a left turn has a negative
+# dtheta. SLAM.py shifts scan angles by FRONT_ANGLE before both.
+
+FRONT_ANGLE = 90        # Lidar angle the robot's front faces (obstacleAvoidance checks 60-120)
+MAX_ITERATIONS = 30
+MAX_DISTANCE_MM = 800   # Pairing distance for the first iteration ...
+MIN_DISTANCE_MM = 100   # ... halved each iteration down to this
+MIN_MATCHES = 30        # Fewer pairs than this and the match is not trusted
+TOLERANCE_MM = 0.5      # Converged once an iteration moves less than this ...
+TOLERANCE_RAD = math.radians(0.02)  # ... and turns less than this
+MAX_GAP_MM = 300        # Neighbours further apart than this do not define a surface
+
+
+def to_points(distances, angles):
+    """(n, 2) x, y in mm from distances (mm) and angles (degrees), in angle order."""
+    angles = np.asarray(angles, dtype=np.float64)
+    order = np.argsort(angles, kind='stable')
+    radians = np.radians(angles[order])
+    distances = np.asarray(distances, dtype=np.float64)[order]
+    return np.column_stack([distances * np.cos(radians), distances * np.sin(radians)])
+
+
+class _Reference:
+    """
+    A scan prepared for matching: a KD-tree for nearest neighbours and a
+    surface normal per point, estimated from its neighbours in angle order.
+    Points whose neighbours are too far apart to lie on the same surface
+    get no normal and are never paired.
+    """
+
+    def __init__(self, points):
+        self.points = points
+        self.tree = cKDTree(points) if cKDTree is not None else None
+        tangent = np.roll(points, -1, axis=0) - np.roll(points, 1, axis=0)
+        length = np.hypot(tangent[:, 0], tangent[:, 1])
+        self.valid = (length > 0) & (length < MAX_GAP_MM)
+        self.normals = np.column_stack([-tangent[:, 1], tangent[:, 0]]) / np.where(length > 0, length, 1)[:, None]
+
+    def nearest(self, query):
+        """Distance to, and index of, the closest reference point for each query point."""
+        if self.tree is not None:
+            return self.tree.query(query)
+        d2 = ((query[:, None, :] - self.points[None, :, :]) ** 2).sum(axis=2)
+        index = d2.argmin(axis=1)
+        return np.sqrt(d2[np.arange(len(query)), index]), index
+
+
+def match(reference, points, guess=(0.0, 0.0, 0.0)):
+    """
+    Aligns points to reference (a _Reference) with point-to-line ICP,
+    starting from guess. Returns (dtheta rad, dx mm, dy mm, pairs): the
+    transform that maps the points into the reference frame, i.e. the newer
+    scan's pose seen from the older one. Returns None if too few points
+    could be paired.
+    """
+    theta, tx, ty = guess
+    pairs = 0
+    for iteration in range(MAX_ITERATIONS):
+        c, s = math.cos(theta), math.sin(theta)
+        moved = points @ np.array([[c, s], [-s, c]]) + (tx, ty)
+        distance, index = reference.nearest(moved)
+        keep = (distance < max(MIN_DISTANCE_MM, MAX_DISTANCE_MM * 0.5 ** iteration)) & reference.valid[index]
+        pairs = int(keep.sum())
+        if pairs < MIN_MATCHES:
+            return None
+        q, p, n = moved[keep], reference.points[index[keep]], reference.normals[index[keep]]
+
+        # Least squares over (dtheta, dx, dy) of the distances from each
+        # moved point to its partner's line, linearized in dtheta
+        A = np.column_stack([n[:, 1] * q[:, 0] - n[:, 0] * q[:, 1], n[:, 0], n[:, 1]])
+        b = -((q - p) * n).sum(axis=1)
+        try:
+            step, sx, sy = np.linalg.solve(A.T @ A, A.T @ b)
+        except np.linalg.LinAlgError:  # Degenerate geometry, e.g. a single wall
+            return None
+
+        # Compose the step: rotate about the origin, then translate
+        c, s = math.cos(step), math.sin(step)
+        theta, tx, ty = theta + step, c * tx - s * ty + sx, s * tx + c * ty + sy
+        if abs(step) < TOLERANCE_RAD and math.hypot(sx, sy) < TOLERANCE_MM:
+            break
+    return theta, tx, ty, pairs
+
+
+class ScanOdometry:
+    """
+    Feed every scan to update() in order; it returns the pose_change tuple
+    slam.update expects, (forward mm, dtheta degrees, dt seconds), or None
+    when the scan could not be matched (RMHC then searches on its own).
+    Each match starts from the previous motion, which keeps fast turns in
+    range. `pose` accumulates (x mm, y mm, heading rad) from the first scan.
+    """
+
+    def __init__(self):
+        self.reference = None
+        self.stamp = None
+        self.guess = (0.0, 0.0, 0.0)
+        self.pose = np.zeros(3)
+        self.matched = self.failed = 0
+        self.timing = LatencyHistogram()
+
+    def update(self, distances, angles, stamp=None):
+        stamp = time.perf_counter() if stamp is None else stamp
+        started = time.perf_counter()
+        points = to_points(distances, angles)
+        first = self.reference is None
+        result = None if first else match(self.reference, points, self.guess)
+        self.reference = _Reference(points)
+        self.timing.record(time.perf_counter() - started)
+
+        dt = 0.0 if self.stamp is None else stamp - self.stamp
+        self.stamp = stamp
+        if result is None:
+            self.guess = (0.0, 0.0, 0.0)
+            if not first:  # The first scan has nothing to match
+                self.failed += 1
+            return None
+
+        theta, tx, ty, _ = result
+        self.guess = (theta, tx, ty)
+        self.matched += 1
+        x, y, heading = self.pose
+        self.pose[:] = (x + math.cos(heading) * tx - math.sin(heading) * ty,
+                        y + math.sin(heading) * tx + math.cos(heading) * ty,
+                        heading + theta)
+        return tx, math.degrees(theta), dt
+
+    def summary(self):
+        timing = self.timing.summary()
+        return (f"{self.matched} scans matched, {self.failed} unmatched, "
+                f"match p50 {timing['p50_ms']:.2f} ms, p99 {timing['p99_ms']:.2f} ms")
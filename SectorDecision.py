@@ -0,0 +1,66 @@
+import time
+import numpy as np
+
+# =========================
+# Per-scan sector decisions for obstacle avoidance
+# =========================
+# Reduces a whole scan to the minimum distance per angular sector in one
+# NumPy pass, then decides once per scan. Turning has hysteresis (the robot
+# keeps turning the same way until the front is clear by a margin) and a
+# cooldown (a turn lasts at least `cooldown` seconds), so the command only
+# changes when the situation does.
+
+FORWARD, LEFT, RIGHT = "forward", "left", "right"
+
+
+def sector_minimums(angles, distances, edges):
+    """
+    Minimum distance in each sector [edges[i], edges[i + 1]) in one pass.
+    Sectors with no points are inf.
+    """
+    sector = np.searchsorted(edges, angles, side='right') - 1
+    inside = (sector >= 0) & (sector < len(edges) - 1)
+    minimums = np.full(len(edges) - 1, np.inf)
+    np.minimum.at(minimums, sector[inside], np.asarray(distances)[inside])
+    return minimums
+
+
+class SectorAvoider:
+    """
+    Decides forward / left / right for each scan.
+    - An obstacle closer than safe_distance in the front window (60-120 deg)
+      turns the robot away from it: obstacles at 60-90 deg are on the left,
+      so it turns right, and the other way round.
+    - Once turning, it keeps the same direction until the front is clearer
+      than clear_distance and at least `cooldown` seconds have passed.
+    decide() returns the command, or None if it is the same as last time.
+    """
+
+    def __init__(self, safe_distance=200, clear_distance=250, cooldown=1/10, edges=(60, 90, 120)):
+        self.safe_distance = safe_distance
+        self.clear_distance = clear_distance
+        self.cooldown = cooldown
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.command = None
+        self.turn_started = -np.inf
+
+    def decide(self, angles, distances, now=None):
+        now = time.monotonic() if now is None else now
+        left_min, right_min = sector_minimums(angles, distances, self.edges)
+        front_min = min(left_min, right_min)
+        turning = self.command in (LEFT, RIGHT)
+        cooled_down = now - self.turn_started > self.cooldown
+
+        if turning and (front_min < self.clear_distance or not cooled_down):
+            command = self.command  # Hysteresis: finish the turn before re-deciding
+        elif front_min < self.safe_distance:
+            command = RIGHT if left_min <= right_min else LEFT
+        else:
+            command = FORWARD
+
+        if command != self.command and command != FORWARD:
+            self.turn_started = now
+        if command == self.command:
+            return None
+        self.command = command
+        return command
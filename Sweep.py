@@ -0,0 +1,179 @@
+import os
+import csv
+import time
+import random
+import runpy
+import argparse
+import itertools
+import numpy as np
+import torch
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# =========================
+# Parallel hyperparameter sweep for NeuralNetworkTraining
+# =========================
+# Trains one RobotNN per config across a process pool, using
+# NeuralNetworkTraining.fit. The dataset is parsed and split once in the
+# parent and placed in shared memory; workers wrap it in tensors without
+# copying. Each worker gets an equal share of the cores as torch threads.
+# Results go to a CSV table sorted by validation loss, and the winner's
+# best checkpoint is kept as <out>/best_model.pth.
+#
+# Usage:
+#   python Sweep.py lidar_training_data.session hidden_size=512,1024,1536 learning_rate=0.0005,0.001
+#   python Sweep.py data.csv hidden_size=256,512,1024,1536 batch_size=256,512 factor=0.5,0.8 --random 6
+# Any of hidden_size, num_epochs, learning_rate, batch_size, factor,
+# patience and min_delta can be swept; the rest keep NeuralNetworkTraining's
+# defaults, including early stopping.
+
+SWEEP_DIR = "sweep"
+RESULTS_FILE = "sweep_results.csv"
+PARAMETERS = ('hidden_size', 'num_epochs', 'learning_rate', 'batch_size', 'factor', 'patience', 'min_delta')
+LATENCY_RUNS = 200
+TRAINING_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "NeuralNetworkTraining")
+
+_data = None  # Worker side: (X_train, X_val, y_train, y_val) tensors over shared memory
+_blocks = []  # Keeps the SharedMemory handles alive as long as the tensors
+
+
+def parse_space(specs):
+    """{name: [values]} from "name=v1,v2,..." arguments."""
+    space = {}
+    for spec in specs:
+        name, sep, values = spec.partition('=')
+        if not sep or name not in PARAMETERS:
+            raise ValueError(f"expected one of {', '.join(PARAMETERS)} as name=v1,v2,..., got {spec!r}")
+        space[name] = [int(v) if v.lstrip('-').isdigit() else float(v) for v in values.split(',')]
+    return space
+
+
+def configs(space, samples=None, seed=0):
+    """Every combination of the space, or `samples` distinct ones picked at random."""
+    names = list(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*space.values())]
+    if samples is not None and samples < len(grid):
+        grid = random.Random(seed).sample(grid, samples)
+    return grid
+
+
+def share(arrays):
+    """Copies arrays into new shared memory blocks; returns the blocks and (name, shape, dtype) specs."""
+    blocks, specs = [], []
+    for array in arrays:
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs.append((block.name, array.shape, array.dtype.str))
+    return blocks, specs
+
+
+def _attach(specs, threads):
+    """Worker initializer: maps the shared dataset and sets the thread count."""
+    global _data
+    for name, shape, dtype in specs:
+        _blocks.append(shared_memory.SharedMemory(name=name))
+    _data = tuple(torch.from_numpy(np.ndarray(shape, dtype=dtype, buffer=block.buf))
+                  for block, (_, shape, dtype) in zip(_blocks, specs))
+    torch.set_num_threads(threads)
+
+
+def latency_ms(model, input_size):
+    """p50 of one single-scan forward pass, as the robot runs it."""
+    model.eval()
+    scan = torch.rand(1, input_size)
+    samples = np.empty(LATENCY_RUNS)
+    with torch.no_grad():
+        for _ in range(10):
+            model(scan)
+        for i in range(LATENCY_RUNS):
+            start = time.perf_counter()
+            model(scan)
+            samples[i] = time.perf_counter() - start
+    return float(np.percentile(samples, 50) * 1000)
+
+
+def train_config(index, config, out_dir, threads):
+    """Trains one config in a worker; returns its row of the results table."""
+    fit = runpy.run_path(TRAINING_SCRIPT)['fit']  # Its __main__ block does not run
+    checkpoint = os.path.join(out_dir, f"config_{index}.pth")
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)  # Left by an interrupted sweep; must not pass for this run's
+    start = time.perf_counter()
+    model, history = fit(_data, threads=threads, best_path=checkpoint, verbose=False, **config)
+    wall = time.perf_counter() - start
+    saved = history['best_epoch'] >= 0  # Nothing is saved if the validation loss was never finite
+    if saved:
+        model.load_state_dict(torch.load(checkpoint))
+    params = sum(p.numel() for p in model.parameters())
+    return {'config': index, **config, 'best_val_loss': history['best_val_loss'], 'best_epoch': history['best_epoch'],
+            'epochs': len(history['val_losses']), 'wall_s': wall, 'params': params,
+            'size_mb': os.path.getsize(checkpoint) / 1e6 if saved else None,
+            'latency_ms': latency_ms(model, _data[0].shape[1])}
+
+
+def run_sweep(dataset, space, samples=None, seed=0, workers=None, out_dir=SWEEP_DIR):
+    """Trains every config and returns the result rows, best first."""
+    todo = configs(space, samples, seed)
+    workers = min(workers or os.cpu_count(), len(todo))
+    threads = max(1, os.cpu_count() // workers)
+    os.makedirs(out_dir, exist_ok=True)
+
+    load_training_data = runpy.run_path(TRAINING_SCRIPT)['load_training_data']
+    blocks, specs = share([tensor.numpy() for tensor in load_training_data(dataset)])
+    print(f"{len(todo)} configs on {workers} workers x {threads} torch threads, "
+          f"dataset {sum(block.size for block in blocks) / 1e6:.1f} MB in shared memory")
+    rows = []
+    try:
+        with ProcessPoolExecutor(workers, initializer=_attach, initargs=(specs, threads)) as pool:
+            futures = {pool.submit(train_config, i, config, out_dir, threads): config for i, config in enumerate(todo)}
+            for future in as_completed(futures):
+                row = future.result()
+                rows.append(row)
+                print(f"[{len(rows)}/{len(todo)}] {futures[future]}: val loss {row['best_val_loss']:.4f} "
+                      f"at epoch {row['best_epoch']}, {row['wall_s']:.0f}s")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    rows.sort(key=lambda row: row['best_val_loss'])
+    for row in rows[1:]:
+        if row['best_epoch'] >= 0:
+            os.remove(os.path.join(out_dir, f"config_{row['config']}.pth"))
+    if rows[0]['best_epoch'] < 0:
+        raise ValueError(f"no config reached a finite validation loss on {dataset}")
+    os.replace(os.path.join(out_dir, f"config_{rows[0]['config']}.pth"), os.path.join(out_dir, "best_model.pth"))
+    return rows
+
+
+def write_results(rows, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_results(rows):
+    columns = list(rows[0])
+    text = [[f"{row[c]:.4g}" if isinstance(row[c], float) else str(row[c]) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(line[i]) for line in text)) for i, c in enumerate(columns)]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for line in text:
+        print("  ".join(v.rjust(w) for v, w in zip(line, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train RobotNN configs in parallel and keep the best.")
+    parser.add_argument('dataset', help="training CSV or session directory")
+    parser.add_argument('space', nargs='+', metavar='name=v1,v2,...', help=f"values to try for any of {', '.join(PARAMETERS)}")
+    parser.add_argument('--random', type=int, metavar='N', help="train N random configs instead of the whole grid")
+    parser.add_argument('--seed', type=int, default=0, help="seed for --random (default: %(default)s)")
+    parser.add_argument('--workers', type=int, help="parallel trainings (default: one per core)")
+    parser.add_argument('--out', default=SWEEP_DIR, help="directory for the results and winner (default: %(default)s)")
+    args = parser.parse_args()
+
+    rows = run_sweep(args.dataset, parse_space(args.space), args.random, args.seed, args.workers, args.out)
+    write_results(rows, os.path.join(args.out, RESULTS_FILE))
+    print_results(rows)
+    print(f"Winner: config {rows[0]['config']}, saved to {os.path.join(args.out, 'best_model.pth')}")
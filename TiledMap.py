@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import numpy as np
+from MapRender import write_image
+
+# =========================
+# Tiled, memory-mapped persistent SLAM map
+# =========================
+# The SLAM core works on a fixed-size local window (SLAM.py's 500 px /
+# 10 m). The world map lives in a directory of fixed-size square tiles:
+# - tiles.u8:  every allocated tile back to back, memory-mapped
+# - map.json:  tile size, resolution, which slot holds which tile, and the
+#              last robot pose, so a later run can resume
+# Tiles are only allocated once something in them has been observed, so
+# memory and disk grow with the explored area, not its bounding box. When
+# the robot nears the edge of the window, MapWindow writes the window back
+# to its tiles, moves it (in whole tiles) to centre the robot, loads the
+# new window from the tiles and hands it to the SLAM core.
+
+TILES_FILE = "tiles.u8"
+META_FILE = "map.json"
+VERSION = 1
+TILE_PIXELS = 100       # 2 m tiles at SLAM.py's 20 mm per pixel
+UNKNOWN = 127           # breezyslam's value for unexplored pixels
+RECENTER_MARGIN = 0.25  # Recentre when the robot is within this fraction of the window from an edge
+
+
+class TiledMap:
+    """
+    World map in tiles of tile_pixels x tile_pixels bytes. World pixel
+    (x, y) belongs to tile (x // tile_pixels, y // tile_pixels); tile
+    coordinates may be negative. Opening an existing directory reloads it.
+    """
+
+    def __init__(self, map_dir, tile_pixels=TILE_PIXELS, mm_per_pixel=20.0):
+        self.map_dir = map_dir
+        self.tiles_path = os.path.join(map_dir, TILES_FILE)
+        self.meta_path = os.path.join(map_dir, META_FILE)
+        os.makedirs(map_dir, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta['version'] != VERSION:
+                raise ValueError(f"{self.meta_path} has unsupported version {meta['version']}")
+            self.tile_pixels = meta['tile_pixels']
+            self.mm_per_pixel = meta['mm_per_pixel']
+            self.slots = {tuple(map(int, key.split(','))): slot for key, slot in meta['tiles'].items()}
+            self.pose = meta['pose']
+        else:
+            self.tile_pixels = tile_pixels
+            self.mm_per_pixel = mm_per_pixel
+            self.slots = {}
+            self.pose = None  # World (x mm, y mm, theta degrees) when last saved
+            open(self.tiles_path, 'wb').close()
+        self._tiles = None
+        self._map(len(self.slots))
+
+    def _map(self, count):
+        """(Re)maps the tiles file to hold count tiles, growing the file if needed."""
+        size = count * self.tile_pixels ** 2
+        if os.path.getsize(self.tiles_path) < size:
+            with open(self.tiles_path, 'r+b') as f:
+                f.truncate(size)
+        if self._tiles is not None:
+            self._tiles.flush()
+        self._tiles = None
+        if count:
+            self._tiles = np.memmap(self.tiles_path, dtype=np.uint8, mode='r+',
+                                    shape=(count, self.tile_pixels, self.tile_pixels))
+
+    def _allocate(self, keys):
+        """Adds new tiles for keys, filled with UNKNOWN."""
+        first = len(self.slots)
+        for i, key in enumerate(keys):
+            self.slots[key] = first + i
+        self._map(len(self.slots))
+        self._tiles[first:] = UNKNOWN
+
+    def _overlaps(self, origin_x, origin_y, size):
+        """(tile key, window slice, tile slice) for every tile a window overlaps."""
+        t = self.tile_pixels
+        for ty in range(origin_y // t, (origin_y + size - 1) // t + 1):
+            for tx in range(origin_x // t, (origin_x + size - 1) // t + 1):
+                x0, y0 = max(tx * t, origin_x), max(ty * t, origin_y)
+                x1, y1 = min((tx + 1) * t, origin_x + size), min((ty + 1) * t, origin_y + size)
+                window = (slice(y0 - origin_y, y1 - origin_y), slice(x0 - origin_x, x1 - origin_x))
+                tile = (slice(y0 - ty * t, y1 - ty * t), slice(x0 - tx * t, x1 - tx * t))
+                yield (tx, ty), window, tile
+
+    def read_window(self, origin_x, origin_y, size, out=None):
+        """The size x size window at world pixel origin, UNKNOWN where no tile exists."""
+        out = np.empty((size, size), dtype=np.uint8) if out is None else out
+        out.fill(UNKNOWN)
+        for key, window, tile in self._overlaps(origin_x, origin_y, size):
+            slot = self.slots.get(key)
+            if slot is not None:
+                out[window] = self._tiles[slot][tile]
+        return out
+
+    def write_window(self, origin_x, origin_y, window):
+        """Stores a window, allocating tiles only where it holds observed pixels."""
+        overlaps = list(self._overlaps(origin_x, origin_y, len(window)))
+        new = [key for key, part, _ in overlaps
+               if key not in self.slots and (window[part] != UNKNOWN).any()]
+        if new:
+            self._allocate(new)
+        for key, part, tile in overlaps:
+            slot = self.slots.get(key)
+            if slot is not None:
+                self._tiles[slot][tile] = window[part]
+
+    def save(self, pose=None):
+        """Flushes the tiles, then atomically rewrites map.json with the pose."""
+        if pose is not None:
+            self.pose = [float(value) for value in pose]
+        if self._tiles is not None:
+            self._tiles.flush()
+        meta = {'version': VERSION, 'tile_pixels': self.tile_pixels, 'mm_per_pixel': self.mm_per_pixel,
+                'pose': self.pose, 'tiles': {f"{tx},{ty}": slot for (tx, ty), slot in self.slots.items()}}
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def render(self):
+        """The whole explored map as one image covering the allocated tiles."""
+        if not self.slots:
+            return np.full((1, 1), UNKNOWN, dtype=np.uint8)
+        keys = np.array(list(self.slots))
+        (x0, y0), (x1, y1) = keys.min(axis=0), keys.max(axis=0) + 1
+        t = self.tile_pixels
+        image = np.full(((y1 - y0) * t, (x1 - x0) * t), UNKNOWN, dtype=np.uint8)
+        for (tx, ty), slot in self.slots.items():
+            image[(ty - y0) * t:(ty - y0 + 1) * t, (tx - x0) * t:(tx - x0 + 1) * t] = self._tiles[slot]
+        return image
+
+    def summary(self):
+        tiles = len(self.slots)
+        return f"{tiles} tiles of {self.tile_pixels} px ({tiles * self.tile_pixels ** 2 / 1e6:.1f} MB) in {self.map_dir}"
+
+
+class MapWindow:
+    """
+    Keeps the SLAM core's fixed-size map centred on the robot. `origin` is
+    the world pixel of the window's corner; SLAM positions are in mm
+    relative to it.
+    """
+
+    def __init__(self, store, size_pixels):
+        self.store = store
+        self.size = size_pixels
+        self.origin = np.zeros(2, dtype=np.int64)
+        self.mapbytes = bytearray(size_pixels * size_pixels)
+        self.recenters = 0
+
+    def _window(self):
+        return np.frombuffer(self.mapbytes, dtype=np.uint8).reshape(self.size, self.size)
+
+    def _centred_origin(self, world_px):
+        """Tile-aligned window corner that puts world_px as close to the centre as possible."""
+        t = self.store.tile_pixels
+        return (np.asarray(world_px) - self.size // 2 + t // 2) // t * t
+
+    def world_pose(self, x_mm, y_mm, theta):
+        offset = self.origin * self.store.mm_per_pixel
+        return x_mm + offset[0], y_mm + offset[1], theta
+
+    def resume(self, slam):
+        """Loads the window around the stored pose into slam and puts the robot back there."""
+        if self.store.pose is None:
+            return False
+        x_mm, y_mm, theta = self.store.pose
+        self.origin = self._centred_origin(np.floor(np.array([x_mm, y_mm]) / self.store.mm_per_pixel).astype(np.int64))
+        self._load(slam)
+        local = np.array([x_mm, y_mm]) - self.origin * self.store.mm_per_pixel
+        slam.position.x_mm, slam.position.y_mm, slam.position.theta_degrees = local[0], local[1], theta
+        return True
+
+    def _load(self, slam):
+        self.store.read_window(int(self.origin[0]), int(self.origin[1]), self.size, out=self._window())
+        slam.setmap(self.mapbytes)
+
+    def _commit(self, slam):
+        slam.getmap(self.mapbytes)
+        self.store.write_window(int(self.origin[0]), int(self.origin[1]), self._window())
+
+    def follow(self, slam, x_mm, y_mm):
+        """Recentres the window if the robot (local x_mm, y_mm) is near its edge. Returns True if it moved."""
+        local_px = np.array([x_mm, y_mm]) / self.store.mm_per_pixel
+        margin = RECENTER_MARGIN * self.size
+        if ((local_px >= margin) & (local_px < self.size - margin)).all():
+            return False
+        self._commit(slam)
+        old = self.origin
+        self.origin = self._centred_origin(old + np.floor(local_px).astype(np.int64))
+        self._load(slam)
+        shift = (self.origin - old) * self.store.mm_per_pixel
+        slam.position.x_mm -= shift[0]
+        slam.position.y_mm -= shift[1]
+        self.recenters += 1
+        return True
+
+    def save(self, slam, x_mm, y_mm, theta):
+        """Writes the window back to the tiles and records the world pose."""
+        self._commit(slam)
+        self.store.save(self.world_pose(x_mm, y_mm, theta))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python TiledMap.py <map_dir> <image.png|.pgm>")
+        sys.exit(1)
+    store = TiledMap(sys.argv[1])
+    write_image(sys.argv[2], store.render())
+    print(store.summary())
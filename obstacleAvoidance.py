@@ -1,97 +1,67 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import RPi.GPIO as GPIO
 import time
-from rplidar import RPLidar
+import argparse
+from collections import deque
+from SectorDecision import SectorAvoider, FORWARD, LEFT, RIGHT
+from MotorControl import MotorController
+from Backends import add_backend_arguments, load_gpio, open_lidar, close_gpio
+from Instrumentation import StageProfiler, add_profile_arguments, make_profiler
+from MapRender import render_points, max_extent, write_image
+
+try:
+    import matplotlib.pyplot as plt
+except ImportError:  # Plots are written to an image file instead
+    plt = None
 
 PORT_NAME = '/dev/ttyUSB0'
 motorPin = 11
+DEFAULT_IMAGE = "obstacle_scans.png"  # Where plots go without matplotlib
 
-GPIO.setmode(GPIO.BOARD)
-GPIO.setwarnings(False)
-GPIO.setup(motorPin, GPIO.OUT, initial=GPIO.LOW)
+GPIO = None  # RPi.GPIO or a fake, chosen in __main__ (see Backends.py)
+args = None
+profiler = StageProfiler()  # Off unless --profile or SIGUSR1, see Instrumentation.py
 
 obstacleCooldown = 1/10 #Dont get stuck next to an obstacle, 1s = about 3 quarters of a lap
-obstacleTime = 0
 SAFE_DISTANCE = 200  # Example threshold distance in mm
+CLEAR_DISTANCE = 250  # Keep turning until the front is this clear (hysteresis)
 
 R1, R2, L1, L2 = 22, 16, 15, 13
 ENB = 32
 
 right_pwm = 80
-def init():
-    global pwm
-    GPIO.setmode(GPIO.BOARD)
-    GPIO.setup(R1, GPIO.OUT)
-    GPIO.setup(R2, GPIO.OUT)
-    GPIO.setup(L1, GPIO.OUT)
-    GPIO.setup(L2, GPIO.OUT)
-    GPIO.setup(ENB, GPIO.OUT)
-    pwm = GPIO.PWM(ENB, 1000)
-    pwm.start(0)
-
-def stop():
-    GPIO.output(R1, False)
-    GPIO.output(R2, False)
-    GPIO.output(L1, False)
-    GPIO.output(L2, False)
-    pwm.ChangeDutyCycle(0) 
-
-def forward():
-    GPIO.output(R1, False)
-    GPIO.output(L2, False)
-    GPIO.output(R2, True)
-    GPIO.output(L1, True)
-    pwm.ChangeDutyCycle(right_pwm)  
-
-def reverse():
-    GPIO.output(R1, True)
-    GPIO.output(R2, False)
-    GPIO.output(L1, False)
-    GPIO.output(L2, True)
-    pwm.ChangeDutyCycle(100)
+motors = None  # MotorController, built in __main__
 
-def right_turn():
-    GPIO.output(R1, True)
-    GPIO.output(R2, False)
-    GPIO.output(L1, True)
-    GPIO.output(L2, False)
-    pwm.ChangeDutyCycle(right_pwm) 
-
-def left_turn():
-    GPIO.output(R1, False)
-    GPIO.output(R2, True)
-    GPIO.output(L1, False)
-    GPIO.output(L2, True)
-    pwm.ChangeDutyCycle(right_pwm) 
-
-lidar_data = []
+RECENT_SCANS = 50  # Scans kept for plotting; older ones are dropped so memory stays flat
+lidar_data = deque(maxlen=RECENT_SCANS)
 
 def run():
     '''Main function'''
-    lidar = RPLidar(PORT_NAME)
+    lidar = open_lidar(args, PORT_NAME)
+    avoider = SectorAvoider(safe_distance=SAFE_DISTANCE, clear_distance=CLEAR_DISTANCE, cooldown=obstacleCooldown)
+    commands = {FORWARD: motors.forward, LEFT: motors.left_turn, RIGHT: motors.right_turn}
     try:
         print('Recording measurments... Press Crl+C to stop.')
         GPIO.output(motorPin, GPIO.HIGH)
         time.sleep(0.5) # Wait for the motor to reach higher speed
-        obstacleTime = 0
+        t = profiler.start()
         for scan in lidar.iter_scans():
-            for measurement in scan:
-                    quality, angle, distance = measurement
-                    #print(f"Quality: {quality}, Angle: {angle:.2f}, Distance: {distance:.2f}")
-                    if scan[0] != 0:
-                        lidar_data.append((angle, distance))
-                        if distance < SAFE_DISTANCE:
-                            if angle > 60 and angle < 120 and (time.time() - obstacleTime) > obstacleCooldown: #Something ahead, turn away
-                                obstacleTime = time.time()
-                                if angle < 90:
-                                    right_turn()
-                                    print("Obstacle to the left")
-                                else:
-                                    left_turn()
-                                    print("Obstacle to the right")
-                        elif (time.time() - obstacleTime) > obstacleCooldown: #otherwise, go forward
-                            forward()
+            t = profiler.lap('acquire', t)  # Waiting for the Lidar to finish a revolution
+            points = np.asarray(scan, dtype=np.float64).reshape(-1, 3)
+            points = points[points[:, 0] > 0, 1:]  # Keep (angle, distance) of valid returns
+            lidar_data.append(points)
+
+            # One decision per scan from the closest point in each front sector
+            command = avoider.decide(points[:, 0], points[:, 1])
+            t = profiler.lap('decide', t)
+
+            if command is not None:  # Only touch the motors when the command changes
+                commands[command]()
+                if command == RIGHT:
+                    print("Obstacle to the left")
+                elif command == LEFT:
+                    print("Obstacle to the right")
+            t = profiler.lap('actuate', t)
+            profiler.tick()
     except KeyboardInterrupt:
         print('Stopping.')
     except Exception as e:
@@ -100,37 +70,48 @@ def run():
     GPIO.output(motorPin, GPIO.LOW)
     lidar.stop()
     lidar.disconnect() 
-    stop()
+    motors.close()
     GPIO.cleanup()
+    close_gpio(GPIO, args)
+    profiler.dump()
     
 
-def plot_lidar_data(lidar_data):
+def plot_lidar_data(lidar_data, image_file=None):
+    """
+    Rasterizes the recent scans (a sequence of (n, 2) angle/distance arrays)
+    and shows them, or writes them to image_file (PNG/PGM) when given or
+    when matplotlib is not installed.
+    """
+    scans = [np.asarray(scan, dtype=np.float64).reshape(-1, 2) for scan in lidar_data]
+    points = np.concatenate(scans) if scans else np.zeros((0, 2))
+    print(f"First 100 angles in radians: {np.radians(points[:100, 0]).tolist()}")
+    extent = max_extent(points[:, 1])
+    image = render_points(points, extent=extent)
+    if image_file is not None or plt is None:
+        image_file = image_file or DEFAULT_IMAGE
+        write_image(image_file, image)
+        print(f"Plot written to {image_file}")
+        return
 
-    x_points = []
-    y_points = []
-    angles = []
-    for angle, distance in lidar_data:
-        angle_rad = np.radians(angle)
-        x = distance * np.cos(angle_rad)
-        y = distance * np.sin(angle_rad)
-        x_points.append(x*-1)
-        y_points.append(y)
-        angles.append(angle_rad)
-        
-    #print(f"First few points (X,Y): {list(zip(x_points, y_points))[:100]}")
-    print(f"First 100 angles in radians: {list(angles)[:100]}")
     plt.figure(figsize=(1,1))
-    plt.scatter(x_points, y_points, s=10, c='red')
-    plt.scatter(0, 0, s=30, c='blue')
-    plt.axhline(0, color = 'black', linewidth=0.5)
-    plt.axvline(0, color = 'black', linewidth=0.5)
+    plt.imshow(image, cmap='gray', extent=(-extent, extent, -extent, extent))
     plt.xlabel("X (mm)")
     plt.ylabel("Y (mm)")
     plt.title("Lidar Data Visualization")
-    plt.axis('equal')
-    plt.grid(True)
     plt.show()
 
 
-init()
-run()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drive forward and turn away from obstacles ahead.")
+    add_backend_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = make_profiler(args)
+    GPIO = load_gpio(args)
+    GPIO.setmode(GPIO.BOARD)
+    GPIO.setwarnings(False)
+    GPIO.setup(motorPin, GPIO.OUT, initial=GPIO.LOW)
+    motors = MotorController(GPIO, R1, R2, L1, L2, ENB, speed=right_pwm, reverse_speed=100)
+    motors.init()
+    run()
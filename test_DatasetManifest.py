@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from AITraining import finish_session
+from DatasetManifest import Dataset
+
+
+def scan(points=10):
+    return np.column_stack([np.full(points, 15.0), np.linspace(0, 359, points), np.full(points, 1000.0)])
+
+
+def test_empty_session_is_dropped_and_summarized(tmp_path):
+    dataset = Dataset(str(tmp_path / "data.dataset"))
+    writer = dataset.new_shard()
+    lines = finish_session(dataset, writer)
+    assert writer.name not in dataset.shards
+    assert not (tmp_path / "data.dataset" / writer.name).exists()
+    assert lines[0] == "Nothing recorded this session."
+    assert "Total sets of training data: 0 (0 scans in 0 shards)" in lines
+    assert Dataset(dataset.root).shards == {}
+
+
+def test_recorded_session_is_kept_and_summarized(tmp_path):
+    dataset = Dataset(str(tmp_path / "data.dataset"))
+    writer = dataset.new_shard()
+    for label in (0, 1, 3):
+        writer.append(scan(), label)
+    lines = finish_session(dataset, writer)
+    assert lines[0] == f"This session ({writer.name}):"
+    assert lines[1] == "Total sets of training data: 2 (3 scans in 1 shards)"
+    assert Dataset(dataset.root).shards[writer.name]['scans'] == 3
+
+
+def test_stats_of_dropped_shard_names_it(tmp_path):
+    dataset = Dataset(str(tmp_path / "data.dataset"))
+    writer = dataset.new_shard()
+    writer.close()
+    dataset.drop(writer.name)
+    with pytest.raises(KeyError, match=writer.name):
+        dataset.stats([writer.name])
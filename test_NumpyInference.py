@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import torch
+from RobotModel import RobotNN
+from NumpyInference import NumpyRobotNN, export_weights, softmax
+
+INPUT_SIZE = 360
+
+
+@pytest.fixture
+def models(tmp_path):
+    torch.manual_seed(0)
+    torch_model = RobotNN(input_size=INPUT_SIZE).eval()
+    pth_file, npz_file = tmp_path / "model.pth", tmp_path / "model.npz"
+    torch.save(torch_model.state_dict(), pth_file)
+    export_weights(str(pth_file), str(npz_file))
+    return torch_model, NumpyRobotNN(str(npz_file))
+
+
+def scans(n):
+    return np.random.default_rng(0).uniform(-1, 1, (n, INPUT_SIZE)).astype(np.float32)
+
+
+def torch_logits(model, inputs):
+    with torch.no_grad():
+        return model(torch.from_numpy(inputs)).numpy()
+
+
+def test_single_scans_match_torch(models):
+    torch_model, numpy_model = models
+    inputs = scans(200)
+    expected = torch_logits(torch_model, inputs)
+    actual = np.array([numpy_model(row)[0].copy() for row in inputs])  # Output buffer is reused
+    np.testing.assert_allclose(actual, expected, atol=1e-4)
+    np.testing.assert_array_equal(actual.argmax(axis=1), expected.argmax(axis=1))
+
+
+def test_batches_match_torch(models):
+    torch_model, numpy_model = models
+    for n in (1, 7, 64):  # Growing batches reallocate the buffers
+        inputs = scans(n)
+        expected = torch_logits(torch_model, inputs)
+        actual = numpy_model(inputs)
+        np.testing.assert_allclose(actual, expected, atol=1e-4)
+        np.testing.assert_array_equal(actual.argmax(axis=1), expected.argmax(axis=1))
+        np.testing.assert_allclose(softmax(actual), torch.softmax(torch.from_numpy(expected), dim=1).numpy(), atol=1e-5)